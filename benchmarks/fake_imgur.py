@@ -0,0 +1,255 @@
+"""
+A local stand-in for api.imgur.com and i.imgur.com used by the benchmarks.
+
+Requests are routed by their Host header, so a client only has to send
+them to the server's address. Listings, albums and images are generated
+with `tests.generate.generate_item`; image bodies are random bytes of a
+fixed size. Latency, error rate and rate-limit credits are configurable.
+"""
+import asyncio
+import json
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from tests.generate import generate_item
+
+Response = Tuple[int, Dict[str, str], bytes]
+
+REASONS = {200: 'OK', 404: 'Not Found', 503: 'Service Unavailable'}
+
+
+@dataclass
+class FakeImgurOptions:
+
+    pages: int = 3
+    items_per_page: int = 20
+    album_ratio: float = 0.2
+    images_per_album: int = 5
+    album_size: int = 60
+    image_size: int = 256 << 10
+    api_latency: float = 0.02
+    cdn_latency: float = 0.01
+    error_rate: float = 0.0
+    client_limit: int = 12500
+    user_limit: int = 2000
+    seed: int = 0
+
+
+class FakeImgur:
+    """
+    Serves generated Imgur API responses and image bodies over HTTP/1.1.
+
+    `GET /_stats` returns the request counters and `GET /_reset` clears them
+    and restores the rate-limit credits.
+    """
+
+    # The album downloaded by the album benchmark; every other album has `images_per_album` images
+    ALBUM_ID: str = 'bench'
+    CHUNK_SIZE: int = 64 << 10
+
+    def __init__(self, options: Optional[FakeImgurOptions] = None):
+        """
+        Parameters:
+            options (FakeImgurOptions): The shape of the generated data and the injected faults
+        """
+        self.options = options or FakeImgurOptions()
+        self.body = random.Random(self.options.seed).randbytes(self.options.image_size)
+        self.reset()
+
+    def reset(self):
+        """
+        Clear the counters and restore the rate-limit credits.
+        """
+        self._random = random.Random(self.options.seed)
+        self.api_calls = 0
+        self.cdn_calls = 0
+        self.errors = 0
+        self.bytes_sent = 0
+        self.client_remaining = self.options.client_limit
+        self.user_remaining = self.options.user_limit
+        self.user_reset = int(time.time()) + 3600
+
+    def stats(self) -> Dict[str, int]:
+        """
+        The request counters since the last reset.
+        """
+        return {
+            'api_calls': self.api_calls,
+            'cdn_calls': self.cdn_calls,
+            'errors': self.errors,
+            'bytes_sent': self.bytes_sent,
+        }
+
+    async def serve(self, host: str = '127.0.0.1', port: int = 0) -> asyncio.AbstractServer:
+        """
+        Start listening.
+
+        Parameters:
+            host (str): The address to bind
+            port (int): The port to bind; 0 for any free port
+
+        Returns:
+            asyncio.AbstractServer: The started server
+        """
+        return await asyncio.start_server(self._handle, host, port)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while request_line := await reader.readline():
+                method, target, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+
+                while (line := await reader.readline()).strip():
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                if length := int(headers.get('content-length', 0)):
+                    await reader.readexactly(length)
+
+                status, response_headers, body = await self.respond(method, headers.get('host', ''), target)
+
+                head = f'HTTP/1.1 {status} {REASONS.get(status, "")}\r\n'
+                head += ''.join(f'{name}: {value}\r\n' for name, value in {**response_headers, 'Content-Length': len(body)}.items())
+                writer.write(head.encode('latin-1') + b'\r\n')
+
+                for start in range(0, len(body), self.CHUNK_SIZE):
+                    writer.write(body[start:start + self.CHUNK_SIZE])
+                    await writer.drain()
+
+                await writer.drain()
+
+                if headers.get('connection', '').lower() == 'close':
+                    break
+
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+
+        finally:
+            writer.close()
+
+    async def respond(self, method: str, host: str, target: str) -> Response:
+        """
+        Answer a request.
+
+        Parameters:
+            method (str): The HTTP method
+            host (str): The Host header, which selects the API or the CDN
+            target (str): The request target
+
+        Returns:
+            Response: The status, headers and body
+        """
+        path = urlsplit(target).path
+
+        if path == '/_stats':
+            return 200, {'Content-Type': 'application/json'}, json.dumps(self.stats()).encode()
+
+        if path == '/_reset':
+            self.reset()
+            return 200, {}, b''
+
+        if host.startswith('i.'):
+            return await self._cdn(path)
+
+        return await self._api(path)
+
+    async def _cdn(self, path: str) -> Response:
+        self.cdn_calls += 1
+        await asyncio.sleep(self.options.cdn_latency)
+
+        if self._random.random() < self.options.error_rate:
+            self.errors += 1
+            return 503, {}, b''
+
+        self.bytes_sent += len(self.body)
+        return 200, {'Content-Type': 'image/jpeg'}, self.body
+
+    async def _api(self, path: str) -> Response:
+        self.api_calls += 1
+        await asyncio.sleep(self.options.api_latency)
+
+        self.client_remaining = max(self.client_remaining - 1, 0)
+        self.user_remaining = max(self.user_remaining - 1, 0)
+
+        headers = {
+            'X-RateLimit-ClientLimit': str(self.options.client_limit),
+            'X-RateLimit-ClientRemaining': str(self.client_remaining),
+            'X-RateLimit-UserLimit': str(self.options.user_limit),
+            'X-RateLimit-UserRemaining': str(self.user_remaining),
+            'X-RateLimit-UserReset': str(self.user_reset),
+        }
+
+        if self._random.random() < self.options.error_rate:
+            self.errors += 1
+            return 503, headers, b''
+
+        data = self._route(path.split('/3/', 1)[-1].strip('/').split('/'))
+
+        if data is None:
+            return 404, headers, json.dumps({'success': False, 'status': 404}).encode()
+
+        headers['Content-Type'] = 'application/json'
+        return 200, headers, json.dumps({'data': data, 'success': True, 'status': 200}).encode()
+
+    def _route(self, parts: List[str]) -> Optional[Any]:
+        if len(parts) == 2 and parts[0] in ('album', 'gallery'):
+            return self.album(parts[1], with_images=True)
+
+        if len(parts) == 2 and parts[0] == 'image':
+            return self.image(parts[1])
+
+        if len(parts) == 6 and parts[:2] == ['gallery', 't']:
+            return {'name': parts[2], 'items': self.page(f't{parts[2]}', int(parts[5]))}
+
+        if len(parts) == 6 and parts[:2] == ['gallery', 'r']:
+            return self.page(f'r{parts[2]}', int(parts[5]))
+
+        if len(parts) == 5 and parts[0] == 'account' and parts[2] == 'favorites':
+            return self.page(f'f{parts[1]}', int(parts[3]))
+
+        return None
+
+    def image(self, id: str) -> Dict[str, Any]:
+        """
+        Generate the metadata of an image.
+        """
+        return generate_item(
+            id=id,
+            is_album=False,
+            type='image/jpeg',
+            animated=False,
+            size=self.options.image_size,
+            images_count=None,
+            link=f'https://i.imgur.com/{id}.jpg'
+        )
+
+    def album(self, id: str, with_images: bool = False) -> Dict[str, Any]:
+        """
+        Generate the metadata of an album; listings leave out its images like Imgur does.
+        """
+        count = self.options.album_size if id == self.ALBUM_ID else self.options.images_per_album
+        album = generate_item(id=id, is_album=True, images_count=count, link=f'https://imgur.com/a/{id}')
+
+        if with_images:
+            album['images'] = [self.image(f'{id}i{position}') for position in range(count)]
+
+        return album
+
+    def page(self, prefix: str, page: int) -> List[Dict[str, Any]]:
+        """
+        Generate a page of a listing; pages past `pages` are empty.
+        """
+        if page >= self.options.pages:
+            return []
+
+        items = []
+
+        for position in range(self.options.items_per_page):
+            id = f'{prefix}p{page}n{position}'
+            is_album = random.Random(f'{self.options.seed}:{id}').random() < self.options.album_ratio
+            items.append(self.album(id) if is_album else self.image(id))
+
+        return items
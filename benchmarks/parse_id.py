@@ -0,0 +1,90 @@
+"""
+Compares `downloader.parse_id` with the regex loop it replaced.
+
+Usage:
+    PYTHONPATH=src python benchmarks/parse_id.py [-n NUMBER]
+"""
+import argparse
+import re
+import timeit
+from typing import Optional
+
+from imgurtofolder.downloader import parse_id
+from imgurtofolder.objects import ImgurObjectResponse, ImgurObjectType
+
+LEGACY_EXTENSIONS = {
+    'album': [r'(/a/)(\w+)'],
+    'gallery': [r'(/g/)(\w+)', r'(/gallery/)(\w+)'],
+    'subreddit': [r'(/r/)(\w+)\/(\w+)', r'(/r/)(\w+)$'],
+    'tag': [r'(/t/)(\w+)'],
+    'image': [r'(https?)?(.*\.com\/)(\w+)(\..*)?$']
+}
+
+URLS = [
+    'https://imgur.com/a/rYXPu9x',
+    'https://imgur.com/gallery/HxRgTyb',
+    'https://imgur.com/g/HxRgTyb',
+    'https://imgur.com/r/aww/Ur2Yx4q',
+    'https://imgur.com/r/aww',
+    'https://imgur.com/t/funny',
+    'https://imgur.com/Ur2Yx4q',
+    'https://i.imgur.com/Ur2Yx4q.jpg',
+    'https://i.imgur.com/Ur2Yx4q.gifv',
+]
+
+
+def legacy_parse_id(url: str) -> Optional[ImgurObjectResponse]:
+    """
+    `parse_id` before the single-pass classifier, kept for comparison.
+    """
+    for item in LEGACY_EXTENSIONS['album']:
+        if _search := re.search(item, url):
+            return ImgurObjectResponse(id=_search.group(2), type=ImgurObjectType.ALBUM)
+
+    for item in LEGACY_EXTENSIONS['gallery']:
+        if _search := re.search(item, url):
+            return ImgurObjectResponse(id=_search.group(2), type=ImgurObjectType.GALLERY)
+
+    for item in LEGACY_EXTENSIONS['subreddit']:
+        if not (_search := re.search(item, url)):
+            continue
+
+        subreddit = _search.group(2)
+        id = _search.group(3) if re.compile(item).groups > 2 else None
+
+        if id is None:
+            return ImgurObjectResponse(id=subreddit, type=ImgurObjectType.SUBREDDIT)
+
+        return ImgurObjectResponse(id=id, type=ImgurObjectType.SUBREDDIT, subreddit=subreddit)
+
+    for item in LEGACY_EXTENSIONS['tag']:
+        if _search := re.search(item, url):
+            return ImgurObjectResponse(id=_search.group(2), type=ImgurObjectType.TAG)
+
+    if not (search := re.search(LEGACY_EXTENSIONS['image'][0], url)):
+        raise ValueError('Could not find image id in url')
+
+    return ImgurObjectResponse(id=search.group(3), type=ImgurObjectType.IMAGE)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-n', '--number', type=int, default=20_000, help='Passes over the sample urls')
+    args = parser.parse_args()
+
+    for url in URLS:
+        legacy, current = legacy_parse_id(url), parse_id(url)
+        assert (legacy.id, legacy.subreddit) == (current.id, current.subreddit), url
+
+    results = {}
+
+    for name, function in (('legacy', legacy_parse_id), ('parse_id', parse_id)):
+        seconds = min(timeit.repeat(lambda: [function(url) for url in URLS], number=args.number, repeat=3))
+        results[name] = seconds
+        print(f'{name:>10}: {seconds / (args.number * len(URLS)) * 1e6:.2f} us/url')
+
+    print(f'{"speedup":>10}: {results["legacy"] / results["parse_id"]:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,291 @@
+"""
+Benchmarks the download flows against a local fake Imgur.
+
+The fake server runs in its own process, and so does each flow, so the
+server never competes with the flow for the event loop and each flow's
+peak RSS is its own.
+
+Usage:
+    PYTHONPATH=src python -m benchmarks.run [--flows album tag subreddit favorites]
+                                            [--json results.json] [--compare baseline.json]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from dataclasses import asdict, fields
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List
+
+import httpx
+
+from benchmarks.fake_imgur import FakeImgur, FakeImgurOptions
+from imgurtofolder.api import ImgurAPI
+from imgurtofolder.configuration import Configuration
+from imgurtofolder.downloader import download_favorites
+from imgurtofolder.objects import Album, Subreddit, Tag
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+FLOWS: Dict[str, Callable[[ImgurAPI, int], Awaitable[None]]] = {
+    'album': lambda api, items: Album(FakeImgur.ALBUM_ID, api).download(),
+    'tag': lambda api, items: Tag('bench', api).download(max_items=items),
+    'subreddit': lambda api, items: Subreddit('bench', api).download(max_items=items),
+    'favorites': lambda api, items: download_favorites('bench', api, max_items=items),
+}
+
+# Metrics where a lower value is a regression, and where a higher value is
+HIGHER_IS_BETTER = ('images_per_second', 'mb_per_second')
+LOWER_IS_BETTER = ('api_calls_per_image',)
+
+
+class LocalTransport(httpx.AsyncBaseTransport):
+    """
+    Sends every request to the fake server, keeping its Host header.
+    """
+
+    def __init__(self, port: int):
+        self._port = port
+        self._closed = False
+        self._transport = httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(
+                max_connections=ImgurAPI.MAX_CONNECTIONS_PER_HOST * 2,
+                max_keepalive_connections=ImgurAPI.MAX_KEEPALIVE_CONNECTIONS_PER_HOST * 2,
+                keepalive_expiry=ImgurAPI.KEEPALIVE_EXPIRY,
+            )
+        )
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        request.url = request.url.copy_with(scheme='http', host='127.0.0.1', port=self._port)
+        return await self._transport.handle_async_request(request)
+
+    async def aclose(self):
+        # Shared by the client of every host, which all close it
+        if not self._closed:
+            self._closed = True
+            await self._transport.aclose()
+
+
+class LoopLagMonitor:
+    """
+    Measures how late the event loop wakes a task that sleeps `interval` seconds.
+    """
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: List[float] = []
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(loop.time() - started - self.interval)
+
+    def summary(self) -> Dict[str, float]:
+        samples = sorted(self.samples) or [0.0]
+        return {
+            'loop_lag_p99_ms': samples[int(len(samples) * 0.99)] * 1000,
+            'loop_lag_max_ms': samples[-1] * 1000,
+        }
+
+
+def peak_rss_mb() -> float:
+    """
+    The peak resident set size of this process in MB, or 0 where it is unavailable.
+    """
+    if resource is None:
+        return 0.0
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / float(1 << 20) if sys.platform == 'darwin' else peak / float(1 << 10)
+
+
+def downloaded_files(path: Path) -> List[Path]:
+    """
+    Every finished file under a folder.
+    """
+    return [file for file in path.rglob('*') if file.is_file() and file.suffix != '.part']
+
+
+async def measure(flow: str, api: ImgurAPI, port: int, items: int) -> Dict[str, Any]:
+    """
+    Run one flow against the fake server and measure it.
+
+    Parameters:
+        flow (str): One of `FLOWS`
+        api (ImgurAPI): An API whose transport sends requests to the fake server
+        port (int): The port of the fake server
+        items (int): The number of listing items to download
+
+    Returns:
+        dict: The measurements
+    """
+    async with httpx.AsyncClient(base_url=f'http://127.0.0.1:{port}') as control:
+        await control.get('/_reset')
+
+        monitor = LoopLagMonitor()
+        monitor_task = asyncio.create_task(monitor.run())
+        started = time.perf_counter()
+
+        try:
+            await FLOWS[flow](api, items)
+        finally:
+            seconds = time.perf_counter() - started
+            monitor_task.cancel()
+            await api.close()
+
+        stats = (await control.get('/_stats')).json()
+
+    files = downloaded_files(Path(api._configuration.download_path))
+    images = len(files)
+    megabytes = sum(file.stat().st_size for file in files) / float(1 << 20)
+
+    return {
+        'flow': flow,
+        'images': images,
+        'megabytes': round(megabytes, 2),
+        'seconds': round(seconds, 3),
+        'images_per_second': round(images / seconds, 2),
+        'mb_per_second': round(megabytes / seconds, 2),
+        'api_calls_per_image': round(stats['api_calls'] / images, 3) if images else None,
+        'errors_injected': stats['errors'],
+        'failures': len(api.scheduler.failures),
+        **{name: round(value, 2) for name, value in monitor.summary().items()},
+    }
+
+
+def run_flow(flow: str, port: int, items: int, jobs: int, verbose: bool, results: multiprocessing.Queue):
+    """
+    Run one flow in a fresh configuration; the target of each flow's process.
+    """
+    logging.getLogger().setLevel(logging.INFO if verbose else logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as directory:
+        configuration = Configuration(
+            config_path=os.path.join(directory, 'config.json'),
+            access_token='bench',
+            client_id='bench',
+            client_secret='bench',
+            refresh_token='bench',
+            download_path=os.path.join(directory, 'downloads'),
+            jobs=jobs,
+            use_cache=False,
+        )
+        api = ImgurAPI(configuration, transport=LocalTransport(port))
+
+        result = asyncio.run(measure(flow, api, port, items))
+        api.manifest.close()
+
+    results.put({**result, 'peak_rss_mb': round(peak_rss_mb(), 1)})
+
+
+def serve(options: FakeImgurOptions, ports: multiprocessing.Queue):
+    """
+    Run the fake server until the process is terminated; the target of the server's process.
+    """
+
+    async def main():
+        server = await FakeImgur(options).serve()
+        ports.put(server.sockets[0].getsockname()[1])
+        await server.serve_forever()
+
+    asyncio.run(main())
+
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Dict[str, Any]], tolerance: float) -> List[str]:
+    """
+    List the metrics that got worse than the baseline by more than `tolerance`.
+    """
+    regressions = []
+
+    for result in results:
+        previous = baseline.get(result['flow'])
+
+        if previous is None:
+            continue
+
+        for metric in HIGHER_IS_BETTER + LOWER_IS_BETTER:
+            old, new = previous.get(metric), result.get(metric)
+
+            if not old or new is None:
+                continue
+
+            if (metric in HIGHER_IS_BETTER and new < old * (1 - tolerance)) or (metric in LOWER_IS_BETTER and new > old * (1 + tolerance)):
+                regressions.append(f'{result["flow"]} {metric}: {old} -> {new}')
+
+    return regressions
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+
+    parser.add_argument('--flows', nargs='+', choices=list(FLOWS), default=list(FLOWS))
+    parser.add_argument('--jobs', type=int, default=8, help='Concurrent image downloads. Default: 8')
+    parser.add_argument('--json', metavar='PATH', help='Write the results to a file')
+    parser.add_argument('--compare', metavar='PATH', help='Fail if a result regressed from a file written by --json')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed regression for --compare. Default: 0.2')
+    parser.add_argument('-v', '--verbose', action='store_true')
+
+    for field in fields(FakeImgurOptions):
+        parser.add_argument(f'--{field.name.replace("_", "-")}', type=type(field.default), default=field.default)
+
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+
+    options = FakeImgurOptions(**{field.name: getattr(args, field.name) for field in fields(FakeImgurOptions)})
+    context = multiprocessing.get_context('spawn')
+    ports, results = context.Queue(), context.Queue()
+
+    server = context.Process(target=serve, args=(options, ports), daemon=True)
+    server.start()
+
+    try:
+        port = ports.get(timeout=30)
+        measurements = []
+
+        for flow in args.flows:
+            process = context.Process(target=run_flow, args=(flow, port, options.pages * options.items_per_page, args.jobs, args.verbose, results))
+            process.start()
+            measurements.append(results.get())
+            process.join()
+
+    finally:
+        server.terminate()
+
+    columns = [column for column in measurements[0] if column != 'flow']
+    print(f'{"flow":<10}' + ''.join(f'{column:>20}' for column in columns))
+
+    for measurement in measurements:
+        print(f'{measurement["flow"]:<10}' + ''.join(f'{str(measurement[column]):>20}' for column in columns))
+
+    print(f'\nfake server: {json.dumps(asdict(options))}')
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({measurement['flow']: measurement for measurement in measurements}, indent=4))
+
+    if args.compare:
+        regressions = compare(measurements, json.loads(Path(args.compare).read_text()), args.tolerance)
+
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -5,19 +5,50 @@ from argparse import Namespace
 from logging import getLogger
 from os.path import expanduser, join
 from pathlib import Path
-from typing import Optional
+from typing import Any, Coroutine, List, Optional
 
 from imgurtofolder.api import ImgurAPI, OAuth
 from imgurtofolder.configuration import Configuration
 from imgurtofolder.downloader import (download_account_images,
-                                      download_favorites, download_urls)
-from imgurtofolder.objects import Account
+                                      download_favorites, download_url_file,
+                                      download_urls)
+from imgurtofolder.metrics import MetricsReporter
+from imgurtofolder.objects import Account, Image
+from imgurtofolder.plan import execute_plan, write_plan
+from imgurtofolder.watch import Watcher, build_sources, parse_intervals
+from imgurtofolder.workers import download_sharded
 
 CONFIG_PATH = join(expanduser('~'), ".config", "imgurToFolder", 'config.json')
 
 log = getLogger(__name__)
 
 
+BYTE_UNITS = {'': 1, 'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}
+
+
+def byte_rate(value: str) -> float:
+    """
+    Parse a rate in bytes per second, with an optional K, M or G suffix (powers of 1024).
+
+    Parameters:
+        value (str): The rate, e.g. '500K' or '2.5M'
+
+    Returns:
+        float: Bytes per second
+
+    Raises:
+        ValueError: If the rate is not a positive number
+    """
+    _value = value.strip().upper().removesuffix('/S').removesuffix('B')
+    unit = _value[-1:] if _value[-1:] in BYTE_UNITS else ''
+    rate = float(_value[:len(_value) - len(unit)]) * BYTE_UNITS[unit]
+
+    if rate <= 0:
+        raise ValueError(f'{value} is not a positive rate')
+
+    return rate
+
+
 def parse_arguments():
     """ Parse command line arguments """
     parser = argparse.ArgumentParser(
@@ -25,6 +56,9 @@ def parse_arguments():
     parser.add_argument('urls', metavar='URLS', type=str,
                         nargs='*', help='Automatically detect urls')
 
+    parser.add_argument('--input-file', '-i', metavar='PATH', type=str,
+                        help='Read urls from a file, one per line, or from stdin with "-". Resumes where an interrupted run stopped.')
+
     parser.add_argument('--folder', '-f', metavar='PATH',
                         type=str, help='Change desired folder path')
 
@@ -61,6 +95,69 @@ def parse_arguments():
     parser.add_argument('--window', choices=['day', 'week', 'month', 'year', 'all'], default='day',
                         help='Window of time for the sort method when using subreddit links. (Append "--sort top")')
 
+    parser.add_argument('--jobs', '-j', metavar='NUMBER_OF_JOBS', default=8,
+                        type=int, help='Maximum number of images downloading at once. Default: 8')
+
+    parser.add_argument('--workers', metavar='NUMBER_OF_PROCESSES', default=1,
+                        type=int, help='Download on this many worker processes, sharing the rate limit and manifest. Default: 1')
+
+    parser.add_argument('--max-bandwidth', metavar='BYTES_PER_SECOND', default=None,
+                        type=byte_rate, help='Cap the combined download speed, e.g. 5M; K, M and G are powers of 1024. Default: no cap')
+
+    parser.add_argument('--max-connection-bandwidth', metavar='BYTES_PER_SECOND', default=None,
+                        type=byte_rate, help='Cap the speed of each download, e.g. 500K. Default: no cap')
+
+    parser.add_argument('--api-jobs', metavar='NUMBER_OF_JOBS', default=4,
+                        type=int, help='Maximum number of Imgur API calls in flight at once. Default: 4')
+
+    parser.add_argument('--page-window', metavar='NUMBER_OF_PAGES', default=4,
+                        type=int, help='Number of listing pages requested ahead while paging. Default: 4')
+
+    parser.add_argument('--max-attempts', metavar='NUMBER_OF_ATTEMPTS', default=5,
+                        type=int, help='Attempts per image download before giving up. Default: 5')
+
+    parser.add_argument('--api-max-attempts', metavar='NUMBER_OF_ATTEMPTS', default=5,
+                        type=int, help='Attempts per Imgur API call before giving up. Default: 5')
+
+    parser.add_argument('--dedupe', choices=['hardlink', 'symlink', 'reflink'], default=None,
+                        help='Link images already on disk instead of storing another copy.')
+
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Always ask the Imgur API instead of reusing cached responses.')
+
+    parser.add_argument('--cache-ttl', metavar='SECONDS', default=3600,
+                        type=float, help='Seconds a cached API response is reused before revalidating it. Default: 3600')
+
+    parser.add_argument('--prefer', choices=Image.RENDITIONS, default='original',
+                        help='Which rendition of animated images to download: the original upload, the mp4, or the smallest of both. Default: original')
+
+    parser.add_argument('--fetch-titles', action='store_true',
+                        help='Name direct i.imgur.com links by their title, at the cost of an API call each.')
+
+    parser.add_argument('--progress', action='store_true',
+                        help='Show a live progress line with counts, throughput and queue depth.')
+
+    parser.add_argument('--stats-log', metavar='PATH', default=None,
+                        help='Append a JSON line of run metrics to a file every --stats-interval seconds.')
+
+    parser.add_argument('--prometheus-file', metavar='PATH', default=None,
+                        help='Keep run metrics in a Prometheus text file, e.g. for the node exporter textfile collector.')
+
+    parser.add_argument('--stats-interval', metavar='SECONDS', default=10,
+                        type=float, help='Seconds between writes of --stats-log and --prometheus-file. Default: 10')
+
+    parser.add_argument('--plan', metavar='PATH', default=None,
+                        help='Write the images that would be downloaded, their total size and the API calls spent to a JSON plan, without downloading.')
+
+    parser.add_argument('--from-plan', metavar='PATH', default=None,
+                        help='Download the images of a plan written by --plan, without listing them again.')
+
+    parser.add_argument('--watch', action='store_true',
+                        help='Keep running and download new favorites, account images, subreddit and tag items as they appear.')
+
+    parser.add_argument('--watch-interval', metavar='[SOURCE=]SECONDS', action='append', default=[],
+                        help='Seconds between checks of a source (favorites, account-images, subreddit, tag), or of every source. Default: 900')
+
     parser.add_argument('-v', '--verbose', action='store_true',
                         help='Enables debugging output.')
 
@@ -134,10 +231,46 @@ def load_config(path: str) -> dict:
         exit(1)  # TODO: Don't exit here and keep asking instead.
 
 
+async def run_jobs(jobs: List[Coroutine[Any, Any, Any]], api: ImgurAPI, reporter: Optional[MetricsReporter] = None):
+    """
+    Run every requested job concurrently on one event loop, sharing the API session and scheduler.
+
+    A job that fails is logged without stopping the others. On cancellation
+    (Ctrl+C) the jobs stop, files being written are flushed and closed, and
+    the connection pools are closed before the loop goes away.
+
+    Parameters:
+        jobs (List[Coroutine]): The jobs to run.
+        api (ImgurAPI): The Imgur API object shared by the jobs.
+        reporter (MetricsReporter): Reports the metrics while the jobs run.
+    """
+
+    async def _run_jobs():
+        results = await asyncio.gather(*jobs, return_exceptions=True)
+
+        for result in results:
+            if isinstance(result, Exception):
+                log.error('A job failed:', exc_info=result)
+
+    try:
+        if reporter is None:
+            await _run_jobs()
+        else:
+            async with reporter:
+                await _run_jobs()
+    finally:
+        await api.close()
+        await api.writer.close()
+
+
 def main():
     log.debug('Parsing logs')
     args = parse_arguments()
 
+    if args.plan is not None and (args.watch or args.workers > 1):
+        log.warning('--watch and --workers are ignored with --plan')
+        args.watch, args.workers = False, 1
+
     log.debug('Checking configuation')
     config = fetch_configuration(args)
 
@@ -155,41 +288,108 @@ def main():
 
     if args.change_default_folder:
         config.download_path = expanduser(args.change_default_folder)
-        config.save()
+        config.save(True)
 
     # Authorize if not already
     if not config.access_token:
         OAuth(config).authorize()
 
     api = ImgurAPI(config)
+    reporter = MetricsReporter(
+        api.metrics,
+        api.writer,
+        interval=args.stats_interval,
+        progress=args.progress,
+        stats_log=args.stats_log,
+        prometheus_file=args.prometheus_file
+    )
+
+    jobs: List[Coroutine[Any, Any, Any]] = []
 
     if args.list_all_favorites is not None:
 
         async def list_all_favorites():
 
-            _page: int = 0
+            favorites = Account(
+                username='me',
+                api=api
+            ).iter_account_favorites('me')
 
-            while len(
-                    favorites := await Account(
-                        username='me',
-                        api=api
-                    ).get_account_favorites('me', page=_page)
-            ) > 0:
+            async for favorite in favorites:
+                log.info(f"{favorite.get('id')} - {favorite.get('title') or '<no title>'} - {favorite.get('link')}")
 
-                _page += 1
+        jobs.append(list_all_favorites())
 
-                for favorite in favorites:
-                    log.info(f"{favorite.get('id')} - {favorite.get('title') or '<no title>'} - {favorite.get('link')}")
+    urls = args.urls
 
-        asyncio.run(list_all_favorites())
+    if args.workers > 1 and args.watch:
+        log.warning('--workers is ignored with --watch')
 
-    asyncio.run(download_urls(args.urls, api))
+    sharded = args.workers > 1 and not args.watch
+    # Planning and sharding enumerate the urls, input file, favorites and account images themselves
+    enumerated = sharded or args.plan is not None
 
-    if args.download_favorites is not None:
+    if args.plan is not None:
+        jobs.append(
+            write_plan(
+                args.plan,
+                api,
+                urls=urls,
+                input_file=args.input_file,
+                favorites=args.download_favorites,
+                account_images=args.download_account_images,
+                sort='newest' if args.oldest else 'latest',
+                starting_page=args.start_page,
+                max_items=args.max_downloads
+            )
+        )
+
+    if sharded:
+        jobs.append(
+            download_sharded(
+                api,
+                args.workers,
+                urls=urls,
+                input_file=args.input_file,
+                favorites=args.download_favorites,
+                account_images=args.download_account_images,
+                sort='newest' if args.oldest else 'latest',
+                starting_page=args.start_page,
+                max_items=args.max_downloads
+            )
+        )
+
+    elif args.watch:
+        try:
+            intervals = parse_intervals(args.watch_interval, Watcher.DEFAULT_INTERVAL)
+        except ValueError as error:
+            log.error(f'Invalid --watch-interval: {error}')
+            exit(2)
+
+        sources, urls = build_sources(
+            api,
+            intervals,
+            urls=args.urls,
+            favorites=args.download_favorites,
+            account_images=args.download_account_images
+        )
+        jobs.append(Watcher(api, sources, max_items=args.max_downloads).run())
+
+    if urls and not enumerated:
+        jobs.append(download_urls(urls, api))
+
+    if args.input_file is not None and not enumerated:
+        log.debug(f'Downloading urls from {args.input_file}')
+        jobs.append(download_url_file(args.input_file, api))
+
+    if args.from_plan is not None:
+        jobs.append(execute_plan(args.from_plan, api))
+
+    if args.download_favorites is not None and not (enumerated or args.watch):
         log.debug(
             f'Downloading favorites by {"Oldest" if args.oldest else "Latest" }'
         )
-        asyncio.run(
+        jobs.append(
             download_favorites(
                 args.download_favorites,
                 api=api,
@@ -199,9 +399,9 @@ def main():
             )
         )
 
-    if args.download_account_images is not None:
+    if args.download_account_images is not None and not (enumerated or args.watch):
         log.debug('Downloading account images')
-        asyncio.run(
+        jobs.append(
             download_account_images(
                 args.download_account_images,
                 api=api,
@@ -210,6 +410,23 @@ def main():
             )
         )
 
+    interrupted = False
+
+    try:
+        asyncio.run(run_jobs(jobs, api, reporter))
+    except KeyboardInterrupt:
+        interrupted = True
+        log.warning('Interrupted; unfinished downloads were kept as .part files and resume on the next run')
+
+    if api.deduplicator:
+        api.deduplicator.log()
+
+    api.scheduler.failures.log()
+    log.info(f'Summary: {api.metrics.progress()}')
+
+    if interrupted:
+        exit(130)
+
     log.info('Done.')
 
 
@@ -219,7 +436,20 @@ def fetch_configuration(args: Namespace) -> Configuration:
         **{
             'config_path': CONFIG_PATH,
             **_config_dict,
-            'overwrite': args.overwrite
+            'overwrite': args.overwrite,
+            'jobs': args.jobs,
+            'api_jobs': args.api_jobs,
+            'page_window': args.page_window,
+            'max_attempts': args.max_attempts,
+            'api_max_attempts': args.api_max_attempts,
+            'dedupe': args.dedupe,
+            'use_cache': not args.no_cache,
+            'cache_ttl': args.cache_ttl,
+            'fetch_titles': args.fetch_titles,
+            'workers': 1 if args.watch else max(args.workers, 1),
+            'max_bandwidth': args.max_bandwidth,
+            'max_connection_bandwidth': args.max_connection_bandwidth,
+            'prefer': args.prefer
         }
     )
     config.save(True)
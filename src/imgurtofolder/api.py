@@ -1,20 +1,37 @@
 import asyncio
+import json
+import random
 import re
+import time
 import webbrowser
 from copy import deepcopy
-from datetime import datetime, timedelta
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from importlib.util import find_spec
 from logging import getLogger
 from pprint import pformat
-from typing import Any, Dict, Optional, Union
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, TypeVar, Union
 from urllib.parse import urljoin
 
-import requests
-from requests.exceptions import HTTPError
+import httpx
 
+from imgurtofolder.cache import CachedResponse, ResponseCache
+from imgurtofolder.coalesce import SingleFlight
 from imgurtofolder.configuration import Configuration
+from imgurtofolder.dedupe import Deduplicator
+from imgurtofolder.manifest import Manifest
+from imgurtofolder.metrics import Metrics
+from imgurtofolder.ratelimit import BandwidthLimiter, RateLimiter
+from imgurtofolder.scheduler import Scheduler
+from imgurtofolder.writer import FileWriter
 
 logger = getLogger(__name__)
 
+T = TypeVar('T')
+
+# HTTP/2 is only negotiated when the optional `h2` package is installed
+HTTP2_AVAILABLE: bool = find_spec('h2') is not None
+
 
 class OAuth:
 
@@ -60,29 +77,158 @@ class OAuth:
         logger.debug('Configuration saved')
         logger.info('The application is now authorized')
 
-    def generate_access_token(self, headers: Optional[Dict[str, str]] = None):
+    async def generate_access_token(self, client: httpx.AsyncClient, headers: Optional[Dict[str, str]] = None):
+        """
+        Exchange the refresh token for a new access token and save it to the config file
+
+        Parameters:
+            client (httpx.AsyncClient): The client to send the request with
+            headers (dict): The headers to send with the request
+
+        Raises:
+            httpx.HTTPStatusError: If Imgur rejects the refresh token
+        """
         url = 'https://api.imgur.com/oauth2/token'
 
-        response = requests.request('POST',
-                                    url,
-                                    headers=headers,
-                                    data={
-                                        'refresh_token': self._configuration.refresh_token,
-                                        'client_id': self._configuration.client_id,
-                                        'client_secret': self._configuration.client_secret,
-                                        'grant_type': 'refresh_token'
-                                    },
-                                    allow_redirects=False)
+        response = await client.post(url,
+                                     headers=headers,
+                                     data={
+                                         'refresh_token': self._configuration.refresh_token,
+                                         'client_id': self._configuration.client_id,
+                                         'client_secret': self._configuration.client_secret,
+                                         'grant_type': 'refresh_token'
+                                     },
+                                     follow_redirects=False)
+        response.raise_for_status()
         response_json = response.json()
 
         self._configuration.access_token = response_json['access_token']
+        self._configuration.refresh_token = response_json.get('refresh_token') or self._configuration.refresh_token
+
+        self._configuration.save()
+        logger.info('Access token refreshed')
+
+
+class IncompleteDownloadError(IOError):
+    """
+    Raised when fewer bytes arrived than the server or the metadata announced.
+    """
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a Retry-After header given either in seconds or as an HTTP date.
+
+    Parameters:
+        value (str): The header value
+
+    Returns:
+        float: The number of seconds to wait, or None if the header is missing or invalid
+    """
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """
+    Retries transient failures with jittered exponential backoff.
+
+    A failure is transient if it is a connection-level error or a response
+    with one of `RETRY_STATUSES`. The wait before each new attempt is the
+    `Retry-After` header when the server sends one, and otherwise a random
+    time up to `backoff * 2 ** (attempt - 1)` seconds, capped at `max_backoff`.
+    """
+
+    RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+    def __init__(self, max_attempts: int = 5, backoff: float = 0.5, max_backoff: float = 60.0):
+        """
+        Parameters:
+            max_attempts (int): The number of attempts before giving up, including the first
+            backoff (float): The base delay in seconds
+            max_backoff (float): The longest delay in seconds
+        """
+        if max_attempts < 1:
+            raise ValueError('max_attempts must be at least 1')
+
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retries = 0
+
+    def is_retryable(self, error: Exception) -> bool:
+        """
+        Whether an error is worth another attempt.
+
+        Parameters:
+            error (Exception): The error raised by the attempt
+        """
+        if isinstance(error, httpx.HTTPStatusError):
+            return error.response.status_code in self.RETRY_STATUSES
+
+        return isinstance(error, (httpx.TransportError, IncompleteDownloadError))
+
+    def delay(self, attempt: int, error: Optional[Exception] = None) -> float:
+        """
+        The number of seconds to wait after a failed attempt.
+
+        Parameters:
+            attempt (int): The number of the attempt that failed, starting at 1
+            error (Exception): The error raised by the attempt
+        """
+        if isinstance(error, httpx.HTTPStatusError):
+            retry_after = _parse_retry_after(error.response.headers.get('Retry-After'))
+
+            if retry_after is not None:
+                return retry_after
 
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
 
-def _raise_exception_given_response(response: requests.Response):
+    async def run(self, attempt: Callable[[], Awaitable[T]], description: str) -> T:
+        """
+        Await `attempt()` until it succeeds, fails permanently or runs out of attempts.
+
+        Parameters:
+            attempt (Callable): Creates a fresh awaitable for every attempt
+            description (str): What is being attempted, for the logs
+
+        Returns:
+            T: The result of the first successful attempt
+        """
+        number = 1
+
+        while True:
+            try:
+                return await attempt()
+            except Exception as error:
+                if number >= self.max_attempts or not self.is_retryable(error):
+                    raise
+
+                _delay = self.delay(number, error)
+                logger.warning(
+                    f'{description} failed ({error!r}), retrying in {_delay:.1f}s '
+                    f'(attempt {number + 1} of {self.max_attempts})'
+                )
+                self.retries += 1
+                await asyncio.sleep(_delay)
+                number += 1
+
+
+def _raise_exception_given_response(response: httpx.Response):
     message = f'Request returned incorrect response: {response.status_code} - {response}'
     logger.error(message)
-    logger.debug(pformat(response.json()))
-    raise HTTPError(message)
+    logger.debug(pformat(response.text))
+    raise httpx.HTTPError(message)
 
 
 class ImgurAPI:
@@ -98,19 +244,203 @@ class ImgurAPI:
     BASE_URL = 'https://api.imgur.com'
     API_PREFIX = '/3/'
 
+    MAX_CONNECTIONS_PER_HOST: int = 20
+    MAX_KEEPALIVE_CONNECTIONS_PER_HOST: int = 10
+    KEEPALIVE_EXPIRY: float = 30.0
+    TIMEOUT: httpx.Timeout = httpx.Timeout(30.0, connect=10.0)
+
     _singleton_instance = None
-    _last_request_time: datetime = datetime.now()
-    _buffer_time_between_requests: timedelta = timedelta(milliseconds=100)
 
     def __new__(cls, *args, **kwargs):
         if not cls._singleton_instance:
             cls._singleton_instance = super().__new__(cls)
         return cls._singleton_instance
 
-    def __init__(self, configuration: Configuration):
+    def __init__(self, configuration: Configuration, transport: Optional[httpx.AsyncBaseTransport] = None):
+        """
+        Parameters:
+            configuration (Configuration): The configuration to use
+            transport (httpx.AsyncBaseTransport): Optional transport to send requests through instead of the network
+        """
         self._configuration = configuration
         self._oauth = OAuth(configuration)
+        self._transport = transport
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._clients_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._refresh: Optional[asyncio.Task] = None
+        self._refresh_failure: Optional[Tuple[str, BaseException]] = None
         self.base_url = urljoin(self.BASE_URL, self.API_PREFIX)
+        self.scheduler = Scheduler(jobs=configuration.jobs, api_jobs=configuration.api_jobs)
+        # With worker processes, the main process and every worker spend an equal share of the credits
+        self.rate_limiter = RateLimiter(share=1 / (configuration.workers + 1) if configuration.workers > 1 else 1.0)
+        # Worker processes do every download, so each reads an equal share of the bandwidth
+        self.bandwidth_limiter = (
+            BandwidthLimiter(configuration.max_bandwidth / configuration.workers)
+            if configuration.max_bandwidth else None
+        )
+        self.api_retry_policy = RetryPolicy(max_attempts=configuration.api_max_attempts)
+        self.download_retry_policy = RetryPolicy(max_attempts=configuration.max_attempts)
+        self.manifest = Manifest(configuration.manifest_path)
+        self.writer = FileWriter()
+        self.cache = (
+            ResponseCache(configuration.cache_path, ttl=configuration.cache_ttl)
+            if configuration.use_cache else None
+        )
+        self.deduplicator = (
+            Deduplicator(configuration.dedupe, self.manifest, self.writer)
+            if configuration.dedupe else None
+        )
+        self.single_flight = SingleFlight(ttl=configuration.cache_ttl)
+        self.metrics = Metrics()
+        self.metrics.sample('queue_depth', lambda: self.scheduler.queue_depth)
+        self.metrics.sample('failed_items', lambda: len(self.scheduler.failures), kind='counter')
+        self.metrics.sample('coalesced_requests', lambda: self.single_flight.coalesced + self.single_flight.recent_hits, kind='counter')
+        self.metrics.sample('retries', lambda: self.api_retry_policy.retries + self.download_retry_policy.retries, kind='counter')
+        self.metrics.sample('max_bandwidth_bytes', lambda: configuration.max_bandwidth)
+        self.metrics.sample('rate_limit_client_remaining', lambda: self.rate_limiter.client_remaining)
+        self.metrics.sample('rate_limit_user_remaining', lambda: self.rate_limiter.user_remaining)
+        self.metrics.sample('rate_limit_post_remaining', lambda: self.rate_limiter.post_remaining)
+
+    def is_api_url(self, url: str) -> bool:
+        """
+        Whether the url points at the Imgur API rather than the CDN.
+
+        Parameters:
+            url (str): The absolute url
+
+        Returns:
+            bool: True if the url is an api.imgur.com url
+        """
+        return httpx.URL(url).host == httpx.URL(self.BASE_URL).host
+
+    def endpoint(self, url: str) -> str:
+        """
+        The endpoint of a url without its IDs, to label metrics with.
+
+        Parameters:
+            url (str): The absolute url
+
+        Returns:
+            str: e.g. 'album', 'gallery/t', 'account/favorites', or 'cdn' for downloads
+        """
+        if not self.is_api_url(url):
+            return 'cdn'
+
+        parts = [part for part in httpx.URL(url).path.split('/') if part]
+
+        if parts and parts[0] == self.API_PREFIX.strip('/'):
+            parts = parts[1:]
+
+        if not parts:
+            return '/'
+
+        if parts[0] == 'account' and len(parts) > 2:
+            return f'account/{parts[2]}'
+
+        if parts[0] == 'gallery' and len(parts) > 2 and parts[1] in ('t', 'r'):
+            return f'gallery/{parts[1]}'
+
+        return parts[0]
+
+    def _get_client(self, url: str) -> httpx.AsyncClient:
+        """
+        Get the pooled client for the host of the url, creating it if needed.
+
+        Each host gets its own client so that connection limits apply per host
+        and api.imgur.com calls never queue behind i.imgur.com downloads.
+
+        Parameters:
+            url (str): The absolute url the request will be made to
+
+        Returns:
+            httpx.AsyncClient: The client for the host
+        """
+        loop = asyncio.get_running_loop()
+
+        if loop is not self._clients_loop:
+            # Pooled connections and locks are bound to the loop that created them
+            self._clients = {}
+            self._refresh = None
+            self._clients_loop = loop
+
+        host = httpx.URL(url).host
+
+        if host not in self._clients:
+            logger.debug(f'Creating connection pool for {host}')
+            self._clients[host] = httpx.AsyncClient(
+                http2=HTTP2_AVAILABLE,
+                limits=httpx.Limits(
+                    max_connections=self.MAX_CONNECTIONS_PER_HOST,
+                    max_keepalive_connections=self.MAX_KEEPALIVE_CONNECTIONS_PER_HOST,
+                    keepalive_expiry=self.KEEPALIVE_EXPIRY,
+                ),
+                timeout=self.TIMEOUT,
+                transport=self._transport,
+            )
+
+        return self._clients[host]
+
+    async def close(self):
+        """
+        Close every pooled client opened on the current event loop, and write what the manifest and cache batched.
+        """
+        clients, self._clients = self._clients, {}
+        await asyncio.gather(*(client.aclose() for client in clients.values()))
+        await self.manifest.run(self.manifest.flush)
+
+        if self.cache is not None:
+            await self.cache.run(self.cache.flush)
+
+    async def _refresh_access_token(self, stale_token: str):
+        """
+        Refresh the access token once, however many requests found it expired.
+
+        Every request that finds the token expired while a refresh is in flight
+        waits on that refresh and gets its result or its error. The refresh is
+        retried like any other API call. Once Imgur rejected the refresh token
+        itself, requests still sent with the stale token fail with the same
+        error at once, until the token changes; after any other failure the
+        next expired request tries again.
+
+        Parameters:
+            stale_token (str): The access token the failed request was sent with
+
+        Raises:
+            httpx.HTTPStatusError: If Imgur rejects the refresh token
+        """
+        # Also drops a refresh left in flight on another event loop
+        client = self._get_client(self.BASE_URL)
+
+        if self._configuration.access_token != stale_token:
+            return
+
+        if self._refresh_failure is not None and self._refresh_failure[0] == stale_token:
+            raise self._refresh_failure[1]
+
+        if self._refresh is None or self._refresh.done():
+            logger.info('Access token was rejected, refreshing it')
+            self._refresh = asyncio.ensure_future(self.api_retry_policy.run(
+                lambda: self._oauth.generate_access_token(client),
+                'POST oauth2/token'
+            ))
+            self._refresh.add_done_callback(lambda refresh: self._finish_refresh(stale_token, refresh))
+
+        # Shielded, so a cancelled request does not cancel the refresh of the others
+        await asyncio.shield(self._refresh)
+
+    def _finish_refresh(self, stale_token: str, refresh: asyncio.Task):
+        if refresh.cancelled() or (error := refresh.exception()) is None:
+            return
+
+        logger.error(f'Could not refresh the access token: {error}')
+
+        # Only a rejected refresh token is worth remembering; anything else may go through next time
+        if (
+                isinstance(error, httpx.HTTPStatusError)
+                and error.response.is_client_error
+                and not self.api_retry_policy.is_retryable(error)
+        ):
+            self._refresh_failure = (stale_token, error)
 
     async def _make_request(
             self,
@@ -120,7 +450,7 @@ class ImgurAPI:
             return_raw_response: bool = False,
             include_default_headers: bool = True,
             **kwargs
-    ) -> Union[dict[str, Any], list[Any], requests.Response, None]:
+    ) -> Union[dict[str, Any], list[Any], httpx.Response, None]:
         """
         Make a request to the Imgur API
 
@@ -129,26 +459,128 @@ class ImgurAPI:
             url (str): The url to make the request to
             headers (dict): The headers to send with the request
             return_raw_response (bool): Whether to return the raw response or the parsed json
-            **kwargs: Any other arguments to pass to the requests library
+            stream (bool): Whether to leave the body unread; the caller must close the response
+            allow_redirects (bool): Whether to follow redirects
+            use_cache (bool): Whether an API GET may be answered from the response cache
+            **kwargs: Any other arguments to pass to httpx
 
         Returns:
-            [dict | requests.Response]: The response from the API
+            [dict | httpx.Response]: The response from the API
         """
+        _url = urljoin(self.base_url, url)
+
+        if method != 'GET' or return_raw_response or kwargs.get('stream') or not self.is_api_url(_url):
+            return await self._request(method, url, headers, return_raw_response, include_default_headers, **kwargs)
+
+        # Lookups of the same resource share one request, and its result for the rest of the run
+        key = (
+            str(httpx.URL(_url, params=kwargs.get('params'))),
+            (headers or {}).get('Authorization', ''),
+            include_default_headers
+        )
 
-        if datetime.now() - self._last_request_time < self._buffer_time_between_requests:
-            await asyncio.sleep(.1)
+        return await self.single_flight.run(
+            key,
+            lambda: self._request(method, url, headers, return_raw_response, include_default_headers, **kwargs),
+            use_recent=self._configuration.use_cache and kwargs.get('use_cache', True)
+        )
 
-        self._last_request_time = datetime.now()
+    async def _request(
+            self,
+            method: str,
+            url: str,
+            headers: Optional[Dict[str, str]] = None,
+            return_raw_response: bool = False,
+            include_default_headers: bool = True,
+            **kwargs
+    ) -> Union[dict[str, Any], list[Any], httpx.Response, None]:
+        """
+        Make a request to the Imgur API without sharing it; see `_make_request`.
+        """
 
         _headers = deepcopy(self.DEFAULT_HEADERS) if include_default_headers else {}
         _headers.update(headers or {})
 
-        response = requests.request(
-            method,
-            urljoin(self.base_url, url),
-            headers=_headers,
-            **kwargs
-        )
+        stream: bool = kwargs.pop('stream', False)
+        follow_redirects: bool = kwargs.pop('allow_redirects', True)
+        use_cache: bool = kwargs.pop('use_cache', True)
+
+        _url = urljoin(self.base_url, url)
+        client = self._get_client(_url)
+
+        is_api_url = self.is_api_url(_url)
+
+        _cache_key: Optional[str] = None
+        _cached: Optional[CachedResponse] = None
+
+        if use_cache and self.cache is not None and method == 'GET' and is_api_url and not stream and not return_raw_response:
+            _cache_key = self.cache.key(str(httpx.URL(_url, params=kwargs.get('params'))), _headers.get('Authorization', ''))
+            _cached = await self.cache.run(self.cache.get, _cache_key)
+
+            if _cached is not None and _cached.is_fresh(self.cache.ttl):
+                logger.debug(f'Serving {_url} from the response cache')
+                return json.loads(_cached.body)
+
+            if _cached is not None:
+                _headers.update(_cached.revalidation_headers())
+
+        _endpoint = self.endpoint(_url)
+
+        async def send() -> httpx.Response:
+            request = client.build_request(method, _url, headers=_headers, **kwargs)
+
+            if is_api_url:
+                async with self.scheduler.api_slots:
+                    await self.rate_limiter.acquire(method)
+                    started = time.monotonic()
+                    response = await client.send(request, stream=stream, follow_redirects=follow_redirects)
+
+                self.rate_limiter.update(response.headers)
+            else:
+                # CDN downloads do not count against the API credits
+                started = time.monotonic()
+                response = await client.send(request, stream=stream, follow_redirects=follow_redirects)
+
+            # Streamed responses are timed until their headers arrive
+            self.metrics.observe('request_seconds', time.monotonic() - started, endpoint=_endpoint)
+            self.metrics.inc('requests', endpoint=_endpoint, status=str(response.status_code))
+
+            if response.status_code in RetryPolicy.RETRY_STATUSES:
+                await response.aclose()
+                response.raise_for_status()
+
+            return response
+
+        async def dispatch() -> httpx.Response:
+            if stream:
+                # The body of a streamed response can still fail after this returns,
+                # so the caller retries the whole transfer instead
+                return await send()
+
+            return await (self.api_retry_policy if is_api_url else self.download_retry_policy).run(
+                send,
+                f'{method} {_url}'
+            )
+
+        response = await dispatch()
+
+        _authorization = _headers.get('Authorization', '')
+
+        if (
+                response.status_code in (httpx.codes.UNAUTHORIZED, httpx.codes.FORBIDDEN)
+                and _authorization.startswith('Bearer ')
+                and self._configuration.refresh_token
+        ):
+            await response.aclose()
+            await self._refresh_access_token(_authorization[len('Bearer '):])
+
+            _headers['Authorization'] = f'Bearer {self._configuration.access_token}'
+            response = await dispatch()
+
+        if _cached is not None and response.status_code == httpx.codes.NOT_MODIFIED:
+            logger.debug(f'{_url} was not modified, serving it from the response cache')
+            await self.cache.run(self.cache.touch, _cache_key)
+            return json.loads(_cached.body)
 
         if return_raw_response:
             return response
@@ -156,62 +588,74 @@ class ImgurAPI:
         response.raise_for_status()
 
         try:
-            return response.json()
-        except requests.exceptions.JSONDecodeError:
+            data = response.json()
+        except ValueError:
             _raise_exception_given_response(response)
 
-    async def get(self, url: str, headers: Optional[Dict[str, str]] = None, **kwargs) -> Union[dict, list, requests.Response, None]:
+        if _cache_key is not None:
+            await self.cache.run(
+                self.cache.put,
+                _cache_key,
+                _url,
+                response.content,
+                etag=response.headers.get('ETag'),
+                last_modified=response.headers.get('Last-Modified')
+            )
+
+        return data
+
+    async def get(self, url: str, headers: Optional[Dict[str, str]] = None, **kwargs) -> Union[dict, list, httpx.Response, None]:
         """
         Make a GET request to the Imgur API
 
         Parameters:
             url (str): The url to make the request to
             headers (dict): The headers to send with the request
-            **kwargs: Any other arguments to pass to the requests library
+            **kwargs: Any other arguments to pass to httpx
 
         Returns:
-            [dict | requests.Response]: The response from the API
+            [dict | httpx.Response]: The response from the API
         """
         return await self._make_request('GET', url, headers=headers, **kwargs)
 
-    async def post(self, url: str, headers: Optional[Dict[str, str]] = None, **kwargs) -> Union[dict, list, requests.Response, None]:
+    async def post(self, url: str, headers: Optional[Dict[str, str]] = None, **kwargs) -> Union[dict, list, httpx.Response, None]:
         """
         Make a POST request to the Imgur API
 
         Parameters:
             url (str): The url to make the request to
             headers (dict): The headers to send with the request
-            **kwargs: Any other arguments to pass to the requests library
+            **kwargs: Any other arguments to pass to httpx
 
         Returns:
-            [dict | requests.Response]: The response from the API
+            [dict | httpx.Response]: The response from the API
         """
         return await self._make_request('POST', url, headers=headers, **kwargs)
 
-    async def delete(self, url: str, headers: Optional[Dict[str, str]] = None, **kwargs) -> Union[dict, list, requests.Response, None]:
+    async def delete(self, url: str, headers: Optional[Dict[str, str]] = None, **kwargs) -> Union[dict, list, httpx.Response, None]:
         """
         Make a DELETE request to the Imgur API
 
         Parameters:
             url (str): The url to make the request to
             headers (dict): The headers to send with the request
-            **kwargs: Any other arguments to pass to the requests library
+            **kwargs: Any other arguments to pass to httpx
 
         Returns:
-            [dict | requests.Response]: The response from the API
+            [dict | httpx.Response]: The response from the API
         """
         return await self._make_request('DELETE', url, headers=headers, **kwargs)
 
-    async def put(self, url: str, headers: Optional[Dict[str, str]] = None, **kwargs) -> Union[dict, list, requests.Response, None]:
+    async def put(self, url: str, headers: Optional[Dict[str, str]] = None, **kwargs) -> Union[dict, list, httpx.Response, None]:
         """
         Make a PUT request to the Imgur API
 
         Parameters:
             url (str): The url to make the request to
             headers (dict): The headers to send with the request
-            **kwargs: Any other arguments to pass to the requests library
+            **kwargs: Any other arguments to pass to httpx
 
         Returns:
-            [dict | requests.Response]: The response from the API
+            [dict | httpx.Response]: The response from the API
         """
         return await self._make_request('PUT', url, headers=headers, **kwargs)
@@ -0,0 +1,166 @@
+import os
+import sys
+import time
+from collections import OrderedDict
+from logging import getLogger
+from pathlib import Path
+from typing import AsyncIterator, Hashable, Set, Tuple
+
+from imgurtofolder.writer import FileWriter
+
+logger = getLogger(__name__)
+
+
+class BoundedSet:
+    """
+    A set that forgets its least recently seen items past `max_size`.
+
+    Used to drop duplicate urls from inputs too large to remember entirely;
+    duplicates further apart than `max_size` are caught by the manifest.
+    """
+
+    DEFAULT_MAX_SIZE: int = 100_000
+
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE):
+        """
+        Parameters:
+            max_size (int): The number of items remembered
+        """
+        self.max_size = max_size
+        self._items: OrderedDict = OrderedDict()
+
+    def __contains__(self, item: Hashable) -> bool:
+        return item in self._items
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def add(self, item: Hashable) -> bool:
+        """
+        Add an item.
+
+        Parameters:
+            item (Hashable): The item
+
+        Returns:
+            bool: True if the item was not already in the set
+        """
+        if item in self._items:
+            self._items.move_to_end(item)
+            return False
+
+        self._items[item] = None
+
+        if len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+        return True
+
+
+class Checkpoint:
+    """
+    Tracks the last line of an input file before which every line has finished.
+
+    Lines finish out of order because downloads run concurrently, so lines
+    that finish early are held until every line before them is done. The
+    position is saved periodically so a crashed run resumes from it.
+    """
+
+    SAVE_EVERY_LINES: int = 100
+    SAVE_EVERY_SECONDS: float = 5.0
+
+    def __init__(self, path: str, writer: FileWriter):
+        """
+        Parameters:
+            path (str): The file the position is saved to
+            writer (FileWriter): The pool to write the file on
+        """
+        self.path = Path(path)
+        self.line = 0
+        self._writer = writer
+        self._finished_ahead: Set[int] = set()
+        self._saved_line = 0
+        self._saved_at = time.monotonic()
+
+    def load(self) -> int:
+        """
+        Load the saved position.
+
+        Returns:
+            int: The last line before which every line has finished; 0 to start over
+        """
+        try:
+            self.line = self._saved_line = int(self.path.read_text().strip() or 0)
+        except FileNotFoundError:
+            self.line = self._saved_line = 0
+        except ValueError:
+            logger.warning(f'Ignoring unreadable checkpoint {self.path}')
+            self.line = self._saved_line = 0
+
+        return self.line
+
+    async def complete(self, line_number: int):
+        """
+        Mark a line as finished, saving the position if enough progress was made.
+
+        Parameters:
+            line_number (int): The line that finished, starting at 1
+        """
+        self._finished_ahead.add(line_number)
+
+        while self.line + 1 in self._finished_ahead:
+            self._finished_ahead.remove(self.line + 1)
+            self.line += 1
+
+        if (
+                self.line - self._saved_line >= self.SAVE_EVERY_LINES
+                or
+                (self.line > self._saved_line and time.monotonic() - self._saved_at >= self.SAVE_EVERY_SECONDS)
+        ):
+            await self.save()
+
+    async def save(self):
+        """
+        Save the position, replacing the previous checkpoint atomically.
+        """
+        self._saved_line = self.line
+        self._saved_at = time.monotonic()
+        await self._writer.run(self._write, self.line)
+
+    def _write(self, line: int):
+        temporary = self.path.with_name(self.path.name + '.tmp')
+        temporary.write_text(str(line))
+        os.replace(temporary, self.path)
+
+    async def finish(self):
+        """
+        Remove the checkpoint once the whole input went through.
+        """
+        await self._writer.run(self.path.unlink, missing_ok=True)
+
+
+async def read_lines(path: str, writer: FileWriter, starting_line: int = 0) -> AsyncIterator[Tuple[int, str]]:
+    """
+    Lazily read the lines of a file, or of stdin for '-', without blocking the event loop.
+
+    Parameters:
+        path (str): The path to the file, or '-' for stdin
+        writer (FileWriter): The pool to read on
+        starting_line (int): The number of lines to skip
+
+    Yields:
+        Tuple[int, str]: The line number, starting at 1, and the line
+    """
+    current_file = sys.stdin if path == '-' else await writer.run(open, path, 'r')
+    line_number = 0
+
+    try:
+        while lines := await writer.run(current_file.readlines, 1 << 16):
+            for line in lines:
+                line_number += 1
+
+                if line_number > starting_line:
+                    yield line_number, line
+    finally:
+        if current_file is not sys.stdin:
+            await writer.run(current_file.close)
@@ -0,0 +1,206 @@
+import hashlib
+import time
+from dataclasses import dataclass
+from logging import getLogger
+from typing import Dict, Optional
+
+from imgurtofolder.store import SQLiteStore
+
+logger = getLogger(__name__)
+
+
+@dataclass
+class CachedResponse:
+
+    body: bytes
+    etag: Optional[str]
+    last_modified: Optional[str]
+    stored_at: float
+
+    def is_fresh(self, ttl: float) -> bool:
+        """
+        Whether the response is young enough to be used without asking Imgur.
+
+        Parameters:
+            ttl (float): The time to live in seconds
+        """
+        return time.time() - self.stored_at < ttl
+
+    def revalidation_headers(self) -> Dict[str, str]:
+        """
+        The conditional request headers that let Imgur answer 304 Not Modified.
+        """
+        headers = {}
+
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+
+        return headers
+
+
+class ResponseCache(SQLiteStore):
+    """
+    On-disk cache of API responses, persisted between runs.
+
+    Responses are keyed by url and auth scope. A response younger than the
+    TTL is served without a request. Older responses are revalidated with
+    ETag/Last-Modified when Imgur provided them. The least recently used
+    responses are evicted once the cache grows past `max_size` bytes.
+
+    The methods block on SQLite, so async code calls them through `run`, on
+    the cache's own thread. Hits are remembered in memory and their access
+    times written in batches, and the total size is tracked as responses are
+    stored, so only an eviction scans the table.
+    """
+
+    DEFAULT_TTL: float = 60 * 60
+    DEFAULT_MAX_SIZE: int = 64 << 20
+    ACCESS_BATCH_SIZE: int = 64
+
+    _NAME = 'cache'
+    _SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY,
+            url TEXT NOT NULL,
+            body BLOB NOT NULL,
+            etag TEXT,
+            last_modified TEXT,
+            size INTEGER NOT NULL,
+            stored_at REAL NOT NULL,
+            accessed_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at);
+    '''
+
+    def __init__(self, path: str, ttl: float = DEFAULT_TTL, max_size: int = DEFAULT_MAX_SIZE):
+        """
+        Parameters:
+            path (str): The path to the SQLite database; created on first use
+            ttl (float): Seconds a response is used without revalidating it
+            max_size (int): The maximum total size of cached bodies in bytes
+        """
+        super().__init__(path)
+        self.ttl = ttl
+        self.max_size = max_size
+        self._accessed: Dict[str, float] = {}
+        self._size: Optional[int] = None
+
+    @staticmethod
+    def key(url: str, authorization: str = '') -> str:
+        """
+        The cache key of a url for an auth scope.
+
+        Every bearer token belongs to the same account, so they share a scope
+        and a refreshed token still hits the cache.
+
+        Parameters:
+            url (str): The absolute url
+            authorization (str): The Authorization header of the request
+        """
+        scope = 'Bearer' if authorization.startswith('Bearer ') else authorization
+        return hashlib.sha256(f'{scope}\n{url}'.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        """
+        Get a cached response and mark it as recently used.
+
+        Parameters:
+            key (str): The cache key
+
+        Returns:
+            CachedResponse: The response, or None if it is not cached
+        """
+        row = self.connection.execute(
+            'SELECT body, etag, last_modified, stored_at FROM responses WHERE key = ?',
+            (key,)
+        ).fetchone()
+
+        if row is None:
+            return None
+
+        self._accessed[key] = time.time()
+
+        if len(self._accessed) >= self.ACCESS_BATCH_SIZE:
+            self.flush()
+
+        return CachedResponse(*row)
+
+    def put(self, key: str, url: str, body: bytes, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        """
+        Cache a response body, evicting the least recently used ones if the cache is full.
+
+        Parameters:
+            key (str): The cache key
+            url (str): The url, kept for debugging
+            body (bytes): The response body
+            etag (str): The ETag header of the response
+            last_modified (str): The Last-Modified header of the response
+        """
+        now = time.time()
+        replaced = self.connection.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+        self.connection.execute(
+            'INSERT OR REPLACE INTO responses (key, url, body, etag, last_modified, size, stored_at, accessed_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (key, url, body, etag, last_modified, len(body), now, now)
+        )
+        self._accessed.pop(key, None)
+
+        if self._size is None:
+            self._size, = self.connection.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()
+        else:
+            self._size += len(body) - (replaced[0] if replaced else 0)
+
+        if self._size > self.max_size:
+            self._evict()
+
+    def touch(self, key: str):
+        """
+        Mark a cached response as fresh again after Imgur answered 304 Not Modified.
+
+        Parameters:
+            key (str): The cache key
+        """
+        now = time.time()
+        self.connection.execute('UPDATE responses SET stored_at = ?, accessed_at = ? WHERE key = ?', (now, now, key))
+
+    def flush(self):
+        """
+        Write the access times of the responses served since the last batch.
+        """
+        if not self._accessed:
+            return
+
+        accessed, self._accessed = self._accessed, {}
+        connection = self.connection
+
+        with connection:
+            connection.execute('BEGIN')
+            connection.executemany(
+                'UPDATE responses SET accessed_at = ? WHERE key = ?',
+                [(accessed_at, key) for key, accessed_at in accessed.items()]
+            )
+
+    def _evict(self):
+        self.flush()
+
+        # Other processes share the cache, so count again before deleting anything
+        self._size, = self.connection.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()
+
+        while self._size > self.max_size:
+            row = self.connection.execute('SELECT key, size FROM responses ORDER BY accessed_at LIMIT 1').fetchone()
+
+            if row is None:
+                return
+
+            self.connection.execute('DELETE FROM responses WHERE key = ?', (row[0],))
+            self._size -= row[1]
+
+    def close(self):
+        """
+        Write the pending access times and close the database connection.
+        """
+        self.flush()
+        super().close()
@@ -0,0 +1,100 @@
+import asyncio
+import time
+from collections import OrderedDict
+from copy import deepcopy
+from logging import getLogger
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+logger = getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Shares one request between concurrent callers asking for the same resource.
+
+    While a request for a key is in flight, every other caller for that key
+    waits on it instead of sending its own. Successful results are then kept
+    in a bounded LRU for `ttl` seconds, so later callers in the same run get
+    them without a request. Failures are shared with the callers already
+    waiting, but not remembered.
+
+    Every caller gets its own copy of the result, so callers may change it.
+    """
+
+    DEFAULT_MAX_SIZE: int = 1024
+
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE, ttl: float = float('inf')):
+        """
+        Parameters:
+            max_size (int): The number of recent results remembered
+            ttl (float): Seconds a result is remembered
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.coalesced = 0
+        self.recent_hits = 0
+        self._recent: OrderedDict = OrderedDict()
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def __len__(self) -> int:
+        return len(self._recent)
+
+    def _get_in_flight(self) -> Dict[Hashable, asyncio.Task]:
+        """
+        Get the requests in flight on the running event loop; tasks cannot be awaited across loops.
+        """
+        loop = asyncio.get_running_loop()
+
+        if loop is not self._loop:
+            self._loop = loop
+            self._in_flight = {}
+
+        return self._in_flight
+
+    async def run(self, key: Hashable, request: Callable[[], Awaitable[Any]], use_recent: bool = True) -> Any:
+        """
+        Get the result of `request` for `key`, joining a request already in flight.
+
+        Parameters:
+            key (Hashable): Identifies the resource
+            request (Callable): Starts the request when no other caller has
+            use_recent (bool): Whether a result remembered from earlier in the run may be returned
+
+        Returns:
+            Any: A copy of the result
+        """
+        if use_recent and key in self._recent:
+            stored_at, result = self._recent[key]
+
+            if time.monotonic() - stored_at < self.ttl:
+                self._recent.move_to_end(key)
+                self.recent_hits += 1
+                return deepcopy(result)
+
+        in_flight = self._get_in_flight()
+        task = in_flight.get(key)
+
+        if task is None:
+            task = asyncio.ensure_future(request())
+            in_flight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            logger.debug(f'Joining the request in flight for {key}')
+            self.coalesced += 1
+
+        # Shielded, so a cancelled caller does not cancel the request of the others
+        return deepcopy(await asyncio.shield(task))
+
+    def _finish(self, key: Hashable, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+
+        if task.cancelled() or task.exception() is not None:
+            return
+
+        self._recent[key] = (time.monotonic(), task.result())
+        self._recent.move_to_end(key)
+
+        if len(self._recent) > self.max_size:
+            self._recent.popitem(last=False)
@@ -2,6 +2,7 @@ import json
 from logging import getLogger
 from os.path import expanduser, realpath
 from pathlib import Path
+from typing import Optional
 
 logger = getLogger(__name__)
 
@@ -24,7 +25,20 @@ class Configuration:
         refresh_token: str,
         download_path: str = "~",
         overwrite: bool = False,
-        max_favorites: int = 30
+        max_favorites: int = 30,
+        jobs: int = 8,
+        api_jobs: int = 4,
+        page_window: int = 4,
+        max_attempts: int = 5,
+        api_max_attempts: int = 5,
+        dedupe: Optional[str] = None,
+        use_cache: bool = True,
+        cache_ttl: float = 3600,
+        fetch_titles: bool = False,
+        workers: int = 1,
+        max_bandwidth: Optional[float] = None,
+        max_connection_bandwidth: Optional[float] = None,
+        prefer: str = 'original'
     ):
         """
         Configuration class.
@@ -38,6 +52,19 @@ class Configuration:
             refresh_token (str): The refresh token for the API.
             overwrite (bool): If True, overwrite existing files.
             max_favorites (int): The maximum number of favorites to download.
+            jobs (int): The maximum number of concurrent image downloads.
+            api_jobs (int): The maximum number of concurrent API calls.
+            page_window (int): The number of listing pages requested ahead.
+            max_attempts (int): The number of attempts for each image download.
+            api_max_attempts (int): The number of attempts for each API call.
+            dedupe (str): How to link duplicate images ('hardlink', 'symlink' or 'reflink'); None to keep copies.
+            use_cache (bool): If True, cache API responses between runs.
+            cache_ttl (float): Seconds a cached API response is used without revalidating it.
+            fetch_titles (bool): If True, ask the API for the title of direct image links to name their files.
+            workers (int): The number of download processes sharing the API credits.
+            max_bandwidth (float): The maximum bytes per second read from the CDN by every download together; None for no cap.
+            max_connection_bandwidth (float): The maximum bytes per second read by each download; None for no cap.
+            prefer (str): Which rendition of animated images to download ('original', 'mp4' or 'smallest').
         """
         self.config_path = realpath(expanduser(config_path))
         self.access_token = access_token
@@ -46,8 +73,36 @@ class Configuration:
         self.refresh_token = refresh_token
         self.overwrite = overwrite
         self.max_favorites = max_favorites
+        self.jobs = jobs
+        self.api_jobs = api_jobs
+        self.page_window = page_window
+        self.max_attempts = max_attempts
+        self.api_max_attempts = api_max_attempts
+        self.dedupe = dedupe
+        self.use_cache = use_cache
+        self.cache_ttl = cache_ttl
+        self.fetch_titles = fetch_titles
+        self.workers = workers
+        self.max_bandwidth = max_bandwidth
+        self.max_connection_bandwidth = max_connection_bandwidth
+        self.prefer = prefer
 
         self.download_path = realpath(expanduser(download_path))
+        self._saved_download_path = self.download_path
+
+    @property
+    def manifest_path(self) -> str:
+        """
+        Path to the download manifest, kept next to the config file.
+        """
+        return str(Path(self.config_path).parent / 'manifest.sqlite3')
+
+    @property
+    def cache_path(self) -> str:
+        """
+        Path to the API response cache, kept next to the config file.
+        """
+        return str(Path(self.config_path).parent / 'cache.sqlite3')
 
     def convert_config_to_dict(self, overwrite_download_path=False):
         """
@@ -60,7 +115,7 @@ class Configuration:
             'access_token': self.access_token,
             'client_id': self.client_id,
             'client_secret': self.client_secret,
-            'download_path': self.download_path if overwrite_download_path else self.download_path,
+            'download_path': self.download_path if overwrite_download_path else self._saved_download_path,
             'refresh_token': self.refresh_token
         }
 
@@ -82,3 +137,5 @@ class Configuration:
 
         with _path.open('w') as current_file:
             json.dump(config_dict, current_file, sort_keys=True, indent=4)
+
+        self._saved_download_path = config_dict['download_path']
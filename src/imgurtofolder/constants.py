@@ -1,7 +1,16 @@
-IMGUR_BASE_EXTENSIONS = {
-    'album': [r'(/a/)(\w+)'],
-    'gallery': [r'(/g/)(\w+)', r'(/gallery/)(\w+)'],
-    'subreddit': [r'(/r/)(\w+)\/(\w+)', r'(/r/)(\w+)$'],
-    'tag': [r'(/t/)(\w+)'],
-    'image': [r'(https?)?(.*\.com\/)(\w+)(\..*)?$']
-}
+# Matches every kind of Imgur url in one pass; exactly one of the id groups is set.
+# Album and gallery links may carry a title slug ('funny-cat-AbC123'); the id follows the last '-'.
+# Reserved first segments (a, gallery, user, ...) never name an image.
+IMGUR_URL_PATTERN = r'''
+    (?:https?://)?
+    (?P<host>[^/\s]*\.com)/
+    (?:
+        a/(?:[\w-]*-)?(?P<album>\w+)
+      | (?:g|gallery)/(?:[\w-]*-)?(?P<gallery>\w+)
+      | r/(?P<subreddit>\w+)(?:/(?P<subreddit_item>\w+))?
+      | t/(?P<tag>\w+)
+      | (?!(?:a|g|gallery|r|t|user|account|topic|upload|search|signin|register)(?:[/?\#.]|$))
+        (?P<image>\w+)(?P<extension>\.\w+)?
+    )
+    (?:[/?\#].*)?$
+'''
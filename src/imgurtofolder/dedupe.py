@@ -0,0 +1,153 @@
+import os
+from logging import getLogger
+from pathlib import Path
+from typing import Optional
+
+from imgurtofolder.manifest import Manifest, ManifestEntry
+from imgurtofolder.writer import FileWriter
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = getLogger(__name__)
+
+# Linux FICLONE ioctl; shares the extents of a file on btrfs, XFS and other copy-on-write file systems
+FICLONE: int = 0x40049409
+
+
+def link_file(source: Path, destination: Path, mode: str):
+    """
+    Replaces `destination` with a link to `source`.
+
+    The link is created next to the destination first and renamed over it,
+    so the destination is never missing or half written.
+
+    Parameters:
+        source (Path): The existing file
+        destination (Path): The path to create or replace
+        mode (str): 'hardlink', 'symlink' or 'reflink'
+
+    Raises:
+        OSError: If the file system does not support the link
+    """
+    _source = Path(os.path.realpath(source))
+    _temporary = destination.with_name(destination.name + '.link')
+
+    if _temporary.exists() or _temporary.is_symlink():
+        _temporary.unlink()
+
+    if mode == 'hardlink':
+        os.link(_source, _temporary)
+
+    elif mode == 'symlink':
+        os.symlink(_source, _temporary)
+
+    elif mode == 'reflink':
+        if fcntl is None:
+            raise OSError('reflinks are not supported on this platform')
+
+        try:
+            with _source.open('rb') as source_file, _temporary.open('wb') as temporary_file:
+                fcntl.ioctl(temporary_file.fileno(), FICLONE, source_file.fileno())
+        except OSError:
+            _temporary.unlink()
+            raise
+
+    else:
+        raise ValueError(f'Unknown link mode {mode}')
+
+    os.replace(_temporary, destination)
+
+
+class Deduplicator:
+    """
+    Stores each image's bytes once by linking later copies to the first one.
+
+    An image already downloaded into another folder is linked without being
+    fetched again. A freshly downloaded file whose SHA-256 matches a file on
+    disk is replaced by a link to it.
+    """
+
+    MODES = ('hardlink', 'symlink', 'reflink')
+
+    def __init__(self, mode: str, manifest: Manifest, writer: FileWriter):
+        """
+        Parameters:
+            mode (str): How copies are linked; one of `MODES`
+            manifest (Manifest): The manifest to look up earlier downloads in
+            writer (FileWriter): The pool to run file system work on
+        """
+        if mode not in self.MODES:
+            raise ValueError(f'mode must be one of {", ".join(self.MODES)}')
+
+        self.mode = mode
+        self.bytes_saved = 0
+        self.files_linked = 0
+        self._manifest = manifest
+        self._writer = writer
+
+    async def _link(self, entry: ManifestEntry, destination: Path) -> bool:
+        """
+        Link `destination` to the file of a manifest entry, if it still exists.
+
+        Returns:
+            bool: True if the link was created
+        """
+        _source = Path(entry.path)
+
+        if _source == destination or not await self._writer.run(_source.is_file):
+            return False
+
+        try:
+            await self._writer.run(link_file, _source, destination, self.mode)
+        except OSError as error:
+            logger.debug(f'Could not {self.mode} {destination} to {_source}: {error}')
+            return False
+
+        self.files_linked += 1
+        self.bytes_saved += entry.size or 0
+        logger.info(f'\t{destination} linked to {_source}')
+        return True
+
+    async def link_known_image(self, image_id: str, destination: Path) -> Optional[ManifestEntry]:
+        """
+        Link `destination` to a copy of the image downloaded earlier into another folder.
+
+        Parameters:
+            image_id (str): The Imgur image ID
+            destination (Path): The path the image would be downloaded to
+
+        Returns:
+            ManifestEntry: The entry that was linked to, or None if the image must be downloaded
+        """
+        for entry in await self._manifest.run(self._manifest.find, image_id):
+            if await self._link(entry, destination):
+                return entry
+
+        return None
+
+    async def replace_duplicate(self, sha256: str, path: Path) -> bool:
+        """
+        Replace a freshly downloaded file with a link to an identical file on disk.
+
+        Parameters:
+            sha256 (str): The SHA-256 hex digest of the file
+            path (Path): The freshly downloaded file
+
+        Returns:
+            bool: True if the file was replaced by a link
+        """
+        for entry in await self._manifest.run(self._manifest.find_by_hash, sha256):
+            if await self._link(entry, path):
+                return True
+
+        return False
+
+    def log(self):
+        """
+        Log how much space deduplication saved this run.
+        """
+        if self.files_linked:
+            logger.info(f'Deduplication linked {self.files_linked} file(s), saving {self.bytes_saved / float(1 << 20):.2f} MB')
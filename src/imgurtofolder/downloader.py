@@ -1,191 +1,239 @@
 import asyncio
 import re
 from logging import getLogger
-from typing import List, Optional
+from typing import AsyncIterator, Awaitable, Iterable, Iterator, Optional
 
 from imgurtofolder.api import ImgurAPI
-from imgurtofolder.constants import IMGUR_BASE_EXTENSIONS
+from imgurtofolder.batch import BoundedSet, Checkpoint, read_lines
+from imgurtofolder.constants import IMGUR_URL_PATTERN
 from imgurtofolder.objects import (Account, Album, Gallery, Image,
                                    ImgurObjectResponse, ImgurObjectType,
-                                   Subreddit, Tag)
+                                   Subreddit, Tag, download_item)
 
 logger = getLogger(__name__)
 
 
+_IMGUR_URL: re.Pattern = re.compile(IMGUR_URL_PATTERN, re.VERBOSE)
+
+
 def parse_id(url: str) -> Optional[ImgurObjectResponse]:
     """
     Parses the url and returns a ImgurObjectResponse if it is a valid url
 
     Parameters:
         url (str): The url to parse
-        page (int): The page to start on
-        max_items (int): The maximum number of items to download
-        sort (str): The sort type
-        window (str): The window type
+
+    Raises:
+        ValueError: If the url is not an Imgur url
     """
 
-    for item in IMGUR_BASE_EXTENSIONS['album']:
-        _search = re.search(item, url)
+    search: Optional[re.Match] = _IMGUR_URL.search(url)
 
-        if not _search:
-            continue
+    if not search:
+        raise ValueError('Could not find image id in url')
 
-        return ImgurObjectResponse(
-            id=_search.group(2),
-            type=ImgurObjectType.ALBUM
-        )
+    if search['album']:
+        return ImgurObjectResponse(id=search['album'], type=ImgurObjectType.ALBUM)
 
-    for item in IMGUR_BASE_EXTENSIONS['gallery']:
-        _search = re.search(item, url)
+    if search['gallery']:
+        return ImgurObjectResponse(id=search['gallery'], type=ImgurObjectType.GALLERY)
 
-        if not _search:
-            continue
+    if search['subreddit']:
+        if search['subreddit_item']:
+            return ImgurObjectResponse(
+                id=search['subreddit_item'],
+                type=ImgurObjectType.SUBREDDIT,
+                subreddit=search['subreddit']
+            )
 
+        return ImgurObjectResponse(id=search['subreddit'], type=ImgurObjectType.SUBREDDIT)
+
+    if search['tag']:
+        return ImgurObjectResponse(id=search['tag'], type=ImgurObjectType.TAG)
+
+    if search['extension'] and search['host'].startswith('i.'):
         return ImgurObjectResponse(
-            id=_search.group(2),
-            type=ImgurObjectType.GALLERY
+            id=search['image'],
+            type=ImgurObjectType.DIRECT,
+            extension=search['extension'].lower()
         )
 
-    for item in IMGUR_BASE_EXTENSIONS['subreddit']:
+    return ImgurObjectResponse(id=search['image'], type=ImgurObjectType.IMAGE)
 
-        _search = re.search(item, url)
 
-        if not _search:
-            continue
+def download_url(url: str, api: ImgurAPI) -> Optional[Awaitable[None]]:
+    """
+    Create the download of a url.
 
-        subreddit = _search.group(2)
-        id = _search.group(3) if re.compile(item).groups > 2 else None
+    Parameters:
+        url (str): The url.
+        api (ImgurAPI): The Imgur API object.
 
-        if id is None and subreddit is not None:
-            return ImgurObjectResponse(
-                id=subreddit,
-                type=ImgurObjectType.SUBREDDIT
-            )
+    Returns:
+        Awaitable: The download, or None if there is nothing to download.
 
-        elif subreddit is not None and id is not None:
-            return ImgurObjectResponse(
-                id=id,
-                type=ImgurObjectType.SUBREDDIT,
-                subreddit=subreddit
-            )
+    Raises:
+        ValueError: If the url is not an Imgur url.
+    """
+    imgur_object: Optional[ImgurObjectResponse] = parse_id(url)
 
-    for item in IMGUR_BASE_EXTENSIONS['tag']:
+    if imgur_object is None:
+        return None
 
-        _search = re.search(item, url)
+    if imgur_object.type == ImgurObjectType.IMAGE:
+        return Image(imgur_object.id, api).download()
 
-        if not _search:
-            continue
+    elif imgur_object.type == ImgurObjectType.DIRECT:
 
-        return ImgurObjectResponse(
-            id=_search.group(2),
-            type=ImgurObjectType.TAG
+        if api._configuration.fetch_titles:
+            return Image(imgur_object.id, api).download()
+
+        return Image(imgur_object.id, api).download(
+            metadata=Image.direct_metadata(imgur_object.id, imgur_object.extension)
         )
 
-    search: Optional[re.Match] = re.search(IMGUR_BASE_EXTENSIONS['image'][0], url)
+    elif imgur_object.type == ImgurObjectType.ALBUM:
+        return Album(imgur_object.id, api).download()
 
-    if not search:
-        raise ValueError('Could not find image id in url')
+    elif imgur_object.type == ImgurObjectType.GALLERY:
+        return Gallery(imgur_object.id, api).download()
 
-    return ImgurObjectResponse(
-        id=search.group(3),
-        type=ImgurObjectType.IMAGE
-    )
+    elif imgur_object.type == ImgurObjectType.TAG:
+        return Tag(imgur_object.id, api).download()
+
+    elif imgur_object.type == ImgurObjectType.SUBREDDIT:
 
+        if imgur_object.subreddit is None:
+            return Subreddit(imgur_object.id, api).download()
+        else:
+            return Subreddit(imgur_object.id, api).download_from_subreddit(imgur_object.subreddit)
+
+    return None
 
-async def download_urls(urls: List[str], api: ImgurAPI):
+
+async def download_urls(urls: Iterable[str], api: ImgurAPI):
     """
     Download a list of urls.
 
     Parameters:
-        urls (List[str]): The list of urls.
+        urls (Iterable[str]): The urls.
         api (ImgurAPI): The Imgur API object.
     """
-    futures = []
-    for url in urls:
-        try:
-            imgur_object: Optional[ImgurObjectResponse] = parse_id(url)
 
-            if imgur_object is None:
-                continue
+    def downloads() -> Iterator[Awaitable]:
+        for url in urls:
+            try:
+                if (download := download_url(url, api)) is not None:
+                    yield download
 
-            if imgur_object.type == ImgurObjectType.IMAGE:
-                futures.append(
-                    Image(imgur_object.id, api).download()
-                )
+            except Exception as error:
+                logger.exception(f'Error with url {url}:')
+                api.scheduler.failures.record('url', url, error)
+
+    await api.scheduler.run(downloads())
+
+
+async def download_url_file(path: str, api: ImgurAPI):
+    """
+    Download every url of a file, one per line, reading it lazily.
 
-            elif imgur_object.type == ImgurObjectType.ALBUM:
-                futures.append(
-                    Album(imgur_object.id, api).download()
-                )
+    Blank lines and lines starting with '#' are ignored, and urls seen
+    recently are skipped. Unless the file is '-' (stdin), progress is
+    checkpointed next to it so an interrupted run resumes after the last
+    line that finished.
+
+    Parameters:
+        path (str): The path to the file, or '-' to read stdin.
+        api (ImgurAPI): The Imgur API object.
+    """
+    seen = BoundedSet()
+    checkpoint = None if path == '-' else Checkpoint(f'{path}.checkpoint', api.writer)
+    starting_line = checkpoint.load() if checkpoint else 0
+
+    if starting_line:
+        logger.info(f'Resuming {path} after line {starting_line}')
+
+    async def tracked(line_number: int, download: Awaitable[None]):
+        try:
+            await download
+        finally:
+            await checkpoint.complete(line_number)
 
-            elif imgur_object.type == ImgurObjectType.GALLERY:
-                futures.append(
-                    Gallery(imgur_object.id, api).download()
-                )
+    async def downloads() -> AsyncIterator[Awaitable]:
+        async for line_number, line in read_lines(path, api.writer, starting_line=starting_line):
+            url = line.strip()
+            download = None
 
-            elif imgur_object.type == ImgurObjectType.TAG:
-                futures.append(
-                    Tag(imgur_object.id, api).download()
-                )
+            try:
+                if url and not url.startswith('#') and seen.add(url):
+                    download = download_url(url, api)
 
-            elif imgur_object.type == ImgurObjectType.SUBREDDIT:
+            except Exception as error:
+                logger.exception(f'Error with url {url} on line {line_number}:')
+                api.scheduler.failures.record('url', url, error)
 
-                if imgur_object.id and imgur_object.subreddit:
-                    futures.append(
-                        Subreddit(imgur_object.id, api).download()
-                    )
-                else:
-                    futures.append(
-                        Subreddit(imgur_object.id, api).download_from_subreddit(imgur_object.subreddit)
-                    )
+            if checkpoint is None:
+                if download is not None:
+                    yield download
 
-        except Exception:
-            logger.exception(f'Error with url {url}:')
+            elif download is not None:
+                yield tracked(line_number, download)
 
-    await asyncio.gather(*futures)
+            else:
+                await checkpoint.complete(line_number)
+
+    try:
+        await api.scheduler.run(downloads())
+    except asyncio.CancelledError:
+        if checkpoint:
+            await checkpoint.save()  # Resume after the last finished line, not the last periodic save
+        raise
+
+    if checkpoint:
+        await checkpoint.finish()
 
 
 async def download_favorites(username: str, api: ImgurAPI, sort: str = 'newest', starting_page: int = 0, max_items: Optional[int] = None):
     """
-    Downloads the favorites of the user
+    Downloads the favorites of the user as their pages arrive
 
     Parameters:
+        username (str): The username of the account
+        api (ImgurAPI): The Imgur API object
         sort (str): The sort type
-        page (int): The page to start on
+        starting_page (int): The page to start on
         max_items (int): The maximum number of items to download
     """
 
-    _args = {
-        'page': starting_page,
-        'sort': sort,
-    }
-    if max_items:
-        _args['max_items'] = max_items
-
-    favorites = await Account(username, api).get_account_favorites(username, **_args)
-
-    futures = []
-    for favorite in favorites:
-        if favorite['is_album']:
-            futures.append(
-                Album(favorite['id'], api).download()
-            )
-
-        else:
-            futures.append(
-                Image(favorite['id'], api).download()
-            )
+    favorites = Account(username, api).iter_account_favorites(
+        username,
+        sort=sort,
+        page=starting_page,
+        max_items=max_items or -1
+    )
 
-    await asyncio.gather(*futures)
+    await api.scheduler.run(
+        download_item(favorite, api) async for favorite in favorites
+    )
 
 
 async def download_account_images(username: str, api: ImgurAPI, starting_page: int = 0, max_items: int = 30):
     """
-    Downloads the images of the user specified
+    Downloads the images of the user specified as their pages arrive
 
     Parameters:
-        page (int): The page to start on
+        username (str): The username of the account
+        api (ImgurAPI): The Imgur API object
+        starting_page (int): The page to start on
         max_items (int): The maximum number of items to download
     """
-    account_images = await Account(username, api).get_account_images(username, starting_page=starting_page, max_items=max_items)
-    await download_urls([image['link'] for image in account_images if 'link' in image], api)
+
+    account_images = Account(username, api).iter_account_images(
+        username,
+        starting_page=starting_page,
+        max_items=max_items
+    )
+
+    await api.scheduler.run(
+        download_item(image, api) async for image in account_images
+    )
@@ -0,0 +1,263 @@
+import json
+import time
+from dataclasses import dataclass, field
+from logging import getLogger
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from imgurtofolder.store import SQLiteStore
+
+logger = getLogger(__name__)
+
+
+@dataclass
+class ManifestEntry:
+
+    image_id: str
+    folder: str
+    path: str
+    size: Optional[int] = None
+    sha256: Optional[str] = None
+    fetched_at: float = field(default_factory=time.time)
+
+
+@dataclass
+class ListingState:
+
+    high_water: Optional[str] = None
+    retries: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    resume_page: Optional[int] = None
+    resume_high_water: Optional[str] = None
+
+
+class Manifest(SQLiteStore):
+    """
+    On-disk index of every image downloaded so far.
+
+    Entries are keyed by Imgur image ID and destination folder, so an image is
+    still known after its file was renamed or moved, and the same image saved
+    into two albums is tracked once per album.
+
+    The methods block on SQLite, so async code calls them through `run`, on
+    the manifest's own thread. New entries are written in batches of
+    `BATCH_SIZE`, or once the oldest waited `BATCH_SECONDS`; lookups already
+    see them, and `flush` and `close` write whatever is left.
+    """
+
+    BATCH_SIZE: int = 64
+    BATCH_SECONDS: float = 1.0
+
+    _NAME = 'manifest'
+    _SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS images (
+            image_id TEXT NOT NULL,
+            folder TEXT NOT NULL,
+            path TEXT NOT NULL,
+            size INTEGER,
+            sha256 TEXT,
+            fetched_at REAL NOT NULL,
+            PRIMARY KEY (image_id, folder)
+        );
+        CREATE INDEX IF NOT EXISTS images_sha256 ON images (sha256);
+        CREATE TABLE IF NOT EXISTS listing_items (
+            source TEXT NOT NULL,
+            item_id TEXT NOT NULL,
+            seen_at REAL NOT NULL,
+            PRIMARY KEY (source, item_id)
+        );
+        CREATE TABLE IF NOT EXISTS listings (
+            source TEXT PRIMARY KEY,
+            high_water TEXT,
+            retries TEXT NOT NULL,
+            resume_page INTEGER,
+            resume_high_water TEXT,
+            synced_at REAL NOT NULL
+        );
+    '''
+
+    def __init__(self, path: str):
+        """
+        Parameters:
+            path (str): The path to the SQLite database; created on first use
+        """
+        super().__init__(path)
+        self._pending: Dict[Tuple[str, str], ManifestEntry] = {}
+        self._pending_since = 0.0
+
+    def get(self, image_id: str, folder: str) -> Optional[ManifestEntry]:
+        """
+        Get the entry of an image downloaded into a folder.
+
+        Parameters:
+            image_id (str): The Imgur image ID
+            folder (str): The folder the image was downloaded into
+
+        Returns:
+            ManifestEntry: The entry, or None if the image was never downloaded there
+        """
+        if (entry := self._pending.get((image_id, folder))) is not None:
+            return entry
+
+        row = self.connection.execute(
+            'SELECT image_id, folder, path, size, sha256, fetched_at FROM images WHERE image_id = ? AND folder = ?',
+            (image_id, folder)
+        ).fetchone()
+        return ManifestEntry(*row) if row else None
+
+    def find(self, image_id: str) -> List[ManifestEntry]:
+        """
+        Get every entry of an image, whichever folder it was downloaded into.
+
+        Parameters:
+            image_id (str): The Imgur image ID
+
+        Returns:
+            List[ManifestEntry]: The entries, most recent first
+        """
+        rows = self.connection.execute(
+            'SELECT image_id, folder, path, size, sha256, fetched_at FROM images WHERE image_id = ?',
+            (image_id,)
+        ).fetchall()
+        entries = self._with_pending(rows, lambda entry: entry.image_id == image_id)
+        return sorted(entries, key=lambda entry: entry.fetched_at, reverse=True)
+
+    def find_by_hash(self, sha256: str) -> List[ManifestEntry]:
+        """
+        Get every entry whose file has the given content hash.
+
+        Parameters:
+            sha256 (str): The SHA-256 hex digest of the file
+
+        Returns:
+            List[ManifestEntry]: The entries, oldest first
+        """
+        rows = self.connection.execute(
+            'SELECT image_id, folder, path, size, sha256, fetched_at FROM images WHERE sha256 = ?',
+            (sha256,)
+        ).fetchall()
+        entries = self._with_pending(rows, lambda entry: entry.sha256 == sha256)
+        return sorted(entries, key=lambda entry: entry.fetched_at)
+
+    def _with_pending(self, rows: List[Tuple], matches: Callable[[ManifestEntry], bool]) -> List[ManifestEntry]:
+        """
+        The entries of `rows`, as updated by the pending entries, without writing the batch.
+
+        Parameters:
+            rows (List[Tuple]): The rows of the images table a query matched
+            matches (Callable): Whether a pending entry matches the same query
+
+        Returns:
+            List[ManifestEntry]: The entries
+        """
+        entries = {(row[0], row[1]): ManifestEntry(*row) for row in rows}
+
+        for key, entry in self._pending.items():
+            if matches(entry):
+                entries[key] = entry
+            else:
+                # The pending entry replaces a row that no longer matches
+                entries.pop(key, None)
+
+        return list(entries.values())
+
+    def add(self, entry: ManifestEntry):
+        """
+        Record a downloaded image, replacing any previous entry for the same folder.
+
+        Parameters:
+            entry (ManifestEntry): The entry to record
+        """
+        if not self._pending:
+            self._pending_since = time.monotonic()
+
+        self._pending[(entry.image_id, entry.folder)] = entry
+
+        if len(self._pending) >= self.BATCH_SIZE or time.monotonic() - self._pending_since >= self.BATCH_SECONDS:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the entries added since the last batch, in one transaction.
+        """
+        if not self._pending:
+            return
+
+        entries, self._pending = list(self._pending.values()), {}
+        connection = self.connection
+
+        with connection:
+            connection.execute('BEGIN')
+            connection.executemany(
+                'INSERT OR REPLACE INTO images (image_id, folder, path, size, sha256, fetched_at) VALUES (?, ?, ?, ?, ?, ?)',
+                [(entry.image_id, entry.folder, entry.path, entry.size, entry.sha256, entry.fetched_at) for entry in entries]
+            )
+
+    def has_seen(self, source: str, item_id: str) -> bool:
+        """
+        Whether an item of a watched listing was already synced.
+
+        Parameters:
+            source (str): The listing, e.g. 'subreddit:aww'
+            item_id (str): The Imgur ID of the album or image
+
+        Returns:
+            bool: True if the item was marked as seen
+        """
+        return self.connection.execute(
+            'SELECT 1 FROM listing_items WHERE source = ? AND item_id = ?',
+            (source, item_id)
+        ).fetchone() is not None
+
+    def mark_seen(self, source: str, item_id: str):
+        """
+        Record that an item of a watched listing was synced.
+
+        Parameters:
+            source (str): The listing, e.g. 'subreddit:aww'
+            item_id (str): The Imgur ID of the album or image
+        """
+        self.connection.execute(
+            'INSERT OR REPLACE INTO listing_items (source, item_id, seen_at) VALUES (?, ?, ?)',
+            (source, item_id, time.time())
+        )
+
+    def get_listing(self, source: str) -> ListingState:
+        """
+        Get the sync state of a watched listing.
+
+        Parameters:
+            source (str): The listing, e.g. 'subreddit:aww'
+
+        Returns:
+            ListingState: The state saved by the last sync; empty if the listing was never synced
+        """
+        row = self.connection.execute(
+            'SELECT high_water, retries, resume_page, resume_high_water FROM listings WHERE source = ?',
+            (source,)
+        ).fetchone()
+
+        if row is None:
+            return ListingState()
+
+        return ListingState(row[0], json.loads(row[1]), row[2], row[3])
+
+    def save_listing(self, source: str, state: ListingState):
+        """
+        Record the sync state of a watched listing.
+
+        Parameters:
+            source (str): The listing, e.g. 'subreddit:aww'
+            state (ListingState): The state once the sync completed
+        """
+        self.flush()
+        self.connection.execute(
+            'INSERT OR REPLACE INTO listings (source, high_water, retries, resume_page, resume_high_water, synced_at) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            (source, state.high_water, json.dumps(state.retries), state.resume_page, state.resume_high_water, time.time())
+        )
+
+    def close(self):
+        """
+        Write the pending entries and close the database connection.
+        """
+        self.flush()
+        super().close()
@@ -0,0 +1,430 @@
+import asyncio
+import json
+import os
+import sys
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from logging import getLogger
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, TextIO, Tuple
+
+from imgurtofolder.writer import FileWriter
+
+logger = getLogger(__name__)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+PROMETHEUS_PREFIX = 'imgurtofolder_'
+
+
+def _labels(labels: Dict[str, str]) -> Labels:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: Labels = ()) -> str:
+    _all = labels + extra
+    return '{' + ','.join(f'{name}="{value}"' for name, value in _all) + '}' if _all else ''
+
+
+class Histogram:
+    """
+    Counts observations into fixed buckets, like a Prometheus histogram.
+    """
+
+    BUCKETS: Tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+    def __init__(self):
+        self.counts: List[int] = [0] * (len(self.BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        """
+        Record an observation.
+
+        Parameters:
+            value (float): The observed value
+        """
+        self.counts[bisect_left(self.BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        The upper bound of the bucket holding the `q` quantile, or None without observations.
+
+        Parameters:
+            q (float): The quantile, between 0 and 1
+        """
+        if not self.count:
+            return None
+
+        rank = q * self.count
+        seen = 0
+
+        for bound, count in zip(self.BUCKETS + (float('inf'),), self.counts):
+            seen += count
+
+            if seen >= rank:
+                return bound
+
+        return float('inf')
+
+
+class Metrics:
+    """
+    Counters, histograms and sampled gauges describing a run.
+
+    Counters and histograms are updated where the work happens. Gauges and
+    counters owned by other objects, like the queue depth or the rate-limit
+    credits, are registered as callbacks and read only when reported.
+    Counters exported by worker processes are added to the ones of this
+    process when reported.
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.counters: Dict[str, Dict[Labels, float]] = defaultdict(lambda: defaultdict(float))
+        self.histograms: Dict[str, Dict[Labels, Histogram]] = defaultdict(lambda: defaultdict(Histogram))
+        self._sampled: Dict[str, Tuple[str, Callable[[], Optional[float]]]] = {}
+        self._external: Dict[str, Dict[str, Dict[Labels, float]]] = {}
+
+    def inc(self, name: str, amount: float = 1, **labels: str):
+        """
+        Increase a counter.
+
+        Parameters:
+            name (str): The counter
+            amount (float): The increment
+            **labels: The labels of the series
+        """
+        self.counters[name][_labels(labels)] += amount
+
+    def observe(self, name: str, value: float, **labels: str):
+        """
+        Record an observation in a histogram.
+
+        Parameters:
+            name (str): The histogram
+            value (float): The observed value
+            **labels: The labels of the series
+        """
+        self.histograms[name][_labels(labels)].observe(value)
+
+    def sample(self, name: str, callback: Callable[[], Optional[float]], kind: str = 'gauge'):
+        """
+        Register a value read from `callback` whenever metrics are reported.
+
+        Parameters:
+            name (str): The metric
+            callback (Callable): Returns the current value, or None if it is unknown
+            kind (str): 'gauge' or 'counter'
+        """
+        self._sampled[name] = (kind, callback)
+
+    def export(self) -> Dict[str, Dict[Labels, float]]:
+        """
+        The counters and sampled counters, to be merged into the metrics of another process.
+        """
+        exported = {name: dict(series) for name, series in self.counters.items()}
+
+        for name, (kind, callback) in self._sampled.items():
+            if kind == 'counter' and (value := callback()) is not None:
+                exported[name] = {(): value}
+
+        return exported
+
+    def merge(self, source: str, counters: Dict[str, Dict[Labels, float]]):
+        """
+        Replace the counters last exported by another process.
+
+        Parameters:
+            source (str): The name of the process
+            counters (dict): The counters returned by its `export`
+        """
+        self._external[source] = counters
+
+    def _combined(self) -> Dict[str, Dict[Labels, float]]:
+        combined: Dict[str, Dict[Labels, float]] = defaultdict(lambda: defaultdict(float))
+
+        for counters in (self.counters, *self._external.values()):
+            for name, series in counters.items():
+                for labels, value in series.items():
+                    combined[name][labels] += value
+
+        return combined
+
+    def _external_value(self, name: str, labels: Labels = ()) -> float:
+        return sum(counters.get(name, {}).get(labels, 0) for counters in self._external.values())
+
+    def value(self, name: str, **labels: str) -> float:
+        """
+        The value of a counter series, or of a sampled metric.
+
+        Parameters:
+            name (str): The counter or sampled metric
+            **labels: The labels of the counter series
+        """
+        if name in self._sampled:
+            return (self.sampled(name) or 0) + self._external_value(name)
+
+        return self.counters.get(name, {}).get(_labels(labels), 0) + self._external_value(name, _labels(labels))
+
+    def sampled(self, name: str) -> Optional[float]:
+        """
+        The current value of a sampled metric, or None if it is unknown or not registered.
+        """
+        if name not in self._sampled:
+            return None
+
+        return self._sampled[name][1]()
+
+    def _sampled_values(self) -> Dict[str, Optional[float]]:
+        """
+        The current value of every sampled metric; sampled counters include the exported ones.
+        """
+        values = {}
+
+        for name, (kind, callback) in self._sampled.items():
+            value = callback()
+
+            if kind == 'counter':
+                value = (value or 0) + self._external_value(name)
+
+            values[name] = value
+
+        return values
+
+    def total(self, name: str) -> float:
+        """
+        The sum of every series of a counter.
+        """
+        return sum(self._combined().get(name, {}).values())
+
+    @property
+    def elapsed(self) -> float:
+        """
+        Seconds since the metrics were created.
+        """
+        return time.monotonic() - self.started
+
+    def snapshot(self) -> Dict[str, object]:
+        """
+        Every metric as a JSON-serializable dictionary.
+        """
+        _snapshot: Dict[str, object] = {
+            'time': time.time(),
+            'elapsed': round(self.elapsed, 3),
+        }
+
+        sampled = self._sampled_values()
+
+        for name, series in self._combined().items():
+            for labels, value in series.items():
+                if name not in sampled:
+                    _snapshot[name + _format_labels(labels)] = value
+
+        _snapshot.update(sampled)
+
+        for name, series in self.histograms.items():
+            for labels, histogram in series.items():
+                _snapshot[name + _format_labels(labels)] = {
+                    'count': histogram.count,
+                    'sum': round(histogram.sum, 3),
+                    'p50': histogram.quantile(0.5),
+                    'p95': histogram.quantile(0.95),
+                }
+
+        return _snapshot
+
+    def prometheus(self) -> str:
+        """
+        Every metric in the Prometheus text exposition format.
+        """
+        lines = []
+
+        sampled = self._sampled_values()
+
+        for name, series in sorted(self._combined().items()):
+            if name in sampled:
+                continue
+
+            lines.append(f'# TYPE {PROMETHEUS_PREFIX}{name} counter')
+            lines.extend(f'{PROMETHEUS_PREFIX}{name}{_format_labels(labels)} {value}' for labels, value in series.items())
+
+        for name, value in sorted(sampled.items()):
+            if value is not None:
+                lines.append(f'# TYPE {PROMETHEUS_PREFIX}{name} {self._sampled[name][0]}')
+                lines.append(f'{PROMETHEUS_PREFIX}{name} {value}')
+
+        for name, series in sorted(self.histograms.items()):
+            lines.append(f'# TYPE {PROMETHEUS_PREFIX}{name} histogram')
+
+            for labels, histogram in series.items():
+                cumulative = 0
+
+                for bound, count in zip(histogram.BUCKETS + (float('inf'),), histogram.counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else str(bound)
+                    lines.append(f'{PROMETHEUS_PREFIX}{name}_bucket{_format_labels(labels, (("le", le),))} {cumulative}')
+
+                lines.append(f'{PROMETHEUS_PREFIX}{name}_sum{_format_labels(labels)} {histogram.sum}')
+                lines.append(f'{PROMETHEUS_PREFIX}{name}_count{_format_labels(labels)} {histogram.count}')
+
+        return '\n'.join(lines) + '\n'
+
+    def progress(self) -> str:
+        """
+        A one line summary of the run so far.
+        """
+        megabytes = self.total('downloaded_bytes') / float(1 << 20)
+        throughput = megabytes / max(self.elapsed, 1e-9)
+        _progress = (
+            f'{self.value("images", outcome="downloaded"):.0f} downloaded, '
+            f'{self.value("images", outcome="skipped"):.0f} skipped, '
+            f'{self.value("images", outcome="linked"):.0f} linked, '
+            f'{self.value("failed_items"):.0f} failed | '
+            f'{megabytes:.1f} MB at {throughput:.2f} MB/s'
+        )
+
+        if cap := self.sampled('max_bandwidth_bytes'):
+            cap /= float(1 << 20)
+            _progress += f' ({throughput / cap:.0%} of the {cap:.2f} MB/s cap)'
+
+        _progress += (
+            f' | {self.total("requests"):.0f} requests, {self.value("retries"):.0f} retries | '
+            f'queue {self.value("queue_depth"):.0f}'
+        )
+
+        if (remaining := self.sampled('rate_limit_user_remaining')) is not None:
+            _progress += f' | {remaining:.0f} user credits left'
+
+        return _progress
+
+
+class MetricsReporter:
+    """
+    Periodically reports metrics while a run is in progress.
+
+    Reports go to a live progress line on stderr, a JSON-lines stats log
+    and a Prometheus text file, each only if enabled. Leaving the context
+    writes a final report.
+    """
+
+    DEFAULT_INTERVAL: float = 10.0
+    PROGRESS_INTERVAL: float = 0.5
+
+    def __init__(
+            self,
+            metrics: Metrics,
+            writer: FileWriter,
+            interval: float = DEFAULT_INTERVAL,
+            progress: bool = False,
+            stats_log: Optional[str] = None,
+            prometheus_file: Optional[str] = None,
+            stream: TextIO = sys.stderr
+    ):
+        """
+        Parameters:
+            metrics (Metrics): The metrics to report
+            writer (FileWriter): The pool to write the files on
+            interval (float): Seconds between writes of the stats log and the Prometheus file
+            progress (bool): If True, show a live progress line
+            stats_log (str): The path to append JSON-lines snapshots to
+            prometheus_file (str): The path to keep the Prometheus text exposition in
+            stream (TextIO): Where the progress line is shown
+        """
+        self.metrics = metrics
+        self.interval = interval
+        self.progress = progress
+        self.stats_log = Path(stats_log) if stats_log else None
+        self.prometheus_file = Path(prometheus_file) if prometheus_file else None
+        self._writer = writer
+        self._stream = stream
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        """
+        Whether there is anything to report to.
+        """
+        return bool(self.progress or self.stats_log or self.prometheus_file)
+
+    async def __aenter__(self) -> 'MetricsReporter':
+        if self.enabled:
+            self._task = asyncio.create_task(self._run())
+        return self
+
+    async def __aexit__(self, *exc_info):
+        if self._task is None:
+            return
+
+        self._task.cancel()
+
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+        self._task = None
+        await self.report()
+
+        if self.progress:
+            self._stream.write('\n')
+            self._stream.flush()
+
+    async def _run(self):
+        last_report = time.monotonic()
+
+        while True:
+            await asyncio.sleep(self.PROGRESS_INTERVAL if self.progress else self.interval)
+
+            if self.progress:
+                self.show_progress()
+
+            if time.monotonic() - last_report >= self.interval:
+                last_report = time.monotonic()
+
+                try:
+                    await self.report(show_progress=False)
+                except OSError:
+                    logger.warning('Could not write metrics', exc_info=True)
+
+    def show_progress(self):
+        """
+        Redraw the progress line; on a non-terminal stream, write it as a new line instead.
+        """
+        line = self.metrics.progress()
+
+        if self._stream.isatty():
+            self._stream.write(f'\r\033[K{line}')
+        else:
+            self._stream.write(f'{line}\n')
+
+        self._stream.flush()
+
+    async def report(self, show_progress: bool = True):
+        """
+        Report the metrics to every enabled output.
+
+        Parameters:
+            show_progress (bool): Whether to redraw the progress line too
+        """
+        if self.progress and show_progress:
+            self.show_progress()
+
+        if self.stats_log:
+            await self._writer.run(self._append_stats, json.dumps(self.metrics.snapshot()))
+
+        if self.prometheus_file:
+            await self._writer.run(self._write_prometheus, self.metrics.prometheus())
+
+    def _append_stats(self, line: str):
+        with self.stats_log.open('a') as current_file:
+            current_file.write(line + '\n')
+
+    def _write_prometheus(self, text: str):
+        temporary = self.prometheus_file.with_name(self.prometheus_file.name + '.tmp')
+        temporary.write_text(text)
+        os.replace(temporary, self.prometheus_file)
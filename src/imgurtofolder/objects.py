@@ -1,15 +1,19 @@
-import asyncio
-import shutil
+import functools
+import hashlib
+import os
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
 from enum import Enum
 from logging import getLogger
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, AsyncIterator, Awaitable, Dict, List, Optional, Tuple
 
-import requests
+import httpx
 
-from imgurtofolder.api import ImgurAPI
+from imgurtofolder.api import ImgurAPI, IncompleteDownloadError
+from imgurtofolder.manifest import ManifestEntry
+from imgurtofolder.pagination import paginate
+from imgurtofolder.ratelimit import BandwidthLimiter, throttle
 
 logger = getLogger(__name__)
 
@@ -20,6 +24,7 @@ class ImgurObjectType(Enum):
     SUBREDDIT = 3
     TAG = 4
     IMAGE = 5
+    DIRECT = 6
 
 
 @dataclass
@@ -28,6 +33,7 @@ class ImgurObjectResponse:
     id: str
     type: ImgurObjectType
     subreddit: Optional[str] = None
+    extension: Optional[str] = None
 
 
 ##### Helper functions #####
@@ -43,6 +49,50 @@ def replace_characters(word):
 
     return word.strip()
 
+
+def reports_failures(method):
+    """
+    Records a download that raises in the run's failure report, then re-raises.
+    """
+
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        try:
+            return await method(self, *args, **kwargs)
+        except Exception as error:
+            self.api.scheduler.failures.record(self.__class__.__name__.lower(), self.id, error)
+            raise
+
+    return wrapper
+
+
+def file_size(path: Path) -> Optional[int]:
+    """
+    Returns the size of a file, or None if it does not exist.
+    """
+    try:
+        return path.stat().st_size
+    except FileNotFoundError:
+        return None
+
+
+def hash_file(path: Path, digest):
+    """
+    Updates a hashlib object with the contents of a file.
+    """
+    with path.open('rb') as current_file:
+        while chunk := current_file.read(1 << 20):
+            digest.update(chunk)
+
+
+def content_range_total(value: Optional[str]) -> Optional[int]:
+    """
+    Returns the complete length from a Content-Range header such as 'bytes */1234', or None if unknown.
+    """
+    _, _, total = (value or '').rpartition('/')
+    return int(total) if total.isdigit() else None
+
+
 ##### Downloadables #####
 
 
@@ -62,73 +112,54 @@ class Downloadable(ABC):
         """
         ...
 
-    async def download(self, starting_page: int = 0, max_items: int = 30):
+    def iter_items(self, starting_page: int = 0, max_items: Optional[int] = 30) -> AsyncIterator[Dict[str, Any]]:
         """
-        Downloads all items from current id.
+        Iterates over the items of the current id as their pages arrive.
 
         Parameters:
             starting_page (int): The page number to start on
             max_items (int): The maximum number of items to return
         """
 
-        async def get_items():
+        async def get_page(page: int) -> List[Dict[str, Any]]:
             """
-            Gets all items from current id.
+            Gets the items of a page of the current id.
+
+            Parameters:
+                page (int): The page number
 
             Returns:
-                list: The items from the id
+                list: The items of the page
             """
+            response = await self.get_metadata(page=page)
 
-            items = []
-            _page = starting_page
-
-            while response := await self.get_metadata(page=_page):
-
-                _items = response
-
-                if isinstance(_items, dict):
-                    _items = response.get('items') or []
-
-                items.extend(_items)
+            if isinstance(response, dict):
+                return response.get('items') or []
 
-                if (
-                        len(_items) == 0
-                        or
-                        len(items) > max_items
-                ):
-                    return _items[:max_items]
+            return response or []
 
-                _page += 1
+        return paginate(
+            get_page,
+            starting_page=starting_page,
+            max_items=max_items,
+            window=self.api._configuration.page_window
+        )
 
-            return items[:max_items]
+    @reports_failures
+    async def download(self, starting_page: int = 0, max_items: int = 30):
+        """
+        Downloads all items from current id.
 
+        Parameters:
+            starting_page (int): The page number to start on
+            max_items (int): The maximum number of items to return
+        """
         logger.debug(f'Getting {self.__class__.__name__} details')
-        items = await get_items()
-
-        futures = []
-        for item in items:
-
-            if item.get('is_album') is True:
-                futures.append(
-                    asyncio.create_task(
-                        Album(
-                            id=item['id'],
-                            api=self.api
-                        ).download()
-                    )
-                )
-
-            else:
-                futures.append(
-                    asyncio.create_task(
-                        Image(
-                            id=item['id'],
-                            api=self.api
-                        ).download()
-                    )
-                )
 
-        await asyncio.gather(*futures)
+        await self.api.scheduler.run(
+            download_item(item, self.api)
+            async for item in self.iter_items(starting_page=starting_page, max_items=max_items)
+        )
 
 
 class Image(Downloadable):
@@ -136,6 +167,77 @@ class Image(Downloadable):
     Class which holds all the methods for downloading images.
     """
 
+    REQUIRED_METADATA = ('link',)
+
+    CDN_URL = 'https://i.imgur.com'
+
+    RENDITIONS = ('original', 'mp4', 'smallest')
+
+    @classmethod
+    def direct_metadata(cls, id: str, extension: str) -> Dict[str, Any]:
+        """
+        Builds the metadata of a direct i.imgur.com link without asking the API.
+
+        The file is named by the image ID and the link's extension.
+
+        Parameters:
+            id (str): The image ID
+            extension (str): The extension of the link, such as '.jpg'
+
+        Returns:
+            dict: Metadata for `download`
+        """
+        # .gifv links are html pages wrapping the .mp4
+        _extension = '.mp4' if extension.lower() == '.gifv' else extension.lower()
+
+        return {
+            'id': id,
+            'link': f'{cls.CDN_URL}/{id}{_extension}'
+        }
+
+    @staticmethod
+    def select_rendition(metadata: Dict[str, Any], prefer: str = 'original') -> Dict[str, Any]:
+        """
+        Picks the rendition of an image to download from its metadata, without asking the API.
+
+        Animated images come as the original upload, often a GIF, and as an
+        mp4 that is usually several times smaller. 'original' keeps `link`,
+        'mp4' takes the mp4 of animated images, and 'smallest' takes the mp4
+        only when both sizes are known and it is smaller.
+
+        Parameters:
+            metadata (dict): The image metadata
+            prefer (str): One of `RENDITIONS`
+
+        Returns:
+            dict: The metadata, with `link` and `size` of the chosen rendition
+        """
+        if prefer == 'original' or not metadata.get('animated') or not metadata.get('mp4'):
+            return metadata
+
+        mp4 = {**metadata, 'link': metadata['mp4'], 'size': metadata.get('mp4_size')}
+
+        if prefer == 'mp4':
+            return mp4
+
+        if metadata.get('mp4_size') and metadata.get('size') and metadata['mp4_size'] < metadata['size']:
+            return mp4
+
+        return metadata
+
+    @staticmethod
+    def file_name(metadata: Dict[str, Any], enumeration: Optional[int] = None) -> str:
+        """
+        The name an image is saved under: its title, or its ID, and the extension of its link.
+
+        Parameters:
+            metadata (dict): The image metadata
+            enumeration (int): The position of the image in its album
+        """
+        _title = metadata.get('title') or metadata.get('id')
+        suffix = Path(metadata.get('link', '')).suffix
+        return f"{_title}{(' - ' + str(enumeration)) if enumeration else ''}{suffix}"
+
     async def get_metadata(self, **kwargs) -> Optional[dict]:
         """
         Gets the metadata for the image using the API.
@@ -152,60 +254,208 @@ class Image(Downloadable):
         )
         return (meta or {}).get('data')
 
-    async def download(self, path: Optional[str] = None, enumeration: Optional[int] = None) -> None:
+    @reports_failures
+    async def download(
+            self,
+            path: Optional[str] = None,
+            enumeration: Optional[int] = None,
+            metadata: Optional[Dict[str, Any]] = None
+    ) -> None:
         """
         Downloads a file from a url to a path
 
         Parameters:
-            kwargs: Additional arguments
+            path (str): The folder to download to. Default: the configured download path
+            enumeration (int): The position of the image in its album
+            metadata (dict): Image metadata already fetched by a listing; the API is only
+                asked again if a required field is missing
 
         Raises:
             ValueError: If the response code is not 200
         """
 
-        metadata = await self.get_metadata()
-
-        _title = metadata.get('title') or metadata.get('id')
-        suffix = Path(metadata.get('link', '')).suffix
-        _filename = f"{_title}{(' - ' + str(enumeration)) if enumeration else ''}{suffix}"
-        _url = metadata.get('link')
-
         _path = Path(
             path
             or
             self.api._configuration.download_path
         )
 
-        if not _path.exists():
-            logger.debug(f'Creating folder path {_path}')
-            _path.mkdir(parents=True, exist_ok=True)
+        if not self.api._configuration.overwrite and (entry := await self.api.manifest.run(self.api.manifest.get, self.id, str(_path))):
+            logger.info(f'Skipping {self.id} because it was already downloaded to {entry.path}')
+            self.api.metrics.inc('images', outcome='skipped')
+            return
+
+        if not metadata or any(not metadata.get(field) for field in self.REQUIRED_METADATA):
+            metadata = {**(metadata or {}), **(await self.get_metadata() or {})}
+
+        metadata = self.select_rendition(metadata, self.api._configuration.prefer)
+        _filename = self.file_name(metadata, enumeration)
+        _url = metadata.get('link')
+
+        logger.debug(f'Creating folder path {_path}')
+        await self.api.writer.run(_path.mkdir, parents=True, exist_ok=True)
 
         _full_path = _path / _filename
 
-        if not self.api._configuration.overwrite and _full_path.exists():
+        if not self.api._configuration.overwrite and (_existing_size := await self.api.writer.run(file_size, _full_path)) is not None:
             logger.info(f'Skipping {_full_path} because it already exists')
+            self.api.metrics.inc('images', outcome='skipped')
+            await self.api.manifest.run(
+                self.api.manifest.add,
+                ManifestEntry(
+                    image_id=self.id,
+                    folder=str(_path),
+                    path=str(_full_path),
+                    size=_existing_size
+                )
+            )
             return
 
-        response: requests.Response = await self.api.get(
-            _url,
-            return_raw_response=True,
-            include_default_headers=False,
-            stream=True,
-            headers={
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/114.0',
-            }
+        if self.api.deduplicator and (_source := await self.api.deduplicator.link_known_image(self.id, _full_path)):
+            self.api.metrics.inc('images', outcome='linked')
+            await self.api.manifest.run(
+                self.api.manifest.add,
+                ManifestEntry(
+                    image_id=self.id,
+                    folder=str(_path),
+                    path=str(_full_path),
+                    size=_source.size,
+                    sha256=_source.sha256
+                )
+            )
+            return
+
+        async def attempt() -> Tuple[int, str]:
+            async with self.api.scheduler.download_slots:
+                return await self._stream_to_file(_url, _full_path, metadata.get('size'))
+
+        _size, _sha256 = await self.api.download_retry_policy.run(attempt, f'Download of {_url}')
+
+        self.api.metrics.inc('images', outcome='downloaded')
+
+        if self.api.deduplicator:
+            await self.api.deduplicator.replace_duplicate(_sha256, _full_path)
+
+        await self.api.manifest.run(
+            self.api.manifest.add,
+            ManifestEntry(
+                image_id=self.id,
+                folder=str(_path),
+                path=str(_full_path),
+                size=_size,
+                sha256=_sha256
+            )
         )
-        response.raise_for_status()
 
-        file_size = int(response.headers.get('content-length', 0)) / float(1 << 20)
+    async def _stream_to_file(self, url: str, full_path: Path, expected_size: Optional[int] = None) -> Tuple[int, str]:
+        """
+        Streams a url into `<full_path>.part` and renames it to `full_path` once complete.
+
+        A `.part` file left by an interrupted download is resumed with a `Range`
+        request; if the server ignores the range the download starts over.
+        If the server rejects the range, a `.part` file of the full size is
+        already complete and is kept; any other is deleted and the download
+        starts over once. An incomplete transfer keeps the `.part` file for
+        the next run.
+
+        Parameters:
+            url (str): The CDN url to download
+            full_path (Path): The final path of the file
+            expected_size (int): The size from the image metadata, if known
+
+        Returns:
+            Tuple[int, str]: The size and SHA-256 hex digest of the file
+
+        Raises:
+            IncompleteDownloadError: If fewer bytes arrived than the server or the metadata announced
+        """
+        _part_path = full_path.with_name(full_path.name + '.part')
+        _offset = await self.api.writer.run(file_size, _part_path) or 0
+
+        _headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/114.0',
+            # Byte offsets for Range only make sense on the unencoded body
+            'Accept-Encoding': 'identity',
+        }
+
+        if _offset:
+            logger.debug(f'Resuming {_part_path} from byte {_offset}')
+            _headers['Range'] = f'bytes={_offset}-'
+
+        async def open_stream() -> httpx.Response:
+            return await self.api.get(
+                url,
+                return_raw_response=True,
+                include_default_headers=False,
+                stream=True,
+                headers=_headers
+            )
+
+        response = await open_stream()
+
+        if _offset and response.status_code == httpx.codes.REQUESTED_RANGE_NOT_SATISFIABLE:
+            await response.aclose()
 
-        logger.info('\t%s, File Size: %.2f MB' % (_full_path, file_size))
+            if _offset == (content_range_total(response.headers.get('content-range')) or expected_size):
+                logger.debug(f'{_part_path} was already complete')
+                _hash = hashlib.sha256()
+                await self.api.writer.run(hash_file, _part_path, _hash)
+                await self.api.writer.run(os.replace, _part_path, full_path)
+                return _offset, _hash.hexdigest()
 
-        with _full_path.open('wb') as image_file:
-            response.raw.decode_content = True
-            shutil.copyfileobj(response.raw, image_file)
+            logger.debug(f'Server rejected the range for {_part_path}, starting over')
+            await self.api.writer.run(_part_path.unlink)
+            _offset = 0
+            del _headers['Range']
+            response = await open_stream()
 
-        del response  # Dealocate the memory used in order to stream the file while we wait
+        try:
+            response.raise_for_status()
+
+            if response.status_code != httpx.codes.PARTIAL_CONTENT:
+                _offset = 0
+
+            _hash = hashlib.sha256()
+
+            if _offset:
+                await self.api.writer.run(hash_file, _part_path, _hash)
+
+            _content_length = response.headers.get('content-length')
+            _announced_size = _offset + int(_content_length) if _content_length is not None else None
+
+            logger.info('\t%s, File Size: %.2f MB' % (full_path, (_announced_size or 0) / float(1 << 20)))
+
+            _max_connection_bandwidth = self.api._configuration.max_connection_bandwidth
+            _limiters = (
+                self.api.bandwidth_limiter,
+                BandwidthLimiter(_max_connection_bandwidth) if _max_connection_bandwidth else None
+            )
+
+            async with self.api.writer.open(_part_path, 'ab' if _offset else 'wb', digest=_hash) as part_file:
+                async for chunk in response.aiter_bytes():
+                    await part_file.write(chunk)
+                    self.api.metrics.inc('downloaded_bytes', len(chunk))
+
+                    if _throttled := await throttle(len(chunk), _limiters):
+                        self.api.metrics.inc('throttled_seconds', _throttled)
+
+            _size = _offset + part_file.size
+
+        finally:
+            await response.aclose()  # Release the pooled connection for the next download
+
+        if _announced_size is not None and _size != _announced_size:
+            raise IncompleteDownloadError(f'Incomplete download of {url}: got {_size} of {_announced_size} bytes, kept {_part_path}')
+
+        if expected_size and _size < expected_size:
+            raise IncompleteDownloadError(f'Incomplete download of {url}: got {_size} of {expected_size} bytes, kept {_part_path}')
+
+        if expected_size and _size > expected_size:
+            logger.warning(f'{full_path} is {_size} bytes but Imgur reported {expected_size}')
+
+        await self.api.writer.run(os.replace, _part_path, full_path)
+
+        return _size, _hash.hexdigest()
 
 
 class Album(Downloadable):
@@ -228,34 +478,65 @@ class Album(Downloadable):
         )
         return (meta or {}).get('data')
 
-    async def download(self):
+    @reports_failures
+    async def download(self, metadata: Optional[Dict[str, Any]] = None):
+        """
+        Downloads every image of the album into a folder named after it.
+
+        Parameters:
+            metadata (dict): Album metadata already fetched by a listing; only used if it
+                carries every image of the album
+        """
 
-        metadata = await self.get_metadata()
+        if not self.has_all_images(metadata):
+            metadata = await self.get_metadata()
 
         _title = replace_characters(metadata.get('title') or metadata.get('id'))
-        _path = Path(self.api._configuration.download_path) / _title
+        _path = self.folder(metadata)
 
         logger.debug("Checking if folder exists")
-        _path.mkdir(parents=True, exist_ok=True)
+        await self.api.writer.run(_path.mkdir, parents=True, exist_ok=True)
 
         logger.info('Downloading album: %s' % _title)
 
         _images = metadata.get('images') or []
 
-        _futures = []
-        for position, image in enumerate(_images, start=1):
-            _futures.append(
-                asyncio.create_task(
-                    Image(
-                        id=image.get('id'),
-                        api=self.api
-                    ).download(
-                        path=_path,
-                        enumeration=position
-                    )
-                )
+        await self.api.scheduler.run(
+            Image(
+                id=image.get('id'),
+                api=self.api
+            ).download(
+                path=_path,
+                enumeration=position,
+                metadata=image
             )
-        await asyncio.gather(*_futures)
+            for position, image in enumerate(_images, start=1)
+        )
+
+    def folder(self, metadata: Dict[str, Any]) -> Path:
+        """
+        The folder the images of the album are saved in, named after the album.
+
+        Parameters:
+            metadata (dict): The album metadata
+        """
+        return Path(self.api._configuration.download_path) / replace_characters(metadata.get('title') or metadata.get('id'))
+
+    @staticmethod
+    def has_all_images(metadata: Optional[Dict[str, Any]]) -> bool:
+        """
+        Whether prefetched album metadata lists every image of the album.
+
+        Parameters:
+            metadata (dict): The prefetched metadata
+
+        Returns:
+            bool: True if the metadata can be used without asking the API
+        """
+        if not metadata or metadata.get('images') is None:
+            return False
+
+        return len(metadata['images']) >= (metadata.get('images_count') or 0)
 
 
 class Gallery(Album):
@@ -294,7 +575,7 @@ class Tag(Downloadable):
         self.id = id
         self.api = api
 
-    async def get_metadata(self, sort: str = 'top', window: str = 'week', page: int = 0):
+    async def get_metadata(self, sort: str = 'top', window: str = 'week', page: int = 0, use_cache: bool = True):
         """
         Gets the metadata for the image using the API.
 
@@ -302,6 +583,7 @@ class Tag(Downloadable):
             sort (str): The sort order of the favorites
             window (str): The time window of the favorites
             page (int): The page number to start on
+            use_cache (bool): Whether a cached response may be used
         """
         logger.info(f'Getting page {page} of favorites')
 
@@ -309,7 +591,8 @@ class Tag(Downloadable):
             f'gallery/t/{self.id}/{sort}/{window}/{page}',
             headers={
                 'Authorization': 'Client-ID %s' % self.api._configuration.client_id
-            }
+            },
+            use_cache=use_cache
         )
         return (meta or {}).get('data')
 
@@ -319,7 +602,7 @@ class Subreddit(Downloadable):
     Class which holds all the methods for downloading subreddits.
     """
 
-    async def get_metadata(self, sort: str = 'time', window: str = 'day', page: int = 0) -> Optional[dict]:
+    async def get_metadata(self, sort: str = 'time', window: str = 'day', page: int = 0, use_cache: bool = True) -> Optional[dict]:
         """
         Gets the metadata for the image using the API.
 
@@ -327,12 +610,14 @@ class Subreddit(Downloadable):
             sort (str): The sort order of the favorites
             window (str): The window of the sort order
             page (int): The page number to start on
+            use_cache (bool): Whether a cached response may be used
         """
         meta = await self.api.get(
             f'gallery/r/{self.id}/{sort}/{window}/{page}',
             headers={
                 'Authorization': 'Client-ID %s' % self.api._configuration.client_id
-            }
+            },
+            use_cache=use_cache
         )
         return (meta or {}).get('data')
 
@@ -360,14 +645,28 @@ class Subreddit(Downloadable):
             subreddit (str): The subreddit to get the image from
         """
 
-        # FIXME: Half initailized module
-        from imgurtofolder.downloader import download_urls
-
         logger.debug('Getting subreddit gallery details')
-        subreddit = await self.get_image(subreddit, self.id)
+        item = await self.get_image(subreddit, self.id)
+
+        if not item:
+            logger.warning(f'Could not find {self.id} in r/{subreddit}')
+            return
+
+        await download_item(item, self.api)
+
+
+def download_item(item: Dict[str, Any], api: ImgurAPI) -> Awaitable[None]:
+    """
+    Downloads an item of a listing, reusing the metadata the listing already returned.
+
+    Parameters:
+        item (dict): The album or image metadata from the listing
+        api (ImgurAPI): The ImgurAPI object
+    """
+    if item.get('is_album') is True:
+        return Album(id=item['id'], api=api).download(metadata=item)
 
-        # TODO: This could be more efficient if we use the already fetched data instead of providing the link again
-        await download_urls([item.get('link') for item in subreddit], self.api)
+    return Image(id=item['id'], api=api).download(metadata=item)
 
 
 ##### Account #####
@@ -398,83 +697,129 @@ class Account:
         )
         return meta or []
 
-    async def get_account_favorites(self, username: str, sort: str = 'newest', page: int = 0, max_items: int = -1) -> list:
+    def iter_account_favorites(self, username: str, sort: str = 'newest', page: int = 0, max_items: int = -1) -> AsyncIterator[Dict[str, Any]]:
         """
-        Get all favorites from an account
+        Iterate over the favorites of an account as their pages arrive
 
         Parameters:
             username (str): The username of the account
             sort (str): The sort order of the favorites
             page (int): The page number to start on
-            max_items (int): The maximum number of items to return
+            max_items (int): The maximum number of items to return; -1 for every item
 
         Returns:
-            list: A list of all favorites from the account
+            AsyncIterator[dict]: The favorites of the account
         """
 
-        async def _get_next_page(username: str, page: int, sort: str):
-            """
-            Gets the next page of favorites
+        async def _get_next_page(page: int):
+            return await self.get_favorites_page(username, page, sort=sort)
 
-            Parameters:
-                username (str): The username of the account
-                page (int): The page number to start on
-                sort (str): The sort order of the favorites
-            """
-            logger.info(f'Getting page {page} of favorites')
-            meta = await self.api.get(
-                f'account/{username}/favorites/{page}/{sort}',
-                headers={
-                    'Authorization': f'Bearer {self.api._configuration.access_token}',
-                }
-            )
-            return (meta or {}).get('data')
+        return paginate(
+            _get_next_page,
+            starting_page=page,
+            max_items=max_items if max_items > 0 else None,
+            window=self.api._configuration.page_window
+        )
 
-        favorites = []
+    async def get_favorites_page(self, username: str, page: int, sort: str = 'newest', use_cache: bool = True) -> list:
+        """
+        Get a page of the favorites of an account
 
-        while len(response := await _get_next_page(username, page, sort)) != 0:
+        Parameters:
+            username (str): The username of the account
+            page (int): The page number to get
+            sort (str): The sort order of the favorites
+            use_cache (bool): Whether a cached response may be used
 
-            favorites.extend(response)
+        Returns:
+            list: The favorites of the page
+        """
+        logger.info(f'Getting page {page} of favorites')
+        meta = await self.api.get(
+            f'account/{username}/favorites/{page}/{sort}',
+            headers={
+                'Authorization': f'Bearer {self.api._configuration.access_token}',
+            },
+            use_cache=use_cache
+        )
+        return (meta or {}).get('data') or []
 
-            if len(favorites) > max_items:
-                return favorites[:max_items]
+    async def get_account_favorites(self, username: str, sort: str = 'newest', page: int = 0, max_items: int = -1) -> list:
+        """
+        Get all favorites from an account
 
-            page += 1
+        Parameters:
+            username (str): The username of the account
+            sort (str): The sort order of the favorites
+            page (int): The page number to start on
+            max_items (int): The maximum number of items to return; -1 for every item
 
-        return favorites
+        Returns:
+            list: A list of all favorites from the account
+        """
+        return [
+            favorite async for favorite in self.iter_account_favorites(username, sort=sort, page=page, max_items=max_items)
+        ]
 
-    async def get_account_images(self, username: str, starting_page: int = 0, max_items: Optional[int] = None) -> list:
+    def iter_account_images(self, username: str, starting_page: int = 0, max_items: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
         """
-        Get all images from an account
+        Iterate over the images of an account as their pages arrive
 
         Parameters:
             username (str): The username of the account
-            page (int): The page number to start on
+            starting_page (int): The page number to start on
+            max_items (int): The maximum number of items to return
 
         Returns:
-            list: A list of all images from the account
+            AsyncIterator[dict]: The images of the account
         """
 
         async def _get_next_page(_page):
-            meta = await self.api.get(
-                f'account/{username}/images/{_page}',
-                headers={
-                    'Authorization': f'Bearer {self.api._configuration.access_token}',
-                }
-            )
-            return meta.get('data') or []
+            return await self.get_images_page(username, _page)
 
-        account_images = []
-        page = starting_page
+        return paginate(
+            _get_next_page,
+            starting_page=starting_page,
+            max_items=max_items,
+            window=self.api._configuration.page_window
+        )
+
+    async def get_images_page(self, username: str, page: int, use_cache: bool = True) -> list:
+        """
+        Get a page of the images of an account
+
+        Parameters:
+            username (str): The username of the account
+            page (int): The page number to get
+            use_cache (bool): Whether a cached response may be used
+
+        Returns:
+            list: The images of the page
+        """
+        meta = await self.api.get(
+            f'account/{username}/images/{page}',
+            headers={
+                'Authorization': f'Bearer {self.api._configuration.access_token}',
+            },
+            use_cache=use_cache
+        )
+        return (meta or {}).get('data') or []
 
-        while len(response := await _get_next_page(page)) != 0:
-            account_images.extend(response)
+    async def get_account_images(self, username: str, starting_page: int = 0, max_items: Optional[int] = None) -> list:
+        """
+        Get all images from an account
 
-            if max_items is not None and len(account_images) > max_items:
-                return account_images[:max_items]
-            page += 1
+        Parameters:
+            username (str): The username of the account
+            starting_page (int): The page number to start on
+            max_items (int): The maximum number of items to return
 
-        return account_images
+        Returns:
+            list: A list of all images from the account
+        """
+        return [
+            image async for image in self.iter_account_images(username, starting_page=starting_page, max_items=max_items)
+        ]
 
     async def get_gallery_favorites(self, username: str, starting_page: int = 0, sort: str = 'newest') -> list:
         """
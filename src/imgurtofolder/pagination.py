@@ -0,0 +1,84 @@
+import asyncio
+from collections import deque
+from logging import getLogger
+from math import ceil
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional
+
+logger = getLogger(__name__)
+
+PageFetcher = Callable[[int], Awaitable[Optional[List[Dict[str, Any]]]]]
+
+
+async def paginate(
+        fetch_page: PageFetcher,
+        starting_page: int = 0,
+        max_items: Optional[int] = None,
+        window: int = 4
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Yields the items of consecutive pages while keeping `window` pages in flight.
+
+    The starting page is requested alone, so its size is known before the
+    window opens: no page past `max_items` is ever requested, and a listing
+    that fits in `max_items` costs a single request. Pages are yielded in
+    order as soon as each one arrives. The listing stops at the first empty
+    page, and no further page is requested once a page is shorter than the
+    first one.
+
+    Parameters:
+        fetch_page (PageFetcher): Fetches the items of a page number
+        starting_page (int): The page number to start on
+        max_items (int): The maximum number of items to yield. Default: every item
+        window (int): The number of pages requested ahead
+
+    Yields:
+        dict: The items of the listing, in order
+    """
+    pending: Deque[asyncio.Task] = deque()
+    next_page = starting_page
+    page_size: Optional[int] = None
+    last_page_seen = False
+    yielded = 0
+
+    def can_request() -> bool:
+        if page_size is None:
+            # Nothing is known about the listing until the starting page arrives
+            return not pending and next_page == starting_page
+
+        if last_page_seen or len(pending) >= max(window, 1):
+            return False
+
+        return max_items is None or next_page - starting_page < ceil(max_items / page_size)
+
+    try:
+        while True:
+            while can_request():
+                logger.debug(f'Requesting page {next_page}')
+                pending.append(asyncio.create_task(fetch_page(next_page)))
+                next_page += 1
+
+            if not pending or (max_items is not None and yielded >= max_items):
+                return
+
+            items = await pending.popleft() or []
+
+            if not items:
+                return
+
+            if page_size is None:
+                page_size = len(items)
+            elif len(items) < page_size:
+                last_page_seen = True
+
+            for item in items:
+                if max_items is not None and yielded >= max_items:
+                    return
+
+                yield item
+                yielded += 1
+
+    finally:
+        for task in pending:
+            task.cancel()
+
+        await asyncio.gather(*pending, return_exceptions=True)
@@ -0,0 +1,346 @@
+import json
+import os
+import time
+from dataclasses import asdict, dataclass
+from logging import getLogger
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
+
+from imgurtofolder.api import ImgurAPI
+from imgurtofolder.batch import read_lines
+from imgurtofolder.downloader import parse_id
+from imgurtofolder.objects import (Account, Album, Gallery, Image,
+                                   ImgurObjectType, Subreddit, Tag, file_size)
+
+logger = getLogger(__name__)
+
+PLAN_VERSION: int = 1
+
+# The metadata fields a planned image is downloaded with
+PLANNED_FIELDS: Tuple[str, ...] = ('id', 'title', 'link', 'size')
+
+
+@dataclass
+class PlannedImage:
+
+    id: str
+    folder: str
+    enumeration: Optional[int]
+    metadata: Dict[str, Any]
+    exists: bool = False
+
+
+class Planner:
+    """
+    Walks the requested listings, albums and urls without downloading any media.
+
+    Every image ends up with the folder, name and metadata it would be
+    downloaded with, so executing the plan needs no further API call.
+    Items that fail to resolve are recorded in the run's failure report.
+    """
+
+    def __init__(self, api: ImgurAPI):
+        """
+        Parameters:
+            api (ImgurAPI): The Imgur API object
+        """
+        self.api = api
+        self.items = 0
+        self.images: List[PlannedImage] = []
+        self._seen: Set[Tuple[str, str]] = set()
+        self._api_calls_before = self.api_calls()
+
+    def api_calls(self) -> float:
+        """
+        The number of API requests sent in this process so far.
+        """
+        return sum(
+            value
+            for labels, value in self.api.metrics.counters.get('requests', {}).items()
+            if dict(labels).get('endpoint') != 'cdn'
+        )
+
+    async def add_image(
+            self,
+            id: str,
+            metadata: Optional[Dict[str, Any]] = None,
+            folder: Optional[Path] = None,
+            enumeration: Optional[int] = None
+    ):
+        """
+        Plan the download of an image, asking the API for its metadata only if the link is missing.
+
+        Parameters:
+            id (str): The image ID
+            metadata (dict): Image metadata already fetched
+            folder (Path): The folder it is saved in. Default: the configured download path
+            enumeration (int): The position of the image in its album
+        """
+        _folder = Path(folder or self.api._configuration.download_path)
+
+        if (id, str(_folder)) in self._seen:
+            return
+
+        self._seen.add((id, str(_folder)))
+
+        if not metadata or not metadata.get('link'):
+            metadata = {**(metadata or {}), **(await Image(id, self.api).get_metadata() or {})}
+
+        metadata = Image.select_rendition(metadata, self.api._configuration.prefer)
+        _metadata = {field: metadata[field] for field in PLANNED_FIELDS if metadata.get(field) is not None}
+        _full_path = _folder / Image.file_name(_metadata, enumeration)
+
+        exists = (
+            await self.api.manifest.run(self.api.manifest.get, id, str(_folder)) is not None
+            or await self.api.writer.run(file_size, _full_path) is not None
+        )
+
+        self.images.append(PlannedImage(id, str(_folder), enumeration, _metadata, exists))
+
+    async def add_album(self, album: Album, metadata: Optional[Dict[str, Any]] = None):
+        """
+        Plan the download of every image of an album.
+
+        Parameters:
+            album (Album): The album or gallery
+            metadata (dict): Album metadata already fetched by a listing; only used if it
+                carries every image of the album
+        """
+        if not album.has_all_images(metadata):
+            metadata = await album.get_metadata()
+
+        folder = album.folder(metadata)
+
+        for position, image in enumerate(metadata.get('images') or [], start=1):
+            await self.add_image(image['id'], image, folder, position)
+
+    async def add_item(self, item: Dict[str, Any]):
+        """
+        Plan the download of an item of a listing.
+
+        Parameters:
+            item (dict): The album or image metadata from the listing
+        """
+        self.items += 1
+
+        try:
+            if item.get('is_album') is True:
+                await self.add_album(Album(item['id'], self.api), item)
+            else:
+                await self.add_image(item['id'], item)
+
+        except Exception as error:
+            logger.exception(f'Could not plan {item["id"]}:')
+            self.api.scheduler.failures.record('plan', item['id'], error)
+
+    async def add_listing(self, listing: AsyncIterator[Dict[str, Any]]):
+        """
+        Plan the download of every item of a listing, resolving items concurrently.
+
+        Parameters:
+            listing (AsyncIterator[dict]): The items, as returned by a paginated listing
+        """
+        await self.api.scheduler.run(
+            self.add_item(item) async for item in listing
+        )
+
+    async def add_url(self, url: str):
+        """
+        Plan the download of a url, as `download_url` would download it.
+
+        Parameters:
+            url (str): The url
+        """
+        try:
+            imgur_object = parse_id(url)
+
+            if imgur_object.type == ImgurObjectType.DIRECT and not self.api._configuration.fetch_titles:
+                self.items += 1
+                await self.add_image(imgur_object.id, Image.direct_metadata(imgur_object.id, imgur_object.extension))
+
+            elif imgur_object.type in (ImgurObjectType.IMAGE, ImgurObjectType.DIRECT):
+                self.items += 1
+                await self.add_image(imgur_object.id)
+
+            elif imgur_object.type == ImgurObjectType.ALBUM:
+                self.items += 1
+                await self.add_album(Album(imgur_object.id, self.api))
+
+            elif imgur_object.type == ImgurObjectType.GALLERY:
+                self.items += 1
+                await self.add_album(Gallery(imgur_object.id, self.api))
+
+            elif imgur_object.type == ImgurObjectType.TAG:
+                await self.add_listing(Tag(imgur_object.id, self.api).iter_items())
+
+            elif imgur_object.type == ImgurObjectType.SUBREDDIT and imgur_object.subreddit is None:
+                await self.add_listing(Subreddit(imgur_object.id, self.api).iter_items())
+
+            elif imgur_object.type == ImgurObjectType.SUBREDDIT:
+                if item := await Subreddit(imgur_object.id, self.api).get_image(imgur_object.subreddit, imgur_object.id):
+                    await self.add_item(item)
+
+        except Exception as error:
+            logger.exception(f'Could not plan {url}:')
+            self.api.scheduler.failures.record('url', url, error)
+
+    async def add_urls(self, urls: Iterable[str]):
+        """
+        Plan the download of a list of urls.
+        """
+        await self.api.scheduler.run(self.add_url(url) for url in urls)
+
+    async def add_url_file(self, path: str):
+        """
+        Plan the download of every url of a file, one per line, or of stdin for '-'.
+        """
+
+        async def urls() -> AsyncIterator[Any]:
+            async for _, line in read_lines(path, self.api.writer):
+                url = line.strip()
+
+                if url and not url.startswith('#'):
+                    yield self.add_url(url)
+
+        await self.api.scheduler.run(urls())
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        The totals of the plan.
+        """
+        sizes = [image.metadata.get('size') for image in self.images]
+        missing = [image for image in self.images if not image.exists]
+
+        return {
+            'items': self.items,
+            'images': len(self.images),
+            'bytes': sum(size for size in sizes if size),
+            'images_without_size': sum(1 for size in sizes if not size),
+            'existing_images': len(self.images) - len(missing),
+            'bytes_to_download': sum(image.metadata.get('size') or 0 for image in missing),
+            'api_calls': int(self.api_calls() - self._api_calls_before),
+        }
+
+    async def save(self, path: str) -> Dict[str, Any]:
+        """
+        Write the plan to a JSON file.
+
+        Parameters:
+            path (str): The path of the plan
+
+        Returns:
+            dict: The summary of the plan
+        """
+        summary = self.summary()
+        plan = {
+            'version': PLAN_VERSION,
+            'created': time.time(),
+            'summary': summary,
+            'images': [asdict(image) for image in self.images],
+        }
+
+        await self.api.writer.run(_write_json, Path(path), plan)
+        return summary
+
+
+def _write_json(path: Path, data: Dict[str, Any]):
+    temporary = path.with_name(path.name + '.tmp')
+
+    with temporary.open('w') as current_file:
+        json.dump(data, current_file)
+
+    os.replace(temporary, path)
+
+
+def load_plan(path: str) -> Dict[str, Any]:
+    """
+    Read a plan written by `Planner.save`.
+
+    Parameters:
+        path (str): The path of the plan
+
+    Raises:
+        ValueError: If the file is not a plan this version can execute
+    """
+    with Path(path).open('r') as current_file:
+        plan = json.load(current_file)
+
+    if not isinstance(plan, dict) or plan.get('version') != PLAN_VERSION:
+        raise ValueError(f'{path} is not a version {PLAN_VERSION} download plan')
+
+    return plan
+
+
+async def execute_plan(path: str, api: ImgurAPI):
+    """
+    Download every image of a plan, without enumerating the listings again.
+
+    Images that exist by now are skipped by the download itself.
+
+    Parameters:
+        path (str): The path of the plan
+        api (ImgurAPI): The Imgur API object
+    """
+    plan = await api.writer.run(load_plan, path)
+    logger.info(f'Executing {path}: {plan["summary"]["images"]} images, {plan["summary"]["bytes_to_download"]} bytes to download')
+
+    await api.scheduler.run(
+        Image(image['id'], api).download(
+            path=image['folder'],
+            enumeration=image['enumeration'],
+            metadata=image['metadata']
+        )
+        for image in plan['images']
+    )
+
+
+async def write_plan(
+        path: str,
+        api: ImgurAPI,
+        urls: Iterable[str] = (),
+        input_file: Optional[str] = None,
+        favorites: Optional[str] = None,
+        account_images: Optional[str] = None,
+        sort: str = 'newest',
+        starting_page: int = 0,
+        max_items: Optional[int] = None
+):
+    """
+    Plan the requested downloads and write the plan to a file.
+
+    Parameters:
+        path (str): The path of the plan
+        api (ImgurAPI): The Imgur API object
+        urls (Iterable[str]): Urls to plan
+        input_file (str): A file of urls, one per line, or '-' for stdin
+        favorites (str): The username whose favorites are planned
+        account_images (str): The username whose images are planned
+        sort (str): The sort order of the favorites
+        starting_page (int): The page favorites and account images start on
+        max_items (int): The maximum number of favorites and account images
+    """
+    planner = Planner(api)
+
+    await planner.add_urls(urls)
+
+    if input_file is not None:
+        await planner.add_url_file(input_file)
+
+    if favorites is not None:
+        await planner.add_listing(
+            Account(favorites, api).iter_account_favorites(favorites, sort=sort, page=starting_page, max_items=max_items or -1)
+        )
+
+    if account_images is not None:
+        await planner.add_listing(
+            Account(account_images, api).iter_account_images(account_images, starting_page=starting_page, max_items=max_items)
+        )
+
+    summary = await planner.save(path)
+    logger.info(
+        f'Wrote {path}: {summary["items"]} items, {summary["images"]} images, '
+        f'{summary["bytes"] / float(1 << 20):.1f} MB ({summary["images_without_size"]} without a size), '
+        f'{summary["existing_images"]} already on disk, '
+        f'{summary["bytes_to_download"] / float(1 << 20):.1f} MB to download, '
+        f'{summary["api_calls"]} API calls'
+    )
@@ -0,0 +1,275 @@
+import asyncio
+import time
+from logging import getLogger
+from typing import Iterable, List, Mapping, Optional, Tuple
+
+logger = getLogger(__name__)
+
+# Imgur does not say when client credits reset, only that they are daily
+CLIENT_CREDITS_WINDOW: float = 24 * 60 * 60
+
+
+def _header_number(headers: Mapping[str, str], name: str) -> Optional[float]:
+    """
+    Read a numeric header, ignoring missing or malformed values.
+
+    Parameters:
+        headers (Mapping[str, str]): The response headers
+        name (str): The header name
+
+    Returns:
+        float: The value, or None if it is missing or not a number
+    """
+    try:
+        return float(headers[name])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class _TokenBucket:
+    """
+    A token bucket whose refill rate follows the credits left in one budget.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = capacity
+        self.paused_until: float = 0.0
+
+        self._tokens = capacity
+        self._updated = time.monotonic()
+
+    def wait(self) -> float:
+        """
+        Seconds until a token is available; 0 if one is now.
+        """
+        now = time.monotonic()
+
+        if now < self.paused_until:
+            return self.paused_until - now
+
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+        return 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+
+    def take(self):
+        self._tokens -= 1
+
+    def adapt(self, budgets: List[Tuple[float, float]], share: float):
+        """
+        Spread the credits left evenly over the time until they reset.
+
+        Parameters:
+            budgets (List[Tuple[float, float]]): The credits left and seconds until they reset, per budget
+            share (float): The fraction of the credits this bucket may spend
+        """
+        rate = self.max_rate
+
+        for remaining, seconds_until_reset in budgets:
+            seconds_until_reset = max(seconds_until_reset, 1.0)
+
+            if remaining <= 0:
+                self.paused_until = max(self.paused_until, time.monotonic() + seconds_until_reset)
+                continue
+
+            if remaining < RateLimiter.LOW_WATER_MARK:
+                rate = min(rate, remaining * share / seconds_until_reset)
+
+        self.rate = max(rate, RateLimiter.MIN_RATE)
+
+
+class RateLimiter:
+    """
+    Token bucket for api.imgur.com calls that adapts to Imgur's rate limit headers.
+
+    Waiters queue on a lock so the bucket is never checked by two coroutines at
+    once. Once a credit budget drops below `LOW_WATER_MARK`, the refill rate is
+    set to spread what is left evenly over the time until it resets. When
+    credits run out, every caller waits for the reset.
+
+    The client and user credits limit every request. POST requests also draw
+    on a bucket of their own that follows the POST credits, so running low on
+    those never slows down GET requests.
+
+    Processes sharing one set of credits each get a `share` of the rate and of
+    the remaining budgets, so together they never spend more than one would.
+    """
+
+    DEFAULT_RATE: float = 10.0
+    DEFAULT_CAPACITY: float = 10.0
+    MIN_RATE: float = 0.01
+    LOW_WATER_MARK: float = 100
+
+    def __init__(self, rate: float = DEFAULT_RATE, capacity: float = DEFAULT_CAPACITY, share: float = 1.0):
+        """
+        Parameters:
+            rate (float): The maximum number of requests per second
+            capacity (float): The number of requests allowed in a burst
+            share (float): The fraction of the credits this limiter may spend, between 0 and 1
+        """
+        if not 0 < share <= 1:
+            raise ValueError('share must be between 0 and 1')
+
+        self.share = share
+        self.max_rate = rate * share
+        self.capacity = max(capacity * share, 1.0)
+
+        self.client_remaining: Optional[float] = None
+        self.user_remaining: Optional[float] = None
+        self.post_remaining: Optional[float] = None
+
+        self._bucket = _TokenBucket(self.max_rate, self.capacity)
+        self._post_bucket = _TokenBucket(self.max_rate, self.capacity)
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    @property
+    def rate(self) -> float:
+        """
+        The requests per second allowed by the client and user credits.
+        """
+        return self._bucket.rate
+
+    @property
+    def post_rate(self) -> float:
+        """
+        The POST requests per second allowed by the POST credits.
+        """
+        return self._post_bucket.rate
+
+    def _get_lock(self) -> asyncio.Lock:
+        """
+        Get the lock for the running event loop; asyncio primitives cannot be shared across loops.
+        """
+        loop = asyncio.get_running_loop()
+
+        if loop is not self._loop:
+            self._loop = loop
+            self._lock = asyncio.Lock()
+
+        return self._lock
+
+    async def acquire(self, method: str = 'GET'):
+        """
+        Wait until a request may be sent and take a token for it.
+
+        Parameters:
+            method (str): The HTTP method of the request
+        """
+        buckets = [self._bucket, self._post_bucket] if method == 'POST' else [self._bucket]
+
+        async with self._get_lock():
+            while True:
+                if (paused := max(bucket.paused_until for bucket in buckets) - time.monotonic()) > 0:
+                    logger.info(f'Imgur rate limit reached, waiting {paused:.0f}s for it to reset')
+
+                if (wait := max(bucket.wait() for bucket in buckets)) <= 0:
+                    for bucket in buckets:
+                        bucket.take()
+                    return
+
+                await asyncio.sleep(wait)
+
+    def update(self, headers: Mapping[str, str]):
+        """
+        Adapt the refill rates to the rate limit headers of a response.
+
+        Parameters:
+            headers (Mapping[str, str]): The response headers
+        """
+        now = time.time()
+        budgets: List[Tuple[float, float]] = []
+
+        self.client_remaining = _header_number(headers, 'X-RateLimit-ClientRemaining')
+        if self.client_remaining is not None:
+            budgets.append((self.client_remaining, CLIENT_CREDITS_WINDOW))
+
+        self.user_remaining = _header_number(headers, 'X-RateLimit-UserRemaining')
+        user_reset = _header_number(headers, 'X-RateLimit-UserReset')
+        if self.user_remaining is not None and user_reset is not None:
+            budgets.append((self.user_remaining, user_reset - now))
+
+        post_budgets: List[Tuple[float, float]] = []
+
+        self.post_remaining = _header_number(headers, 'X-Post-Rate-Limit-Remaining')
+        post_reset = _header_number(headers, 'X-Post-Rate-Limit-Reset')
+        if self.post_remaining is not None and post_reset is not None:
+            post_budgets.append((self.post_remaining, post_reset))
+
+        if not budgets and not post_budgets:
+            return
+
+        if budgets:
+            self._bucket.adapt(budgets, self.share)
+
+        if post_budgets:
+            self._post_bucket.adapt(post_budgets, self.share)
+
+        logger.debug(
+            f'Rate limit: client {self.client_remaining}, user {self.user_remaining}, '
+            f'post {self.post_remaining} remaining; {self.rate:.2f} requests/s, {self.post_rate:.2f} POST requests/s'
+        )
+
+
+class BandwidthLimiter:
+    """
+    Token bucket on the bytes read from the CDN.
+
+    Readers reserve their bytes after each chunk and sleep off any deficit,
+    so downloads keep running concurrently and are slowed down together
+    rather than queued one after another. Reading slower lets the socket
+    buffers fill, so TCP throttles the sender too.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        """
+        Parameters:
+            rate (float): The maximum number of bytes per second
+            burst (float): The number of bytes allowed in a burst. Default: one second of `rate`
+        """
+        if rate <= 0:
+            raise ValueError('rate must be positive')
+
+        self.rate = rate
+        self.capacity = burst or rate
+
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def reserve(self, amount: int) -> float:
+        """
+        Take tokens for bytes already read, going into debt if there are not enough.
+
+        Parameters:
+            amount (int): The number of bytes
+
+        Returns:
+            float: Seconds to wait until the debt is paid off
+        """
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate) - amount
+        self._updated = now
+
+        return max(0.0, -self._tokens / self.rate)
+
+
+async def throttle(amount: int, limiters: Iterable[Optional[BandwidthLimiter]]) -> float:
+    """
+    Reserve bytes on every limiter and wait for the slowest of them.
+
+    Parameters:
+        amount (int): The number of bytes read
+        limiters (Iterable[BandwidthLimiter]): The limiters; None for no limit
+
+    Returns:
+        float: The seconds waited
+    """
+    delay = max((limiter.reserve(amount) for limiter in limiters if limiter is not None), default=0.0)
+
+    if delay:
+        await asyncio.sleep(delay)
+
+    return delay
@@ -0,0 +1,206 @@
+import asyncio
+from collections.abc import AsyncIterable
+from dataclasses import dataclass
+from logging import getLogger
+from typing import Any, AsyncIterator, Awaitable, Iterable, List, Optional, Union
+
+logger = getLogger(__name__)
+
+Work = Union[Iterable[Awaitable[Any]], AsyncIterable[Awaitable[Any]]]
+
+_DONE = object()
+
+
+async def _iterate(work: Work) -> AsyncIterator[Awaitable[Any]]:
+    """
+    Iterate over either a sync or an async iterable of awaitables.
+
+    Parameters:
+        work (Work): The awaitables to iterate over
+    """
+    if isinstance(work, AsyncIterable):
+        async for item in work:
+            yield item
+    else:
+        for item in work:
+            yield item
+
+
+def _discard(item: Any):
+    """
+    Close a coroutine that will never be awaited so Python does not warn about it.
+    """
+    if asyncio.iscoroutine(item):
+        item.close()
+
+
+@dataclass
+class Failure:
+
+    kind: str
+    id: str
+    error: str
+
+
+class FailureReport:
+    """
+    Collects the items that still failed after their retries, for the end of the run.
+    """
+
+    def __init__(self):
+        self.failures: List[Failure] = []
+
+    def __len__(self) -> int:
+        return len(self.failures)
+
+    def record(self, kind: str, id: str, error: BaseException):
+        """
+        Record a failed item.
+
+        Parameters:
+            kind (str): The kind of item, e.g. 'image' or 'url'
+            id (str): The Imgur ID or url of the item
+            error (BaseException): The error it failed with
+        """
+        self.failures.append(Failure(kind=kind, id=id, error=repr(error)))
+
+    def merge(self, failures: List[Failure]):
+        """
+        Add failures reported by another process.
+
+        Parameters:
+            failures (List[Failure]): The failures
+        """
+        self.failures.extend(failures)
+
+    def log(self):
+        """
+        Log every failed item, or nothing if the run went through.
+        """
+        if not self.failures:
+            return
+
+        logger.error(f'{len(self.failures)} item(s) failed:')
+        for failure in self.failures:
+            logger.error(f'\t{failure.kind} {failure.id}: {failure.error}')
+
+
+class Scheduler:
+    """
+    Bounds how much work is in flight across a whole run.
+
+    API metadata calls and CDN byte downloads are limited separately through
+    `api_slots` and `download_slots`, which are held only around the network
+    work itself. Fan-out goes through `run`, which pulls work lazily through a
+    bounded queue so producers wait once the queue is full; `queue_depth`
+    counts the items queued but not started across every `run`.
+    """
+
+    DEFAULT_JOBS: int = 8
+    DEFAULT_API_JOBS: int = 4
+
+    def __init__(self, jobs: int = DEFAULT_JOBS, api_jobs: int = DEFAULT_API_JOBS, queue_size: Optional[int] = None):
+        """
+        Parameters:
+            jobs (int): The maximum number of concurrent CDN downloads
+            api_jobs (int): The maximum number of concurrent API calls
+            queue_size (int): The maximum number of queued items per `run`. Default: twice `jobs`
+        """
+        if jobs < 1 or api_jobs < 1:
+            raise ValueError('jobs and api_jobs must be at least 1')
+
+        self.jobs = jobs
+        self.api_jobs = api_jobs
+        self.queue_size = queue_size or jobs * 2
+        self.failures = FailureReport()
+        self.queue_depth = 0
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._api_slots: Optional[asyncio.Semaphore] = None
+        self._download_slots: Optional[asyncio.Semaphore] = None
+
+    def _bind(self):
+        """
+        Create the semaphores for the running event loop; asyncio primitives cannot be shared across loops.
+        """
+        loop = asyncio.get_running_loop()
+
+        if loop is not self._loop:
+            self._loop = loop
+            self._api_slots = asyncio.Semaphore(self.api_jobs)
+            self._download_slots = asyncio.Semaphore(self.jobs)
+
+    @property
+    def api_slots(self) -> asyncio.Semaphore:
+        """
+        The semaphore bounding concurrent API metadata calls.
+        """
+        self._bind()
+        return self._api_slots
+
+    @property
+    def download_slots(self) -> asyncio.Semaphore:
+        """
+        The semaphore bounding concurrent CDN downloads.
+        """
+        self._bind()
+        return self._download_slots
+
+    async def run(self, work: Work, jobs: Optional[int] = None) -> None:
+        """
+        Await every item of `work` with at most `jobs` items running at once.
+
+        Items are pulled from `work` only when there is room in the queue, so
+        generators are consumed lazily. An item raising an exception is logged
+        and does not stop the others. If `work` itself raises, no more items are
+        pulled, the items already pulled finish, and the error is raised again;
+        only cancelling the run cancels the running items.
+
+        Parameters:
+            work (Work): An iterable or async iterable of awaitables
+            jobs (int): The number of workers. Default: `self.jobs`
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        workers_count = jobs or self.jobs
+
+        async def produce():
+            async for item in _iterate(work):
+                await queue.put(item)
+                self.queue_depth += 1
+
+        async def consume():
+            while (item := await queue.get()) is not _DONE:
+                self.queue_depth -= 1
+
+                try:
+                    await item
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    logger.exception('Error while running scheduled work:')
+
+        tasks = [asyncio.create_task(consume()) for _ in range(workers_count)]
+
+        error: Optional[Exception] = None
+
+        try:
+            try:
+                await produce()
+            except Exception as exception:
+                error = exception  # Stop producing, but let the items already produced finish
+
+            for _ in range(workers_count):
+                await queue.put(_DONE)
+
+            await asyncio.gather(*tasks)
+
+            if error is not None:
+                raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+            while not queue.empty():
+                if (item := queue.get_nowait()) is not _DONE:
+                    self.queue_depth -= 1
+                    _discard(item)
@@ -0,0 +1,76 @@
+import asyncio
+import functools
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from logging import getLogger
+from pathlib import Path
+from typing import Any, Callable, Optional, TypeVar
+
+logger = getLogger(__name__)
+
+T = TypeVar('T')
+
+
+class SQLiteStore:
+    """
+    A SQLite database kept off the event loop on a thread of its own.
+
+    Subclasses set `_NAME` and `_SCHEMA`, which is created on first use. Their
+    methods block on SQLite, so async code calls them through `run`.
+    """
+
+    _NAME: str = 'store'
+    _SCHEMA: str = ''
+
+    # Worker processes share the database, so wait this many seconds for each other's writes
+    TIMEOUT: float = 30
+
+    def __init__(self, path: str):
+        """
+        Parameters:
+            path (str): The path to the SQLite database; created on first use
+        """
+        self.path = path
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f'imgurtofolder-{self._NAME}')
+
+    async def run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """
+        Run a blocking method on the store's thread.
+
+        Parameters:
+            func (Callable): The method to run, e.g. `manifest.get`
+            *args: Positional arguments for the method
+            **kwargs: Keyword arguments for the method
+
+        Returns:
+            T: The result of the method
+        """
+        return await asyncio.get_running_loop().run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """
+        The database connection, opened and migrated on first use.
+        """
+        with self._lock:
+            if self._connection is None:
+                logger.debug(f'Opening {self._NAME} {self.path}')
+                Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+
+                self._connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=self.TIMEOUT)
+                self._connection.execute('PRAGMA journal_mode=WAL')
+                self._connection.executescript(self._SCHEMA)
+
+            return self._connection
+
+    def close(self):
+        """
+        Close the database connection; the next use opens it again.
+        """
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
@@ -0,0 +1,269 @@
+import asyncio
+from dataclasses import dataclass
+from logging import getLogger
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from imgurtofolder.api import ImgurAPI
+from imgurtofolder.downloader import parse_id
+from imgurtofolder.manifest import ListingState
+from imgurtofolder.objects import (Account, ImgurObjectType, Subreddit, Tag,
+                                   download_item)
+from imgurtofolder.pagination import PageFetcher
+
+logger = getLogger(__name__)
+
+
+@dataclass
+class WatchSource:
+
+    kind: str
+    name: str
+    fetch_page: PageFetcher
+    interval: float
+
+    KINDS = ('favorites', 'account-images', 'subreddit', 'tag')
+
+    @property
+    def key(self) -> str:
+        """
+        The name the items of this listing are remembered under.
+        """
+        return f'{self.kind}:{self.name}'
+
+
+def parse_intervals(values: Iterable[str], default: float) -> Dict[str, float]:
+    """
+    Parses watch intervals given as 'SECONDS' or 'KIND=SECONDS'.
+
+    Parameters:
+        values (Iterable[str]): The intervals
+        default (float): The interval of kinds without one
+
+    Returns:
+        dict: The interval of every kind of source
+
+    Raises:
+        ValueError: If a kind is unknown or an interval is not a positive number
+    """
+    intervals = {kind: default for kind in WatchSource.KINDS}
+
+    for value in values:
+        kind, _, seconds = value.rpartition('=')
+
+        if kind and kind not in WatchSource.KINDS:
+            raise ValueError(f'Unknown source {kind}; expected one of {", ".join(WatchSource.KINDS)}')
+
+        if float(seconds) <= 0:
+            raise ValueError(f'Watch interval must be positive, got {seconds}')
+
+        for _kind in ([kind] if kind else WatchSource.KINDS):
+            intervals[_kind] = float(seconds)
+
+    return intervals
+
+
+def build_sources(
+        api: ImgurAPI,
+        intervals: Dict[str, float],
+        urls: Iterable[str] = (),
+        favorites: Optional[str] = None,
+        account_images: Optional[str] = None
+) -> Tuple[List[WatchSource], List[str]]:
+    """
+    Creates the sources to watch from the command line arguments.
+
+    Listing pages are always fetched fresh, newest first.
+
+    Parameters:
+        api (ImgurAPI): The Imgur API object
+        intervals (dict): The interval of every kind of source
+        urls (Iterable[str]): Urls; subreddits and tags are watched
+        favorites (str): The username whose favorites are watched
+        account_images (str): The username whose images are watched
+
+    Returns:
+        Tuple[List[WatchSource], List[str]]: The sources, and the urls that cannot be watched
+    """
+    sources: List[WatchSource] = []
+    other_urls: List[str] = []
+
+    if favorites:
+        account = Account(favorites, api)
+        sources.append(WatchSource(
+            'favorites',
+            favorites,
+            lambda page: account.get_favorites_page(favorites, page, sort='newest', use_cache=False),
+            intervals['favorites']
+        ))
+
+    if account_images:
+        images_account = Account(account_images, api)
+        sources.append(WatchSource(
+            'account-images',
+            account_images,
+            lambda page: images_account.get_images_page(account_images, page, use_cache=False),
+            intervals['account-images']
+        ))
+
+    for url in urls:
+        try:
+            imgur_object = parse_id(url)
+        except ValueError as error:
+            logger.error(f'Cannot watch {url}: {error}')
+            continue
+
+        if imgur_object.type == ImgurObjectType.SUBREDDIT and imgur_object.subreddit is None:
+            subreddit = Subreddit(imgur_object.id, api)
+            sources.append(WatchSource(
+                'subreddit',
+                imgur_object.id,
+                lambda page, subreddit=subreddit: subreddit.get_metadata(sort='time', page=page, use_cache=False),
+                intervals['subreddit']
+            ))
+
+        elif imgur_object.type == ImgurObjectType.TAG:
+            tag = Tag(imgur_object.id, api)
+
+            async def get_tag_page(page: int, tag: Tag = tag) -> List[Dict[str, Any]]:
+                return ((await tag.get_metadata(sort='time', window='all', page=page, use_cache=False)) or {}).get('items') or []
+
+            sources.append(WatchSource('tag', imgur_object.id, get_tag_page, intervals['tag']))
+
+        else:
+            other_urls.append(url)
+
+    return sources, other_urls
+
+
+class Watcher:
+    """
+    Keeps the listings of watched sources in sync, one tick every interval.
+
+    Each tick walks a listing from its newest page down to the newest item of
+    the last completed walk, skipping the items synced since, so only the new
+    items cost API calls. That mark only moves once a walk completes, so items
+    left behind by a crashed tick are picked up by the next one; a walk cut
+    short by `max_items` is continued by the next tick from the page it
+    stopped on. The mark, the page to continue from, the synced items and the
+    items that failed are kept in the manifest, so a restarted watcher picks
+    up where it left off. Items that failed are retried on the next tick.
+    """
+
+    DEFAULT_INTERVAL: float = 15 * 60
+
+    def __init__(self, api: ImgurAPI, sources: List[WatchSource], max_items: Optional[int] = None):
+        """
+        Parameters:
+            api (ImgurAPI): The Imgur API object, kept open between ticks
+            sources (List[WatchSource]): The listings to watch
+            max_items (int): The maximum number of new items synced per tick, and the backfill of the first tick. Default: every new item
+        """
+        self.api = api
+        self.sources = sources
+        self.max_items = max_items
+
+    async def new_items(self, source: WatchSource, state: ListingState) -> Tuple[List[Dict[str, Any]], ListingState]:
+        """
+        The items of a listing not synced yet, down to the newest item of the last completed walk.
+
+        A walk cut short by `max_items` is continued from the page it stopped
+        on by the next tick, so no tick reads the pages already walked. On
+        the first tick, `max_items` is the size of the backfill: older items
+        are never synced.
+
+        Parameters:
+            source (WatchSource): The listing
+            state (ListingState): The state saved by the last tick
+
+        Returns:
+            Tuple[List[dict], ListingState]: The new items, newest first, and the state to
+                record once they are synced
+        """
+        resuming = state.resume_page is not None
+        first_tick = state.high_water is None and not resuming
+        page = state.resume_page if resuming else 0
+        newest = state.resume_high_water if resuming else None
+        items = []
+
+        while page_items := await source.fetch_page(page) or []:
+            for position, item in enumerate(page_items):
+                newest = newest or item['id']
+
+                if item['id'] == state.high_water:
+                    return items, ListingState(newest)
+
+                if not await self.api.manifest.run(self.api.manifest.has_seen, source.key, item['id']):
+                    items.append(item)
+
+                if self.max_items is not None and len(items) >= self.max_items:
+                    if first_tick:
+                        return items, ListingState(newest)
+
+                    # Items past the limit are left for the next tick, which starts where this one stopped
+                    next_page = page if position < len(page_items) - 1 else page + 1
+                    return items, ListingState(state.high_water, resume_page=next_page, resume_high_water=newest)
+
+            page += 1
+
+        return items, ListingState(newest or state.high_water)
+
+    async def sync(self, source: WatchSource) -> int:
+        """
+        Download the new items of a listing, and retry the items that failed last tick.
+
+        Parameters:
+            source (WatchSource): The listing
+
+        Returns:
+            int: The number of items synced
+        """
+        state = await self.api.manifest.run(self.api.manifest.get_listing, source.key)
+        new_items, new_state = await self.new_items(source, state)
+        items = {**state.retries, **{item['id']: item for item in new_items}}
+        synced = 0
+
+        async def sync_item(item: Dict[str, Any]):
+            nonlocal synced
+
+            try:
+                await download_item(item, self.api)
+            except Exception:
+                logger.warning(f'{item["id"]} of {source.key} failed, retrying it next tick')
+                new_state.retries[item['id']] = item
+                return
+
+            await self.api.manifest.run(self.api.manifest.mark_seen, source.key, item['id'])
+            synced += 1
+
+        await self.api.scheduler.run(sync_item(item) for item in items.values())
+        await self.api.manifest.run(self.api.manifest.save_listing, source.key, new_state)
+        return synced
+
+    async def watch(self, source: WatchSource):
+        """
+        Sync a listing every `source.interval` seconds, until cancelled.
+
+        Parameters:
+            source (WatchSource): The listing
+        """
+        loop = asyncio.get_running_loop()
+
+        while True:
+            started = loop.time()
+
+            try:
+                synced = await self.sync(source)
+                logger.info(f'{source.key}: {synced} new item(s), next check in {source.interval:.0f}s')
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception(f'Error while syncing {source.key}:')
+
+            await asyncio.sleep(max(0.0, source.interval - (loop.time() - started)))
+
+    async def run(self):
+        """
+        Watch every source concurrently, until cancelled.
+        """
+        logger.info(f'Watching {", ".join(source.key for source in self.sources)}')
+        await asyncio.gather(*(self.watch(source) for source in self.sources))
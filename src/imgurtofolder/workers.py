@@ -0,0 +1,395 @@
+import asyncio
+import itertools
+import multiprocessing
+import queue
+import time
+import zlib
+from logging import getLogger
+from typing import (Any, AsyncIterator, Awaitable, Callable, Dict, Iterable,
+                    List, Optional, Tuple)
+
+from imgurtofolder.api import ImgurAPI
+from imgurtofolder.batch import BoundedSet, Checkpoint, read_lines
+from imgurtofolder.configuration import Configuration
+from imgurtofolder.downloader import download_url, parse_id
+from imgurtofolder.objects import (Account, ImgurObjectType, Subreddit, Tag,
+                                   download_item)
+from imgurtofolder.scheduler import Failure
+
+logger = getLogger(__name__)
+
+# ('item', metadata, ticket) downloads a listing item, ('url', url, ticket) downloads a url;
+# the ticket, if not None, is reported back once the download finished
+Task = Tuple[str, Any, Optional[int]]
+
+# (kind, worker index, counters, failures and tickets finished since the last report); kind is 'progress' or 'done'
+Report = Tuple[str, int, Dict[str, Any], List[Failure], List[int]]
+
+
+def shard(key: str, workers: int) -> int:
+    """
+    The worker an item belongs to; stable across runs and processes, unlike `hash`.
+
+    Parameters:
+        key (str): The item id, or the url if it has no id
+        workers (int): The number of workers
+    """
+    return zlib.crc32(key.encode()) % workers
+
+
+def _worker_main(index: int, configuration: Configuration, inbox: multiprocessing.Queue, outbox: multiprocessing.Queue, log_level: int):
+    """
+    The entry point of a worker process.
+
+    Parameters:
+        index (int): The index of the worker
+        configuration (Configuration): The configuration of the main process
+        inbox (Queue): The tasks of this worker, ended by None
+        outbox (Queue): Where the reports of every worker go
+        log_level (int): The log level of the main process
+    """
+    getLogger().setLevel(log_level)
+    api = ImgurAPI(configuration)
+
+    try:
+        asyncio.run(_work(index, api, inbox, outbox))
+    except KeyboardInterrupt:
+        pass  # The main process reports the interruption
+    finally:
+        api.manifest.close()
+
+
+async def _work(index: int, api: ImgurAPI, inbox: multiprocessing.Queue, outbox: multiprocessing.Queue):
+    """
+    Download the tasks of a worker on its own event loop, reporting progress every `WorkerPool.REPORT_INTERVAL`.
+    """
+    loop = asyncio.get_running_loop()
+    reported = 0
+    finished: List[int] = []
+
+    def report(kind: str):
+        nonlocal reported, finished
+
+        failures = api.scheduler.failures.failures[reported:]
+        reported += len(failures)
+        counters = api.metrics.export()
+        counters.pop('failed_items', None)  # The failures themselves are merged instead
+        outbox.put((kind, index, counters, failures, finished))
+        finished = []
+
+    async def ticketed(ticket: int, download: Awaitable[None]):
+        try:
+            await download
+        finally:
+            finished.append(ticket)
+
+    async def report_progress():
+        while True:
+            await asyncio.sleep(WorkerPool.REPORT_INTERVAL)
+            report('progress')
+
+    async def next_task() -> Optional[Task]:
+        # Polls, so a blocked thread never keeps an interrupted loop from closing
+        while True:
+            try:
+                return await loop.run_in_executor(None, inbox.get, True, WorkerPool.POLL_INTERVAL)
+            except queue.Empty:
+                continue
+
+    async def downloads() -> AsyncIterator[Any]:
+        while (task := await next_task()) is not None:
+            kind, value, ticket = task
+            download = None
+
+            try:
+                download = download_item(value, api) if kind == 'item' else download_url(value, api)
+
+            except Exception as error:
+                logger.exception(f'Error with url {value}:')
+                api.scheduler.failures.record('url', value, error)
+
+            if ticket is None:
+                if download is not None:
+                    yield download
+
+            elif download is not None:
+                yield ticketed(ticket, download)
+
+            else:
+                finished.append(ticket)
+
+    reporting = asyncio.create_task(report_progress())
+
+    try:
+        await api.scheduler.run(downloads())
+    finally:
+        reporting.cancel()
+        await api.close()
+        await api.writer.close()
+        report('done')
+
+
+class WorkerPool:
+    """
+    Shards downloads across worker processes, each running its own ImgurAPI event loop.
+
+    Tasks are routed by item id, so an item always lands on the same worker.
+    Inboxes are bounded so enumeration never runs far ahead of the workers.
+    The workers share the manifest, and each spends an equal share of the
+    rate-limit credits (see `ImgurAPI`). Their counters and failures stream
+    back into the metrics and failure report of the main process, and the
+    tickets of finished tasks are passed to `on_finished`.
+    """
+
+    REPORT_INTERVAL: float = 1.0
+    TASKS_PER_WORKER: int = 64
+    POLL_INTERVAL: float = 0.5
+    STOP_TIMEOUT: float = 10.0
+
+    def __init__(self, api: ImgurAPI, workers: int, on_finished: Optional[Callable[[int], Awaitable[None]]] = None):
+        """
+        Parameters:
+            api (ImgurAPI): The Imgur API object of the main process
+            workers (int): The number of worker processes
+            on_finished (Callable): Called with the ticket of every finished task that had one
+        """
+        self.api = api
+        self.workers = workers
+        self.on_finished = on_finished
+        self._context = multiprocessing.get_context('spawn')
+        self._processes: List[multiprocessing.Process] = []
+        self._inboxes: List[multiprocessing.Queue] = []
+        self._outbox: Optional[multiprocessing.Queue] = None
+        self._reader: Optional[asyncio.Task] = None
+
+    async def __aenter__(self) -> 'WorkerPool':
+        self._outbox = self._context.Queue()
+
+        for index in range(self.workers):
+            inbox = self._context.Queue(maxsize=self.TASKS_PER_WORKER)
+            process = self._context.Process(
+                target=_worker_main,
+                args=(index, self.api._configuration, inbox, self._outbox, getLogger().getEffectiveLevel()),
+                name=f'imgurtofolder-worker-{index}',
+                daemon=True
+            )
+            process.start()
+            self._inboxes.append(inbox)
+            self._processes.append(process)
+
+        logger.info(f'Started {self.workers} worker processes')
+        self._reader = asyncio.create_task(self._read_reports())
+        return self
+
+    async def __aexit__(self, exc_type, *exc_info):
+        loop = asyncio.get_running_loop()
+
+        if exc_type is not None and issubclass(exc_type, asyncio.CancelledError):
+            # Interrupted; the workers got the same Ctrl+C and stop on their own
+            self._reader.cancel()
+
+        else:
+            for index in range(self.workers):
+                await self._put(index, None)
+
+            await self._reader
+
+        deadline = time.monotonic() + self.STOP_TIMEOUT
+
+        for process in self._processes:
+            await loop.run_in_executor(None, process.join, max(deadline - time.monotonic(), 0))
+
+            if process.is_alive():
+                logger.warning(f'{process.name} did not stop, terminating it')
+                process.terminate()
+
+        # Reports sent after the reader stopped
+        while True:
+            try:
+                await self._merge(self._outbox.get_nowait())
+            except queue.Empty:
+                break
+
+    async def submit(self, key: str, task: Task):
+        """
+        Queue a task on the worker of `key`, waiting while its inbox is full.
+
+        Parameters:
+            key (str): The item id the task is sharded by
+            task (Task): The task
+        """
+        await self._put(shard(key, self.workers), task)
+
+    async def submit_item(self, item: Dict[str, Any], ticket: Optional[int] = None):
+        """
+        Queue the download of a listing item.
+
+        Parameters:
+            item (dict): The album or image metadata from the listing
+            ticket (int): Reported to `on_finished` once the download finished
+        """
+        await self.submit(item['id'], ('item', item, ticket))
+
+    async def _put(self, index: int, task: Optional[Task]):
+        loop = asyncio.get_running_loop()
+
+        while True:
+            try:
+                return await loop.run_in_executor(None, self._inboxes[index].put, task, True, self.POLL_INTERVAL)
+            except queue.Full:
+                if not self._processes[index].is_alive():
+                    raise RuntimeError(f'{self._processes[index].name} stopped unexpectedly')
+
+    async def _read_reports(self):
+        """
+        Merge worker reports into the metrics and failures of the main process until every worker is done.
+        """
+        loop = asyncio.get_running_loop()
+        running = set(range(self.workers))
+
+        while running:
+            try:
+                report = await loop.run_in_executor(None, self._outbox.get, True, self.POLL_INTERVAL)
+            except queue.Empty:
+                running = {index for index in running if self._processes[index].is_alive()}
+                continue
+
+            await self._merge(report)
+
+            if report[0] == 'done':
+                running.discard(report[1])
+
+    async def _merge(self, report: Report):
+        _, index, counters, failures, finished = report
+        self.api.metrics.merge(f'worker-{index}', counters)
+        self.api.scheduler.failures.merge(failures)
+
+        if self.on_finished is not None:
+            for ticket in finished:
+                await self.on_finished(ticket)
+
+
+async def download_sharded(
+        api: ImgurAPI,
+        workers: int,
+        urls: Iterable[str] = (),
+        input_file: Optional[str] = None,
+        favorites: Optional[str] = None,
+        account_images: Optional[str] = None,
+        sort: str = 'newest',
+        starting_page: int = 0,
+        max_items: Optional[int] = None
+):
+    """
+    Enumerate the requested downloads in this process and download them on worker processes.
+
+    Tag and subreddit listings are expanded here so their items spread over
+    every worker; any other url is downloaded by one worker. As in
+    `download_url_file`, urls of the input file seen recently are skipped,
+    and unless it is stdin its progress is checkpointed: a line counts as
+    finished once the workers finished every download it led to.
+
+    Parameters:
+        api (ImgurAPI): The Imgur API object of the main process
+        workers (int): The number of worker processes
+        urls (Iterable[str]): Urls to download
+        input_file (str): A file of urls, one per line, or '-' for stdin
+        favorites (str): The username whose favorites are downloaded
+        account_images (str): The username whose images are downloaded
+        sort (str): The sort order of the favorites
+        starting_page (int): The page favorites and account images start on
+        max_items (int): The maximum number of favorites and account images
+    """
+    seen = BoundedSet()
+    checkpoint = Checkpoint(f'{input_file}.checkpoint', api.writer) if input_file not in (None, '-') else None
+    starting_line = checkpoint.load() if checkpoint else 0
+    tickets = itertools.count()
+    ticket_lines: Dict[int, int] = {}
+    # The tasks of each line not finished yet, plus one while the line is still being submitted
+    unfinished: Dict[int, int] = {}
+
+    if starting_line:
+        logger.info(f'Resuming {input_file} after line {starting_line}')
+
+    async def release(line_number: int):
+        unfinished[line_number] -= 1
+
+        if not unfinished[line_number]:
+            del unfinished[line_number]
+
+            if checkpoint:
+                await checkpoint.complete(line_number)
+
+    async def on_finished(ticket: int):
+        await release(ticket_lines.pop(ticket))
+
+    def ticket_for(line_number: Optional[int]) -> Optional[int]:
+        if line_number is None:
+            return None
+
+        ticket = next(tickets)
+        ticket_lines[ticket] = line_number
+        unfinished[line_number] += 1
+        return ticket
+
+    async def submit_url(pool: WorkerPool, url: str, line_number: Optional[int] = None):
+        try:
+            imgur_object = parse_id(url)
+        except ValueError:
+            await pool.submit(url, ('url', url, ticket_for(line_number)))  # The worker records the failure
+            return
+
+        if imgur_object.type == ImgurObjectType.TAG:
+            listing = Tag(imgur_object.id, api).iter_items()
+
+        elif imgur_object.type == ImgurObjectType.SUBREDDIT and imgur_object.subreddit is None:
+            listing = Subreddit(imgur_object.id, api).iter_items()
+
+        else:
+            await pool.submit(imgur_object.id, ('url', url, ticket_for(line_number)))
+            return
+
+        try:
+            async for item in listing:
+                await pool.submit_item(item, ticket_for(line_number))
+
+        except Exception as error:
+            logger.exception(f'Error with url {url}:')
+            api.scheduler.failures.record('url', url, error)
+
+    async def submit_file(pool: WorkerPool, path: str):
+        async for line_number, line in read_lines(path, api.writer, starting_line=starting_line):
+            url = line.strip()
+            unfinished[line_number] = 1
+
+            if url and not url.startswith('#') and seen.add(url):
+                await submit_url(pool, url, line_number)
+
+            await release(line_number)
+
+    try:
+        async with WorkerPool(api, workers, on_finished=on_finished) as pool:
+            for url in urls:
+                await submit_url(pool, url)
+
+            if input_file is not None:
+                await submit_file(pool, input_file)
+
+            if favorites is not None:
+                async for item in Account(favorites, api).iter_account_favorites(favorites, sort=sort, page=starting_page, max_items=max_items or -1):
+                    await pool.submit_item(item)
+
+            if account_images is not None:
+                async for item in Account(account_images, api).iter_account_images(account_images, starting_page=starting_page, max_items=max_items):
+                    await pool.submit_item(item)
+
+    except asyncio.CancelledError:
+        if checkpoint:
+            await checkpoint.save()  # Resume after the last finished line, not the last periodic save
+        raise
+
+    if checkpoint and not unfinished:
+        await checkpoint.finish()
+    elif checkpoint:
+        # A worker stopped before finishing some lines
+        await checkpoint.save()
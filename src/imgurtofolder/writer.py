@@ -0,0 +1,144 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from logging import getLogger
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Optional, TypeVar
+
+logger = getLogger(__name__)
+
+T = TypeVar('T')
+
+_CLOSE = None
+
+
+class FileWriter:
+    """
+    Runs file system work on a bounded thread pool so slow disks never stall the event loop.
+    """
+
+    DEFAULT_WORKERS: int = 4
+    DEFAULT_QUEUE_SIZE: int = 16
+
+    def __init__(self, max_workers: int = DEFAULT_WORKERS, queue_size: int = DEFAULT_QUEUE_SIZE):
+        """
+        Parameters:
+            max_workers (int): The number of writer threads
+            queue_size (int): The number of chunks buffered per open file before writes wait
+        """
+        self.queue_size = queue_size
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='imgurtofolder-writer')
+
+    async def run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """
+        Run a blocking function on the writer pool.
+
+        Parameters:
+            func (Callable): The function to run
+            *args: Positional arguments for the function
+            **kwargs: Keyword arguments for the function
+
+        Returns:
+            T: The result of the function
+        """
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor,
+            functools.partial(func, *args, **kwargs)
+        )
+
+    async def close(self):
+        """
+        Wait for the queued file system work to finish and stop the threads.
+        """
+        await asyncio.get_running_loop().run_in_executor(None, functools.partial(self._executor.shutdown, wait=True))
+
+    def open(self, path: Path, mode: str = 'wb', digest: Optional[Any] = None) -> 'AsyncFile':
+        """
+        Open a file whose writes happen on the writer pool.
+
+        Parameters:
+            path (Path): The file to open
+            mode (str): 'wb' or 'ab'
+            digest: Optional hashlib object updated with every chunk written
+
+        Returns:
+            AsyncFile: An async context manager for the file
+        """
+        return AsyncFile(self, path, mode, digest)
+
+
+class AsyncFile:
+    """
+    A binary file written through a bounded queue drained on the writer pool.
+
+    `write` only waits when the queue is full, so the network keeps reading
+    while the disk catches up. Leaving the context flushes the queue, fsyncs
+    and closes the file. The first write error is raised from the next
+    `write` or from leaving the context.
+    """
+
+    def __init__(self, writer: FileWriter, path: Path, mode: str, digest: Optional[Any] = None):
+        self.path = path
+        self.size = 0
+        self._writer = writer
+        self._mode = mode
+        self._digest = digest
+        self._file: Optional[BinaryIO] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._error: Optional[BaseException] = None
+
+    async def __aenter__(self) -> 'AsyncFile':
+        self._file = await self._writer.run(open, self.path, self._mode)
+        self._queue = asyncio.Queue(maxsize=self._writer.queue_size)
+        self._task = asyncio.create_task(self._drain())
+        return self
+
+    async def __aexit__(self, *exc_info):
+        try:
+            await self._queue.put(_CLOSE)
+            await self._task
+        finally:
+            await self._writer.run(self._close)
+
+        if self._error is not None:
+            raise self._error
+
+    async def write(self, chunk: bytes):
+        """
+        Queue a chunk to be written, waiting only while the queue is full.
+
+        Parameters:
+            chunk (bytes): The bytes to write
+        """
+        if self._error is not None:
+            raise self._error
+
+        self.size += len(chunk)
+        await self._queue.put(chunk)
+
+    def _write(self, chunk: bytes):
+        self._file.write(chunk)
+
+        if self._digest is not None:
+            self._digest.update(chunk)
+
+    def _close(self):
+        try:
+            if self._error is None:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+        finally:
+            self._file.close()
+
+    async def _drain(self):
+        while (chunk := await self._queue.get()) is not _CLOSE:
+            if self._error is not None:
+                continue  # Keep draining so writers never block on a full queue
+
+            try:
+                await self._writer.run(self._write, chunk)
+            except Exception as error:
+                logger.debug(f'Error writing {self.path}', exc_info=True)
+                self._error = error
@@ -0,0 +1,46 @@
+from typing import Any, Callable, List
+
+import httpx
+import pytest
+import pytest_asyncio
+
+from imgurtofolder.api import ImgurAPI
+from imgurtofolder.configuration import Configuration
+
+
+@pytest.fixture
+def configuration(tmp_path) -> Configuration:
+    """
+    A configuration writing into a temporary directory.
+    """
+    return Configuration(
+        config_path=str(tmp_path / 'config.json'),
+        access_token='access',
+        client_id='client',
+        client_secret='secret',
+        refresh_token='refresh',
+        download_path=str(tmp_path / 'downloads'),
+    )
+
+
+@pytest_asyncio.fixture
+async def api_with_transport(configuration):
+    """
+    Builds an ImgurAPI whose requests are answered by a handler instead of the network, closed after the test.
+
+    Usage: `api = api_with_transport(handler, use_cache=False)`; keyword arguments are set on the configuration first.
+    """
+    apis: List[ImgurAPI] = []
+
+    def build(handler: Callable[[httpx.Request], Any], **config: Any) -> ImgurAPI:
+        for name, value in config.items():
+            setattr(configuration, name, value)
+
+        api = ImgurAPI(configuration, transport=httpx.MockTransport(handler))
+        apis.append(api)
+        return api
+
+    yield build
+
+    for api in apis:
+        await api.close()
@@ -76,7 +76,7 @@ def generate_item(**kwargs) -> Dict:
             'wall_unsafe_flags': [],
             'show_ads': True,
             'show_ad_level': 2,
-            'nsfw_score': 0,
-            **kwargs
-        }
+            'nsfw_score': 0
+        },
+        **kwargs
     }
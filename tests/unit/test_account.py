@@ -0,0 +1,51 @@
+import httpx
+import pytest
+
+from imgurtofolder.downloader import download_account_images
+from imgurtofolder.objects import Account
+
+
+def paged_handler(pages: int, page_size: int = 2):
+
+    def handler(request: httpx.Request) -> httpx.Response:
+
+        if request.url.host == 'i.imgur.com':
+            return httpx.Response(200, content=b'image')
+
+        page = int(request.url.path.split('/')[5])
+        return httpx.Response(200, json={
+            'data': [
+                {'id': f'{page}{index}', 'title': None, 'link': f'https://i.imgur.com/{page}{index}.jpg', 'is_album': False}
+                for index in range(page_size)
+            ] if page < pages else []
+        })
+
+    return handler
+
+
+@pytest.mark.asyncio
+async def test_iter_account_favorites_streams_every_page(api_with_transport):
+
+    api = api_with_transport(paged_handler(pages=3))
+
+    favorites = [favorite['id'] async for favorite in Account('me', api).iter_account_favorites('me')]
+
+    assert favorites == ['00', '01', '10', '11', '20', '21']
+
+
+@pytest.mark.asyncio
+async def test_download_account_images_uses_listing_metadata(api_with_transport, tmp_path):
+
+    requested = []
+    handler = paged_handler(pages=2)
+
+    def recording_handler(request: httpx.Request) -> httpx.Response:
+        requested.append(request.url.path)
+        return handler(request)
+
+    api = api_with_transport(recording_handler)
+
+    await download_account_images('me', api, max_items=3)
+
+    assert not any(path.startswith('/3/image/') for path in requested)
+    assert sorted(path.name for path in tmp_path.joinpath('downloads').iterdir()) == ['00.jpg', '01.jpg', '10.jpg']
@@ -1,5 +1,7 @@
+from pathlib import Path
 from unittest.mock import patch
 
+import httpx
 import pytest
 
 from imgurtofolder.objects import Album
@@ -33,3 +35,33 @@ async def test_get_album_metadata(mock_imgur_api):
             'type': 'image/jpeg',
         }
     ]
+
+
+@pytest.mark.asyncio
+async def test_download_album_does_not_refetch_images(configuration, api_with_transport):
+
+    requested = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requested.append(request.url.path)
+
+        if request.url.host == 'api.imgur.com':
+            return httpx.Response(200, json={
+                'data': {
+                    'id': 'album',
+                    'title': 'album',
+                    'images_count': 2,
+                    'images': [
+                        {'id': '1', 'title': None, 'link': 'https://i.imgur.com/1.jpg'},
+                        {'id': '2', 'title': None, 'link': 'https://i.imgur.com/2.jpg'},
+                    ]
+                }
+            })
+        return httpx.Response(200, content=b'image')
+
+    api = api_with_transport(handler)
+
+    await Album('album', api).download()
+
+    assert sorted(requested) == ['/1.jpg', '/2.jpg', '/3/album/album']
+    assert sorted(path.name for path in (Path(configuration.download_path) / 'album').iterdir()) == ['1 - 1.jpg', '2 - 2.jpg']
@@ -0,0 +1,196 @@
+import asyncio
+import json
+from pathlib import Path
+
+import httpx
+import pytest
+
+from imgurtofolder.api import RetryPolicy
+from imgurtofolder.ratelimit import RateLimiter
+
+
+@pytest.mark.asyncio
+async def test_get_returns_json_through_pooled_client(api_with_transport):
+
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, json={'data': {'id': '1'}})
+
+    api = api_with_transport(handler)
+
+    first = await api.get('image/1', headers={'Authorization': 'Client-ID client'})
+    second = await api.get('image/2')
+
+    assert first == {'data': {'id': '1'}}
+    assert second == {'data': {'id': '1'}}
+    assert str(requests[0].url) == 'https://api.imgur.com/3/image/1'
+    assert requests[0].headers['Authorization'] == 'Client-ID client'
+    assert requests[0].headers['Accept'] == 'application/json'
+
+
+@pytest.mark.asyncio
+async def test_clients_are_pooled_per_host(api_with_transport):
+
+    api = api_with_transport(lambda request: httpx.Response(200, json={}))
+
+    await api.get('image/1')
+    await api.get('album/1')
+    await api.get('https://i.imgur.com/1.jpg', return_raw_response=True)
+    assert set(api._clients) == {'api.imgur.com', 'i.imgur.com'}
+
+    await api.close()
+
+    assert api._clients == {}
+
+
+@pytest.mark.asyncio
+async def test_streamed_response_is_left_unread(api_with_transport):
+
+    api = api_with_transport(lambda request: httpx.Response(200, content=b'bytes'))
+
+    response = await api.get(
+        'https://i.imgur.com/1.jpg',
+        return_raw_response=True,
+        include_default_headers=False,
+        stream=True,
+    )
+    assert b''.join([chunk async for chunk in response.aiter_bytes()]) == b'bytes'
+    await response.aclose()
+
+
+@pytest.mark.asyncio
+async def test_transient_errors_are_retried(api_with_transport):
+
+    statuses = [503, 429, 200]
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(statuses.pop(0), json={'data': {}}, headers={'Retry-After': '0'})
+
+    api = api_with_transport(handler)
+
+    assert await api.get('image/1') == {'data': {}}
+
+    assert statuses == []
+
+
+@pytest.mark.asyncio
+async def test_permanent_errors_are_not_retried(api_with_transport):
+
+    statuses = [404, 200]
+
+    api = api_with_transport(lambda request: httpx.Response(statuses.pop(0)))
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await api.get('image/1')
+
+    assert statuses == [200]
+
+
+def test_retry_delay_prefers_retry_after():
+
+    policy = RetryPolicy(backoff=1, max_backoff=4)
+    response = httpx.Response(429, headers={'Retry-After': '7'}, request=httpx.Request('GET', 'https://api.imgur.com'))
+
+    assert policy.delay(1, httpx.HTTPStatusError('', request=response.request, response=response)) == 7
+    assert 0 <= policy.delay(10) <= 4
+
+
+@pytest.mark.asyncio
+async def test_expired_bearer_token_is_refreshed_once(configuration, api_with_transport):
+
+    refreshes = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+
+        if request.url.path == '/oauth2/token':
+            refreshes.append(request.content)
+            return httpx.Response(200, json={'access_token': 'new', 'refresh_token': 'new-refresh'})
+
+        if request.headers['Authorization'] != 'Bearer new':
+            return httpx.Response(401, json={})
+
+        return httpx.Response(200, json={'data': []})
+
+    api = api_with_transport(handler)
+    api.rate_limiter = RateLimiter(rate=1000, capacity=1000)
+
+    responses = await asyncio.gather(*(
+        api.get('account/me/favorites/0/newest', headers={'Authorization': f'Bearer {configuration.access_token}'})
+        for _ in range(20)
+    ))
+
+    assert responses == [{'data': []}] * 20
+    assert len(refreshes) == 1
+    assert json.loads(Path(configuration.config_path).read_text())['access_token'] == 'new'
+    assert configuration.refresh_token == 'new-refresh'
+
+
+@pytest.mark.asyncio
+async def test_a_failed_refresh_is_shared_and_not_retried(configuration, api_with_transport):
+
+    refreshes = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+
+        if request.url.path == '/oauth2/token':
+            refreshes.append(request.content)
+            return httpx.Response(400, json={'error': 'invalid_grant'})
+
+        return httpx.Response(401, json={})
+
+    api = api_with_transport(handler)
+    api.rate_limiter = RateLimiter(rate=1000, capacity=1000)
+
+    def get_favorites():
+        return api.get('account/me/favorites/0/newest', headers={'Authorization': f'Bearer {configuration.access_token}'})
+
+    results = await asyncio.gather(*(get_favorites() for _ in range(50)), return_exceptions=True)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await get_favorites()
+
+    assert all(isinstance(result, httpx.HTTPStatusError) for result in results)
+    assert len(refreshes) == 1
+    assert configuration.access_token == 'access'
+
+
+@pytest.mark.asyncio
+async def test_a_transient_refresh_failure_is_retried_and_not_remembered(configuration, api_with_transport):
+
+    statuses = [503, 503, 503, 200]
+
+    def handler(request: httpx.Request) -> httpx.Response:
+
+        if request.url.path == '/oauth2/token':
+            status = statuses.pop(0)
+            return httpx.Response(status, json={'access_token': 'new'} if status == 200 else {})
+
+        if request.headers['Authorization'] != 'Bearer new':
+            return httpx.Response(401, json={})
+
+        return httpx.Response(200, json={'data': []})
+
+    api = api_with_transport(handler)
+    api.api_retry_policy = RetryPolicy(max_attempts=2, backoff=0)
+
+    def get_favorites():
+        return api.get('account/me/favorites/0/newest', headers={'Authorization': f'Bearer {configuration.access_token}'})
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await get_favorites()
+
+    assert await get_favorites() == {'data': []}
+    assert statuses == []
+
+
+@pytest.mark.asyncio
+async def test_client_id_requests_are_not_refreshed(configuration, api_with_transport):
+
+    api = api_with_transport(lambda request: httpx.Response(403, json={}))
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await api.get('image/1', headers={'Authorization': 'Client-ID client'})
+
+    assert configuration.access_token == 'access'
@@ -0,0 +1,70 @@
+import httpx
+import pytest
+
+from imgurtofolder.batch import BoundedSet, Checkpoint, read_lines
+from imgurtofolder.downloader import download_url_file
+from imgurtofolder.writer import FileWriter
+
+
+def test_bounded_set_forgets_least_recently_seen_items():
+
+    seen = BoundedSet(max_size=2)
+
+    assert seen.add('a')
+    assert seen.add('b')
+    assert not seen.add('a')
+    assert seen.add('c')
+
+    assert 'a' in seen
+    assert 'b' not in seen
+    assert len(seen) == 2
+
+
+@pytest.mark.asyncio
+async def test_checkpoint_only_advances_past_finished_lines(tmp_path):
+
+    checkpoint = Checkpoint(str(tmp_path / 'urls.txt.checkpoint'), FileWriter())
+    checkpoint.SAVE_EVERY_LINES = 1
+
+    await checkpoint.complete(2)
+    await checkpoint.complete(3)
+    assert checkpoint.line == 0
+
+    await checkpoint.complete(1)
+    assert checkpoint.line == 3
+    assert Checkpoint(str(tmp_path / 'urls.txt.checkpoint'), FileWriter()).load() == 3
+
+    await checkpoint.finish()
+    assert not (tmp_path / 'urls.txt.checkpoint').exists()
+
+
+@pytest.mark.asyncio
+async def test_read_lines_skips_to_the_starting_line(tmp_path):
+
+    (tmp_path / 'urls.txt').write_text('a\nb\nc\n')
+
+    lines = [line async for line in read_lines(str(tmp_path / 'urls.txt'), FileWriter(), starting_line=1)]
+
+    assert lines == [(2, 'b\n'), (3, 'c\n')]
+
+
+@pytest.mark.asyncio
+async def test_download_url_file_dedupes_and_clears_its_checkpoint(api_with_transport, tmp_path):
+
+    requested = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requested.append(request.url.path)
+
+        if request.url.host == 'api.imgur.com':
+            image_id = request.url.path.rsplit('/', 1)[-1]
+            return httpx.Response(200, json={'data': {'id': image_id, 'link': f'https://i.imgur.com/{image_id}.jpg'}})
+        return httpx.Response(200, content=b'image')
+
+    (tmp_path / 'urls.txt').write_text('# comment\nhttps://imgur.com/one\n\nhttps://imgur.com/two\nhttps://imgur.com/one\n')
+    api = api_with_transport(handler)
+
+    await download_url_file(str(tmp_path / 'urls.txt'), api)
+
+    assert sorted(requested) == ['/3/image/one', '/3/image/two', '/one.jpg', '/two.jpg']
+    assert not (tmp_path / 'urls.txt.checkpoint').exists()
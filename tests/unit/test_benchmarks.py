@@ -0,0 +1,34 @@
+import pytest
+
+from benchmarks.fake_imgur import FakeImgur, FakeImgurOptions
+from benchmarks.run import LocalTransport, compare, measure
+from imgurtofolder.api import ImgurAPI
+
+
+@pytest.mark.asyncio
+async def test_measure_a_flow_against_the_fake_server(configuration):
+
+    options = FakeImgurOptions(pages=1, items_per_page=4, album_ratio=0, image_size=1024, api_latency=0, cdn_latency=0)
+    server = await FakeImgur(options).serve()
+    port = server.sockets[0].getsockname()[1]
+
+    try:
+        result = await measure('favorites', ImgurAPI(configuration, transport=LocalTransport(port)), port, items=4)
+    finally:
+        server.close()
+
+    assert result['images'] == 4
+    assert result['megabytes'] == pytest.approx(4 * 1024 / float(1 << 20), abs=0.01)
+    assert result['api_calls_per_image'] == 0.25  # max_items stops paging after page 0
+    assert result['failures'] == 0
+
+
+def test_compare_reports_regressions_past_the_tolerance():
+
+    baseline = {'tag': {'images_per_second': 100, 'mb_per_second': 10, 'api_calls_per_image': 0.2}}
+    results = [{'flow': 'tag', 'images_per_second': 85, 'mb_per_second': 5, 'api_calls_per_image': 0.3}]
+
+    assert compare(results, baseline, tolerance=0.2) == [
+        'tag mb_per_second: 10 -> 5',
+        'tag api_calls_per_image: 0.2 -> 0.3',
+    ]
@@ -0,0 +1,83 @@
+import httpx
+import pytest
+
+from imgurtofolder.cache import ResponseCache
+
+
+@pytest.mark.asyncio
+async def test_fresh_responses_are_served_without_a_request(api_with_transport):
+
+    requested = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requested.append(request.url.path)
+        return httpx.Response(200, json={'data': {'id': 'album'}})
+
+    api = api_with_transport(handler)
+
+    assert await api.get('album/1') == {'data': {'id': 'album'}}
+    assert await api.get('album/1') == {'data': {'id': 'album'}}
+    assert await api.get('album/1', use_cache=False) == {'data': {'id': 'album'}}
+
+    assert requested == ['/3/album/1', '/3/album/1']
+
+
+@pytest.mark.asyncio
+async def test_stale_responses_are_revalidated_with_etag(api_with_transport):
+
+    conditions = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        conditions.append(request.headers.get('If-None-Match'))
+
+        if request.headers.get('If-None-Match') == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, json={'data': {'id': 'album'}}, headers={'ETag': '"v1"'})
+
+    api = api_with_transport(handler, cache_ttl=0)
+
+    assert await api.get('album/1') == {'data': {'id': 'album'}}
+    assert await api.get('album/1') == {'data': {'id': 'album'}}
+
+    assert conditions == [None, '"v1"']
+
+
+def test_least_recently_used_responses_are_evicted(tmp_path, monkeypatch):
+
+    clock = iter(range(100))
+    monkeypatch.setattr('imgurtofolder.cache.time.time', lambda: next(clock))
+
+    cache = ResponseCache(str(tmp_path / 'cache.sqlite3'), max_size=10)
+
+    cache.put('a', 'a', b'12345')
+    cache.put('b', 'b', b'12345')
+    cache.get('a')
+    cache.put('c', 'c', b'12345')
+
+    assert cache.get('a') is not None
+    assert cache.get('b') is None
+    assert cache.get('c') is not None
+
+
+def test_hits_are_written_in_batches(tmp_path, monkeypatch):
+
+    clock = iter(range(100))
+    monkeypatch.setattr('imgurtofolder.cache.time.time', lambda: next(clock))
+
+    cache = ResponseCache(str(tmp_path / 'cache.sqlite3'))
+    cache.put('a', 'a', b'12345')
+    cache.get('a')
+
+    def accessed_at():
+        return cache.connection.execute('SELECT accessed_at FROM responses WHERE key = ?', ('a',)).fetchone()[0]
+
+    assert accessed_at() == 0
+
+    cache.flush()
+
+    assert accessed_at() == 1
+
+
+def test_bearer_tokens_share_a_scope():
+    assert ResponseCache.key('url', 'Bearer old') == ResponseCache.key('url', 'Bearer new')
+    assert ResponseCache.key('url', 'Client-ID a') != ResponseCache.key('url', 'Client-ID b')
@@ -0,0 +1,76 @@
+import asyncio
+
+import httpx
+import pytest
+
+from imgurtofolder.coalesce import SingleFlight
+from imgurtofolder.objects import Album, Image
+
+
+@pytest.mark.asyncio
+async def test_concurrent_lookups_share_one_request(api_with_transport):
+
+    requests = []
+    released = asyncio.Event()
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request.url.path)
+        await released.wait()
+        return httpx.Response(200, json={'data': {'id': 'abc', 'images': []}})
+
+    api = api_with_transport(handler, use_cache=False)
+
+    lookups = asyncio.gather(*(Album('abc', api).get_metadata() for _ in range(3)), Image('abc', api).get_metadata())
+    await asyncio.sleep(0.01)
+    released.set()
+    albums = await lookups
+
+    assert sorted(requests) == ['/3/album/abc', '/3/image/abc']
+    assert albums[0] == albums[1] and albums[0] is not albums[1]
+    assert api.single_flight.coalesced == 2
+
+
+@pytest.mark.asyncio
+async def test_recent_results_are_reused_within_their_ttl(monkeypatch):
+
+    clock = [0.0]
+    monkeypatch.setattr('imgurtofolder.coalesce.time.monotonic', lambda: clock[0])
+    calls = []
+
+    async def request():
+        calls.append(None)
+        return {'calls': len(calls)}
+
+    single_flight = SingleFlight(max_size=1, ttl=10)
+
+    assert await single_flight.run('a', request) == {'calls': 1}
+    assert await single_flight.run('a', request) == {'calls': 1}
+    assert await single_flight.run('a', request, use_recent=False) == {'calls': 2}
+
+    clock[0] = 20
+    assert await single_flight.run('a', request) == {'calls': 3}
+
+    await single_flight.run('b', request)
+    assert 'a' not in single_flight._recent
+
+
+@pytest.mark.asyncio
+async def test_failures_are_shared_but_not_remembered():
+
+    attempts = []
+
+    async def request():
+        attempts.append(None)
+        await asyncio.sleep(0)
+        raise ValueError('broken')
+
+    single_flight = SingleFlight()
+    results = await asyncio.gather(single_flight.run('a', request), single_flight.run('a', request), return_exceptions=True)
+
+    assert [type(result) for result in results] == [ValueError, ValueError]
+    assert len(attempts) == 1
+
+    with pytest.raises(ValueError):
+        await single_flight.run('a', request)
+
+    assert len(attempts) == 2
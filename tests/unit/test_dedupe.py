@@ -0,0 +1,33 @@
+import httpx
+import pytest
+
+from imgurtofolder.api import ImgurAPI
+from imgurtofolder.objects import Image
+
+
+@pytest.mark.asyncio
+async def test_known_images_and_identical_bytes_are_hardlinked(api_with_transport, tmp_path):
+
+    requested = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requested.append(request.url.path)
+        return httpx.Response(200, content=b'image')
+
+    api = api_with_transport(handler, dedupe='hardlink')
+
+    await Image('1', api).download(path=str(tmp_path / 'a'), metadata={'id': '1', 'link': 'https://i.imgur.com/1.jpg'})
+    await Image('1', api).download(path=str(tmp_path / 'b'), metadata={'id': '1', 'link': 'https://i.imgur.com/1.jpg'})
+    await Image('2', api).download(path=str(tmp_path / 'c'), metadata={'id': '2', 'link': 'https://i.imgur.com/2.jpg'})
+
+    assert requested == ['/1.jpg', '/2.jpg']
+
+    original = (tmp_path / 'a' / '1.jpg').stat()
+    assert (tmp_path / 'b' / '1.jpg').stat().st_ino == original.st_ino
+    assert (tmp_path / 'c' / '2.jpg').stat().st_ino == original.st_ino
+    assert api.deduplicator.files_linked == 2
+    assert api.deduplicator.bytes_saved == 2 * len(b'image')
+
+
+def test_deduplication_is_off_by_default(configuration):
+    assert ImgurAPI(configuration).deduplicator is None
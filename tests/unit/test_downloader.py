@@ -0,0 +1,89 @@
+import httpx
+import pytest
+
+from benchmarks.parse_id import legacy_parse_id
+from imgurtofolder.downloader import download_url, parse_id
+from imgurtofolder.objects import ImgurObjectType
+
+
+def test_parse_id_classifies_every_kind_of_url():
+
+    expected = {
+        'https://imgur.com/a/rYXPu9x': ('rYXPu9x', ImgurObjectType.ALBUM, None),
+        'https://imgur.com/a/rYXPu9x#0': ('rYXPu9x', ImgurObjectType.ALBUM, None),
+        'https://imgur.com/a/abc-def': ('def', ImgurObjectType.ALBUM, None),
+        'https://imgur.com/gallery/HxRgTyb': ('HxRgTyb', ImgurObjectType.GALLERY, None),
+        'imgur.com/g/HxRgTyb': ('HxRgTyb', ImgurObjectType.GALLERY, None),
+        'https://imgur.com/gallery/funny-cat-AbC123': ('AbC123', ImgurObjectType.GALLERY, None),
+        'https://imgur.com/r/aww/Ur2Yx4q': ('Ur2Yx4q', ImgurObjectType.SUBREDDIT, 'aww'),
+        'https://imgur.com/r/aww': ('aww', ImgurObjectType.SUBREDDIT, None),
+        'https://imgur.com/t/funny': ('funny', ImgurObjectType.TAG, None),
+        'https://imgur.com/Ur2Yx4q': ('Ur2Yx4q', ImgurObjectType.IMAGE, None),
+        'https://imgur.com/Ur2Yx4q.jpg': ('Ur2Yx4q', ImgurObjectType.IMAGE, None),
+        'https://i.imgur.com/Ur2Yx4q.jpg': ('Ur2Yx4q', ImgurObjectType.DIRECT, None),
+        'https://i.imgur.com/Ur2Yx4q.GIFV?1': ('Ur2Yx4q', ImgurObjectType.DIRECT, None),
+    }
+
+    for url, (id, type, subreddit) in expected.items():
+        imgur_object = parse_id(url)
+
+        assert (imgur_object.id, imgur_object.type, imgur_object.subreddit) == (id, type, subreddit), url
+
+    assert parse_id('https://i.imgur.com/Ur2Yx4q.GIFV?1').extension == '.gifv'
+
+    for url in ('https://example.org/a/rYXPu9x', 'https://imgur.com/user/foo', 'https://imgur.com/a'):
+        with pytest.raises(ValueError):
+            parse_id(url)
+
+
+def test_parse_id_agrees_with_the_legacy_classifier():
+
+    # Slugged album and gallery links keep their type; only the id moved to the part after the last '-'
+    for url in ('https://imgur.com/a/abc-def', 'https://imgur.com/gallery/funny-cat-AbC123', 'https://imgur.com/Ur2Yx4q'):
+        assert parse_id(url).type == legacy_parse_id(url).type, url
+
+    assert parse_id('https://imgur.com/a/rYXPu9x') == legacy_parse_id('https://imgur.com/a/rYXPu9x')
+
+    for function in (parse_id, legacy_parse_id):
+        with pytest.raises(ValueError):
+            function('https://imgur.com/user/foo')
+
+
+@pytest.mark.asyncio
+async def test_direct_links_are_downloaded_without_the_api(api_with_transport, tmp_path):
+
+    requested = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requested.append(str(request.url))
+        return httpx.Response(200, content=b'video')
+
+    api = api_with_transport(handler)
+
+    await download_url('https://i.imgur.com/Ur2Yx4q.gifv', api)
+
+    assert requested == ['https://i.imgur.com/Ur2Yx4q.mp4']
+    assert (tmp_path / 'downloads' / 'Ur2Yx4q.mp4').read_bytes() == b'video'
+
+
+@pytest.mark.asyncio
+async def test_direct_links_fetch_titles_when_asked(configuration, api_with_transport, tmp_path):
+
+    configuration.fetch_titles = True
+    requested = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requested.append(request.url.host)
+
+        if request.url.host == 'api.imgur.com':
+            return httpx.Response(200, json={
+                'data': {'id': 'Ur2Yx4q', 'title': 'cat', 'link': 'https://i.imgur.com/Ur2Yx4q.jpg'}
+            })
+        return httpx.Response(200, content=b'image')
+
+    api = api_with_transport(handler)
+
+    await download_url('https://i.imgur.com/Ur2Yx4q.jpg', api)
+
+    assert requested == ['api.imgur.com', 'i.imgur.com']
+    assert (tmp_path / 'downloads' / 'cat.jpg').read_bytes() == b'image'
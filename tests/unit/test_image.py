@@ -1,7 +1,9 @@
 from unittest.mock import patch
 
+import httpx
 import pytest
 
+from imgurtofolder.api import IncompleteDownloadError
 from imgurtofolder.objects import Image
 from tests.awaitables import cast_as_awaitable
 
@@ -50,3 +52,195 @@ async def test_get_image_metadata(mock_imgur_api):
     assert image_metadata['title'] == 'test'
     assert image_metadata['link'] == 'https://i.imgur.com/12345678.jpg'
     assert image_metadata['type'] == 'image/jpeg'
+
+
+@pytest.mark.asyncio
+async def test_download_uses_prefetched_metadata(api_with_transport, tmp_path):
+
+    requested = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requested.append(request.url.host)
+        return httpx.Response(200, content=b'image')
+
+    api = api_with_transport(handler)
+
+    await Image('12345678', api).download(
+        path=str(tmp_path),
+        metadata={'id': '12345678', 'title': 'test', 'link': 'https://i.imgur.com/12345678.jpg'}
+    )
+
+    assert requested == ['i.imgur.com']
+    assert (tmp_path / 'test.jpg').read_bytes() == b'image'
+
+
+@pytest.mark.asyncio
+async def test_download_fetches_missing_metadata(api_with_transport, tmp_path):
+
+    requested = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requested.append(request.url.host)
+
+        if request.url.host == 'api.imgur.com':
+            return httpx.Response(200, json={
+                'data': {'id': '12345678', 'title': None, 'link': 'https://i.imgur.com/12345678.png'}
+            })
+        return httpx.Response(200, content=b'image')
+
+    api = api_with_transport(handler)
+
+    await Image('12345678', api).download(path=str(tmp_path), metadata={'id': '12345678'})
+
+    assert requested == ['api.imgur.com', 'i.imgur.com']
+    assert (tmp_path / '12345678.png').exists()
+
+
+@pytest.mark.asyncio
+async def test_download_resumes_a_partial_file(api_with_transport, tmp_path):
+
+    ranges = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        ranges.append(request.headers.get('Range'))
+        return httpx.Response(206, content=b'age', headers={'Content-Range': 'bytes 2-4/5'})
+
+    (tmp_path / 'test.jpg.part').write_bytes(b'im')
+    api = api_with_transport(handler)
+
+    await Image('1', api).download(
+        path=str(tmp_path),
+        metadata={'id': '1', 'title': 'test', 'link': 'https://i.imgur.com/1.jpg', 'size': 5}
+    )
+
+    assert ranges == ['bytes=2-']
+    assert (tmp_path / 'test.jpg').read_bytes() == b'image'
+    assert not (tmp_path / 'test.jpg.part').exists()
+
+
+@pytest.mark.asyncio
+async def test_a_complete_part_file_is_kept_when_the_range_is_rejected(api_with_transport, tmp_path):
+
+    ranges = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        ranges.append(request.headers.get('Range'))
+        return httpx.Response(416, headers={'Content-Range': 'bytes */5'})
+
+    (tmp_path / 'test.jpg.part').write_bytes(b'image')
+    api = api_with_transport(handler)
+
+    await Image('1', api).download(
+        path=str(tmp_path),
+        metadata={'id': '1', 'title': 'test', 'link': 'https://i.imgur.com/1.jpg'}
+    )
+
+    assert ranges == ['bytes=5-']
+    assert (tmp_path / 'test.jpg').read_bytes() == b'image'
+    assert not (tmp_path / 'test.jpg.part').exists()
+
+
+@pytest.mark.asyncio
+async def test_a_stale_part_file_is_downloaded_again_once(api_with_transport, tmp_path):
+
+    ranges = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        ranges.append(request.headers.get('Range'))
+
+        if request.headers.get('Range'):
+            return httpx.Response(416, headers={'Content-Range': 'bytes */5'})
+
+        return httpx.Response(200, content=b'image')
+
+    (tmp_path / 'test.jpg.part').write_bytes(b'stale!')
+    api = api_with_transport(handler)
+
+    await Image('1', api).download(
+        path=str(tmp_path),
+        metadata={'id': '1', 'title': 'test', 'link': 'https://i.imgur.com/1.jpg', 'size': 5}
+    )
+
+    assert ranges == ['bytes=6-', None]
+    assert (tmp_path / 'test.jpg').read_bytes() == b'image'
+
+
+@pytest.mark.asyncio
+async def test_incomplete_download_keeps_the_part_file(api_with_transport, tmp_path):
+
+    api = api_with_transport(lambda request: httpx.Response(200, content=b'im'), max_attempts=1)
+
+    with pytest.raises(IncompleteDownloadError):
+        await Image('1', api).download(
+            path=str(tmp_path),
+            metadata={'id': '1', 'title': 'test', 'link': 'https://i.imgur.com/1.jpg', 'size': 5}
+        )
+
+    assert not (tmp_path / 'test.jpg').exists()
+    assert (tmp_path / 'test.jpg.part').read_bytes() == b'im'
+
+
+@pytest.mark.asyncio
+async def test_failed_download_is_retried_then_reported(api_with_transport, tmp_path):
+
+    attempts = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        attempts.append(request.headers.get('Range'))
+        return httpx.Response(200, content=b'im' if len(attempts) == 1 else b'image')
+
+    api = api_with_transport(handler, max_attempts=2)
+    api.download_retry_policy.backoff = 0
+    metadata = {'id': '1', 'title': 'test', 'link': 'https://i.imgur.com/1.jpg', 'size': 5}
+
+    await Image('1', api).download(path=str(tmp_path), metadata=metadata)
+
+    api._transport.handler = lambda request: httpx.Response(404)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await Image('2', api).download(path=str(tmp_path), metadata={**metadata, 'id': '2', 'title': 'other'})
+
+    assert attempts == [None, 'bytes=2-']
+    assert [(failure.kind, failure.id) for failure in api.scheduler.failures.failures] == [('image', '2')]
+
+
+ANIMATED = {
+    'id': 'anim',
+    'title': 'animated',
+    'animated': True,
+    'link': 'https://i.imgur.com/anim.gif',
+    'size': 9000,
+    'gifv': 'https://i.imgur.com/anim.gifv',
+    'mp4': 'https://i.imgur.com/anim.mp4',
+    'mp4_size': 1000,
+}
+
+
+@pytest.mark.parametrize('prefer, metadata, link', [
+    ('original', ANIMATED, 'https://i.imgur.com/anim.gif'),
+    ('mp4', ANIMATED, 'https://i.imgur.com/anim.mp4'),
+    ('smallest', ANIMATED, 'https://i.imgur.com/anim.mp4'),
+    ('smallest', {**ANIMATED, 'mp4_size': 10000}, 'https://i.imgur.com/anim.gif'),
+    ('smallest', {**ANIMATED, 'mp4_size': None}, 'https://i.imgur.com/anim.gif'),
+    ('mp4', {**ANIMATED, 'animated': False}, 'https://i.imgur.com/anim.gif'),
+])
+def test_select_rendition(prefer, metadata, link):
+
+    assert Image.select_rendition(metadata, prefer)['link'] == link
+
+
+@pytest.mark.asyncio
+async def test_download_prefers_the_mp4_of_animated_images(api_with_transport, tmp_path):
+
+    requested = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requested.append(str(request.url))
+        return httpx.Response(200, content=b'x' * 1000)
+
+    api = api_with_transport(handler, prefer='mp4')
+
+    await Image('anim', api).download(metadata=ANIMATED)
+
+    assert requested == ['https://i.imgur.com/anim.mp4']
+    assert [path.name for path in (tmp_path / 'downloads').iterdir()] == ['animated.mp4']
@@ -0,0 +1,74 @@
+import asyncio
+
+import httpx
+import pytest
+
+from imgurtofolder.__main__ import byte_rate, run_jobs
+from imgurtofolder.api import ImgurAPI
+from imgurtofolder.objects import Image
+
+
+@pytest.mark.asyncio
+async def test_jobs_run_concurrently_and_failures_are_isolated(configuration):
+
+    api = ImgurAPI(configuration)
+    first_started = asyncio.Event()
+    finished = []
+
+    async def first():
+        first_started.set()
+        await asyncio.sleep(0.01)
+        finished.append('first')
+
+    async def second():
+        # Only returns if the first job runs at the same time
+        await asyncio.wait_for(first_started.wait(), timeout=1)
+        finished.append('second')
+
+    async def failing():
+        raise ValueError('broken job')
+
+    await run_jobs([second(), failing(), first()], api)
+
+    assert sorted(finished) == ['first', 'second']
+
+
+@pytest.mark.asyncio
+async def test_cancelled_run_keeps_the_part_file(api_with_transport, tmp_path):
+
+    chunk_sent = asyncio.Event()
+
+    class SlowStream(httpx.AsyncByteStream):
+
+        async def __aiter__(self):
+            yield b'im'
+            chunk_sent.set()
+            await asyncio.sleep(60)
+            yield b'age'
+
+    api = api_with_transport(lambda request: httpx.Response(200, stream=SlowStream()))
+    download = Image('1', api).download(
+        path=str(tmp_path),
+        metadata={'id': '1', 'title': 'test', 'link': 'https://i.imgur.com/1.jpg'}
+    )
+
+    task = asyncio.create_task(run_jobs([download], api))
+    await chunk_sent.wait()
+    await asyncio.sleep(0.05)
+    task.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert (tmp_path / 'test.jpg.part').read_bytes() == b'im'
+    assert not (tmp_path / 'test.jpg').exists()
+
+
+def test_byte_rates_accept_binary_suffixes():
+
+    assert byte_rate('500') == 500
+    assert byte_rate('500K') == 500 << 10
+    assert byte_rate('2.5MB/s') == 2.5 * (1 << 20)
+
+    with pytest.raises(ValueError):
+        byte_rate('0')
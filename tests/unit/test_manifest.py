@@ -0,0 +1,84 @@
+import httpx
+import pytest
+
+from imgurtofolder.manifest import Manifest, ManifestEntry
+from imgurtofolder.objects import Image
+
+
+def test_entries_are_keyed_by_image_and_folder(tmp_path):
+
+    manifest = Manifest(str(tmp_path / 'manifest.sqlite3'))
+
+    manifest.add(ManifestEntry('1', '/a', '/a/1.jpg', 10, 'hash', fetched_at=1))
+    manifest.add(ManifestEntry('1', '/b', '/b/1.jpg', 10, 'hash', fetched_at=2))
+
+    assert manifest.get('1', '/a').path == '/a/1.jpg'
+    assert manifest.get('1', '/c') is None
+    assert [entry.folder for entry in manifest.find('1')] == ['/b', '/a']
+
+    manifest.close()
+
+    assert Manifest(str(tmp_path / 'manifest.sqlite3')).get('1', '/b').size == 10
+
+
+@pytest.mark.asyncio
+async def test_entries_are_written_in_batches_off_the_event_loop(tmp_path):
+
+    manifest = Manifest(str(tmp_path / 'manifest.sqlite3'))
+    reader = Manifest(str(tmp_path / 'manifest.sqlite3'))
+
+    for number in range(Manifest.BATCH_SIZE - 1):
+        await manifest.run(manifest.add, ManifestEntry(str(number), '/a', f'/a/{number}.jpg'))
+
+    assert await manifest.run(manifest.get, '0', '/a') is not None
+    assert reader.get('0', '/a') is None
+
+    await manifest.run(manifest.add, ManifestEntry('last', '/a', '/a/last.jpg'))
+
+    assert reader.get('0', '/a') is not None
+    assert len(reader.find('last')) == 1
+
+    manifest.close()
+    reader.close()
+
+
+def test_lookups_see_pending_entries_without_writing_the_batch(tmp_path):
+
+    manifest = Manifest(str(tmp_path / 'manifest.sqlite3'))
+    reader = Manifest(str(tmp_path / 'manifest.sqlite3'))
+
+    manifest.add(ManifestEntry('1', '/a', '/a/1.jpg', 10, 'old', fetched_at=1))
+    manifest.flush()
+    manifest.add(ManifestEntry('1', '/a', '/a/1.jpg', 10, 'new', fetched_at=3))
+    manifest.add(ManifestEntry('1', '/b', '/b/1.jpg', 10, 'new', fetched_at=2))
+
+    assert [(entry.folder, entry.sha256) for entry in manifest.find('1')] == [('/a', 'new'), ('/b', 'new')]
+    assert [entry.folder for entry in manifest.find_by_hash('new')] == ['/b', '/a']
+    assert manifest.find_by_hash('old') == []
+    assert [entry.sha256 for entry in reader.find('1')] == ['old']
+
+    manifest.close()
+    reader.close()
+
+
+@pytest.mark.asyncio
+async def test_download_is_recorded_and_skipped_without_network(api_with_transport, tmp_path):
+
+    requested = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requested.append(request.url.host)
+        return httpx.Response(200, content=b'image')
+
+    api = api_with_transport(handler)
+    metadata = {'id': '1', 'title': 'test', 'link': 'https://i.imgur.com/1.jpg'}
+
+    await Image('1', api).download(path=str(tmp_path), metadata=metadata)
+    (tmp_path / 'test.jpg').rename(tmp_path / 'renamed.jpg')
+    await Image('1', api).download(path=str(tmp_path))
+
+    assert requested == ['i.imgur.com']
+
+    entry = api.manifest.get('1', str(tmp_path))
+    assert entry.size == len(b'image')
+    assert entry.sha256 is not None
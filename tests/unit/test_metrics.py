@@ -0,0 +1,110 @@
+import io
+import json
+
+import httpx
+import pytest
+
+from imgurtofolder.api import ImgurAPI
+from imgurtofolder.metrics import Metrics, MetricsReporter
+from imgurtofolder.objects import Image
+from imgurtofolder.writer import FileWriter
+
+
+def test_prometheus_exposition_of_counters_samples_and_histograms():
+
+    metrics = Metrics()
+    metrics.inc('requests', endpoint='album', status='200')
+    metrics.inc('requests', endpoint='album', status='200')
+    metrics.observe('request_seconds', 0.2, endpoint='album')
+    metrics.sample('queue_depth', lambda: 3)
+    metrics.sample('rate_limit_user_remaining', lambda: None)
+
+    text = metrics.prometheus()
+
+    assert 'imgurtofolder_requests{endpoint="album",status="200"} 2.0' in text
+    assert 'imgurtofolder_queue_depth 3' in text
+    assert 'rate_limit_user_remaining' not in text
+    assert 'imgurtofolder_request_seconds_bucket{endpoint="album",le="0.1"} 0' in text
+    assert 'imgurtofolder_request_seconds_bucket{endpoint="album",le="0.25"} 1' in text
+    assert 'imgurtofolder_request_seconds_count{endpoint="album"} 1' in text
+
+
+def test_endpoints_are_labelled_without_ids(configuration):
+
+    api = ImgurAPI(configuration)
+
+    assert api.endpoint('https://api.imgur.com/3/album/abc') == 'album'
+    assert api.endpoint('https://api.imgur.com/3/gallery/t/funny/top/week/0') == 'gallery/t'
+    assert api.endpoint('https://api.imgur.com/3/account/me/favorites/0/newest') == 'account/favorites'
+    assert api.endpoint('https://i.imgur.com/abc.jpg') == 'cdn'
+
+
+@pytest.mark.asyncio
+async def test_downloads_are_measured(api_with_transport, tmp_path):
+
+    api = api_with_transport(lambda request: httpx.Response(200, content=b'image'))
+    metadata = {'id': '1', 'title': 'test', 'link': 'https://i.imgur.com/1.jpg'}
+
+    await Image('1', api).download(path=str(tmp_path), metadata=metadata)
+    await Image('1', api).download(path=str(tmp_path), metadata=metadata)
+
+    assert api.metrics.value('images', outcome='downloaded') == 1
+    assert api.metrics.value('images', outcome='skipped') == 1
+    assert api.metrics.total('downloaded_bytes') == 5
+    assert api.metrics.value('requests', endpoint='cdn', status='200') == 1
+    assert api.metrics.histograms['request_seconds'][(('endpoint', 'cdn'),)].count == 1
+
+
+@pytest.mark.asyncio
+async def test_reporter_writes_a_final_report(tmp_path):
+
+    metrics = Metrics()
+    metrics.inc('downloaded_bytes', 1 << 20)
+    stream = io.StringIO()
+
+    reporter = MetricsReporter(
+        metrics,
+        FileWriter(),
+        progress=True,
+        stats_log=str(tmp_path / 'stats.jsonl'),
+        prometheus_file=str(tmp_path / 'metrics.prom'),
+        stream=stream
+    )
+
+    async with reporter:
+        metrics.inc('images', outcome='downloaded')
+
+    snapshot = json.loads((tmp_path / 'stats.jsonl').read_text())
+
+    assert snapshot['images{outcome="downloaded"}'] == 1
+    assert 'imgurtofolder_downloaded_bytes 1048576' in (tmp_path / 'metrics.prom').read_text()
+    assert stream.getvalue().startswith('1 downloaded, 0 skipped')
+
+
+def test_counters_merged_from_other_processes_are_added():
+
+    metrics = Metrics()
+    metrics.inc('images', outcome='downloaded')
+    metrics.sample('retries', lambda: 1, kind='counter')
+
+    worker = Metrics()
+    worker.inc('images', outcome='downloaded', amount=2)
+    worker.sample('retries', lambda: 3, kind='counter')
+
+    metrics.merge('worker-0', worker.export())
+    metrics.merge('worker-0', worker.export())  # Replaces the previous report
+
+    assert metrics.value('images', outcome='downloaded') == 3
+    assert metrics.value('retries') == 4
+    assert metrics.snapshot()['images{outcome="downloaded"}'] == 3
+    assert 'imgurtofolder_retries 4' in metrics.prometheus()
+
+
+def test_progress_reports_throughput_against_the_bandwidth_cap():
+
+    metrics = Metrics()
+    metrics.started -= 10
+    metrics.inc('downloaded_bytes', 10 << 20)
+    metrics.sample('max_bandwidth_bytes', lambda: 2 << 20)
+
+    assert '(50% of the 2.00 MB/s cap)' in metrics.progress()
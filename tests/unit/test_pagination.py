@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+from imgurtofolder.pagination import paginate
+
+
+def make_fetcher(pages: int, page_size: int = 3, last_page_size: int = 0):
+
+    requested = []
+    in_flight = 0
+    peak = 0
+
+    async def fetch_page(page: int):
+        nonlocal in_flight, peak
+        requested.append(page)
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        size = page_size if page < pages else last_page_size if page == pages else 0
+        return [{'id': f'{page}-{index}'} for index in range(size)]
+
+    return fetch_page, requested, lambda: peak
+
+
+@pytest.mark.asyncio
+async def test_pages_are_fetched_ahead_and_yielded_in_order():
+
+    fetch_page, requested, peak = make_fetcher(pages=5)
+
+    items = [item['id'] async for item in paginate(fetch_page, window=3)]
+
+    assert items == [f'{page}-{index}' for page in range(5) for index in range(3)]
+    assert peak() == 3
+    assert requested[:6] == [0, 1, 2, 3, 4, 5]
+
+
+@pytest.mark.asyncio
+async def test_pages_past_max_items_are_not_requested():
+
+    fetch_page, requested, _ = make_fetcher(pages=100)
+
+    items = [item async for item in paginate(fetch_page, starting_page=2, max_items=7, window=2)]
+
+    assert len(items) == 7
+    assert items[0]['id'] == '2-0'
+    assert max(requested) <= 2 + 3
+
+
+@pytest.mark.asyncio
+async def test_the_window_is_sized_from_the_first_page():
+
+    fetch_page, requested, _ = make_fetcher(pages=100, page_size=60)
+
+    items = [item async for item in paginate(fetch_page, max_items=30, window=4)]
+
+    assert len(items) == 30
+    assert requested == [0]
+
+
+@pytest.mark.asyncio
+async def test_no_page_is_requested_after_a_short_page():
+
+    fetch_page, requested, _ = make_fetcher(pages=2, page_size=3, last_page_size=1)
+
+    items = [item['id'] async for item in paginate(fetch_page, window=2)]
+
+    assert items == ['0-0', '0-1', '0-2', '1-0', '1-1', '1-2', '2-0']
+    assert requested == [0, 1, 2, 3]
@@ -0,0 +1,74 @@
+import json
+
+import httpx
+import pytest
+
+from imgurtofolder.plan import execute_plan, load_plan, write_plan
+
+
+def favorites_handler(requested: list):
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requested.append((request.url.host, request.url.path))
+
+        if request.url.host == 'i.imgur.com':
+            return httpx.Response(200, content=b'image')
+
+        if request.url.path == '/3/album/a':
+            return httpx.Response(200, json={'data': {
+                'id': 'a',
+                'title': 'album',
+                'images': [
+                    {'id': f'a{index}', 'title': None, 'link': f'https://i.imgur.com/a{index}.png', 'size': 5}
+                    for index in range(2)
+                ]
+            }})
+
+        page = int(request.url.path.split('/')[5])
+        return httpx.Response(200, json={'data': [
+            {'id': 'i', 'title': 'image', 'link': 'https://i.imgur.com/i.jpg', 'size': 8, 'is_album': False},
+            {'id': 'a', 'title': 'album', 'is_album': True, 'images_count': 2},
+        ] if page == 0 else []})
+
+    return handler
+
+
+@pytest.mark.asyncio
+async def test_plan_is_written_without_downloading_and_executed_without_listing(api_with_transport, tmp_path):
+
+    requested = []
+    api = api_with_transport(favorites_handler(requested))
+    (tmp_path / 'downloads').mkdir()
+    (tmp_path / 'downloads' / 'image.jpg').write_bytes(b'existing')
+    plan_path = str(tmp_path / 'plan.json')
+
+    await write_plan(plan_path, api, favorites='me', max_items=2)
+
+    summary = load_plan(plan_path)['summary']
+
+    assert not any(host == 'i.imgur.com' for host, _ in requested)
+    assert summary == {
+        'items': 2,
+        'images': 3,
+        'bytes': 18,
+        'images_without_size': 0,
+        'existing_images': 1,
+        'bytes_to_download': 10,
+        'api_calls': 2,
+    }
+
+    requested.clear()
+
+    await execute_plan(plan_path, api)
+
+    assert all(host == 'i.imgur.com' for host, _ in requested)
+    assert sorted(path.name for path in (tmp_path / 'downloads' / 'album').iterdir()) == ['a0 - 1.png', 'a1 - 2.png']
+
+
+def test_other_files_are_not_plans(tmp_path):
+
+    path = tmp_path / 'plan.json'
+    path.write_text(json.dumps({'images': []}))
+
+    with pytest.raises(ValueError):
+        load_plan(str(path))
@@ -0,0 +1,135 @@
+import time
+
+import httpx
+import pytest
+
+from imgurtofolder.objects import Image
+from imgurtofolder.ratelimit import BandwidthLimiter, RateLimiter
+
+
+def test_rate_is_unchanged_while_credits_are_plentiful():
+
+    limiter = RateLimiter(rate=10)
+    limiter.update({
+        'X-RateLimit-ClientRemaining': '12000',
+        'X-RateLimit-UserRemaining': '1900',
+        'X-RateLimit-UserReset': str(time.time() + 3600),
+    })
+
+    assert limiter.rate == 10
+    assert limiter.client_remaining == 12000
+    assert limiter.user_remaining == 1900
+
+
+def test_rate_spreads_remaining_credits_until_reset():
+
+    limiter = RateLimiter(rate=10)
+    limiter.update({
+        'X-RateLimit-UserRemaining': '50',
+        'X-RateLimit-UserReset': str(time.time() + 100),
+    })
+
+    assert limiter.rate == pytest.approx(0.5, rel=0.05)
+    assert limiter.post_rate == 10
+
+
+def test_post_credits_only_limit_post_requests():
+
+    limiter = RateLimiter(rate=10)
+    limiter.update({
+        'X-Post-Rate-Limit-Remaining': '50',
+        'X-Post-Rate-Limit-Reset': '100',
+    })
+
+    assert limiter.post_rate == pytest.approx(0.5)
+    assert limiter.rate == 10
+
+
+@pytest.mark.asyncio
+async def test_exhausted_credits_pause_until_reset():
+
+    limiter = RateLimiter(rate=1000, capacity=1)
+    limiter.update({
+        'X-Post-Rate-Limit-Remaining': '0',
+        'X-Post-Rate-Limit-Reset': '1',
+    })
+
+    started = time.monotonic()
+    await limiter.acquire()
+
+    assert time.monotonic() - started < 0.5
+
+    await limiter.acquire('POST')
+
+    assert time.monotonic() - started >= 0.9
+
+
+@pytest.mark.asyncio
+async def test_only_api_requests_are_rate_limited(api_with_transport):
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json={}, headers={
+            'X-Post-Rate-Limit-Remaining': '10',
+            'X-Post-Rate-Limit-Reset': '10',
+        })
+
+    api = api_with_transport(handler)
+
+    await api.get('https://i.imgur.com/1.jpg', return_raw_response=True)
+    assert api.rate_limiter.post_remaining is None
+
+    await api.get('image/1')
+    assert api.rate_limiter.post_remaining == 10
+    assert api.rate_limiter.post_rate == pytest.approx(1)
+
+
+def test_share_divides_the_rate_and_remaining_credits():
+
+    limiter = RateLimiter(rate=10, capacity=10, share=0.25)
+
+    assert limiter.rate == 2.5
+    assert limiter.capacity == 2.5
+
+    limiter.update({
+        'X-Post-Rate-Limit-Remaining': '50',
+        'X-Post-Rate-Limit-Reset': '100',
+    })
+
+    assert limiter.post_rate == pytest.approx(0.125)
+
+    with pytest.raises(ValueError):
+        RateLimiter(share=0)
+
+
+def test_bandwidth_limiter_goes_into_debt_and_refills(monkeypatch):
+
+    clock = [0.0]
+    monkeypatch.setattr('imgurtofolder.ratelimit.time.monotonic', lambda: clock[0])
+
+    limiter = BandwidthLimiter(rate=100)
+
+    assert limiter.reserve(100) == 0
+    assert limiter.reserve(50) == pytest.approx(0.5)
+    assert limiter.reserve(50) == pytest.approx(1.0)
+
+    clock[0] = 3.0
+    assert limiter.reserve(100) == 0
+
+
+@pytest.mark.asyncio
+async def test_downloads_are_throttled_by_the_global_and_connection_caps(api_with_transport, tmp_path, monkeypatch):
+
+    delays = []
+
+    async def sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr('imgurtofolder.ratelimit.asyncio.sleep', sleep)
+    api = api_with_transport(lambda request: httpx.Response(200, content=b'x' * 300), max_bandwidth=1000, max_connection_bandwidth=100)
+
+    await Image('1', api).download(metadata={'id': '1', 'title': 'test', 'link': 'https://i.imgur.com/1.jpg'})
+
+    # The connection cap is the tighter one: 300 bytes at 100 bytes/s after a 100 byte burst
+    assert sum(delays) == pytest.approx(2.0, abs=0.05)
+    assert api.metrics.total('throttled_seconds') == pytest.approx(sum(delays))
+    assert (tmp_path / 'downloads' / 'test.jpg').stat().st_size == 300
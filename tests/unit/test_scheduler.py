@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+from imgurtofolder.scheduler import Scheduler
+
+
+@pytest.mark.asyncio
+async def test_run_bounds_concurrency_and_pulls_work_lazily():
+
+    scheduler = Scheduler(jobs=2, api_jobs=1, queue_size=1)
+    running = 0
+    peak = 0
+    created = 0
+    finished = 0
+
+    async def job():
+        nonlocal running, peak, finished
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        finished += 1
+
+    def work():
+        nonlocal created
+        for _ in range(10):
+            # Only the workers, the queue and the item being queued run ahead of what has finished
+            assert created - finished <= 2 + 1 + 1
+            created += 1
+            yield job()
+
+    await scheduler.run(work())
+
+    assert created == 10
+    assert peak == 2
+
+
+@pytest.mark.asyncio
+async def test_run_continues_after_a_failing_item():
+
+    scheduler = Scheduler(jobs=2)
+    finished = []
+
+    async def job(number: int):
+        if number == 1:
+            raise RuntimeError('failed')
+        finished.append(number)
+
+    await scheduler.run(job(number) for number in range(4))
+
+    assert sorted(finished) == [0, 2, 3]
+
+
+@pytest.mark.asyncio
+async def test_started_items_finish_when_the_work_raises():
+
+    scheduler = Scheduler(jobs=4)
+    finished = []
+
+    async def job(number: int):
+        await asyncio.sleep(0.01)
+        finished.append(number)
+
+    async def work():
+        for number in range(4):
+            yield job(number)
+        await asyncio.sleep(0)
+        raise RuntimeError('listing failed')
+
+    with pytest.raises(RuntimeError):
+        await scheduler.run(work())
+
+    assert sorted(finished) == [0, 1, 2, 3]
+    assert scheduler.queue_depth == 0
+
+
+@pytest.mark.asyncio
+async def test_slots_are_bounded_separately():
+
+    scheduler = Scheduler(jobs=3, api_jobs=1)
+
+    async with scheduler.api_slots:
+        assert scheduler.api_slots.locked()
+        assert not scheduler.download_slots.locked()
+
+
+def test_rejects_non_positive_limits():
+    with pytest.raises(ValueError):
+        Scheduler(jobs=0)
@@ -1 +1,50 @@
-# TODO
+import httpx
+import pytest
+
+from imgurtofolder.downloader import download_url
+
+
+def subreddit_handler(requested: list):
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requested.append((request.url.host, request.url.path))
+
+        if request.url.host == 'i.imgur.com':
+            return httpx.Response(200, content=b'image')
+
+        if request.url.path == '/3/gallery/r/aww/Ur2Yx4q':
+            return httpx.Response(200, json={'data': {
+                'id': 'Ur2Yx4q', 'title': 'single', 'link': 'https://i.imgur.com/Ur2Yx4q.jpg', 'is_album': False
+            }})
+
+        page = int(request.url.path.split('/')[-1])
+        return httpx.Response(200, json={'data': [
+            {'id': f'i{index}', 'title': f'listed {index}', 'link': f'https://i.imgur.com/i{index}.jpg', 'is_album': False}
+            for index in range(2)
+        ] if page == 0 else []})
+
+    return handler
+
+
+@pytest.mark.asyncio
+async def test_subreddit_url_downloads_the_listing(api_with_transport, tmp_path):
+
+    requested = []
+    api = api_with_transport(subreddit_handler(requested))
+
+    await download_url('https://imgur.com/r/aww', api)
+
+    assert ('api.imgur.com', '/3/gallery/r/aww/time/day/0') in requested
+    assert sorted(path.name for path in (tmp_path / 'downloads').iterdir()) == ['listed 0.jpg', 'listed 1.jpg']
+
+
+@pytest.mark.asyncio
+async def test_subreddit_image_url_downloads_only_that_image(api_with_transport, tmp_path):
+
+    requested = []
+    api = api_with_transport(subreddit_handler(requested))
+
+    await download_url('https://imgur.com/r/aww/Ur2Yx4q', api)
+
+    assert [path for host, path in requested if host == 'api.imgur.com'] == ['/3/gallery/r/aww/Ur2Yx4q']
+    assert [path.name for path in (tmp_path / 'downloads').iterdir()] == ['single.jpg']
@@ -0,0 +1,147 @@
+from typing import List, Tuple
+
+import httpx
+import pytest
+
+from imgurtofolder.api import ImgurAPI
+from imgurtofolder.watch import Watcher, build_sources, parse_intervals
+
+
+def test_parse_intervals_per_source_and_default():
+
+    intervals = parse_intervals(['600', 'subreddit=60'], default=900)
+
+    assert intervals == {'favorites': 600, 'account-images': 600, 'subreddit': 60, 'tag': 600}
+
+    with pytest.raises(ValueError):
+        parse_intervals(['albums=60'], default=900)
+
+
+def test_only_subreddits_and_tags_are_watched(configuration):
+
+    sources, urls = build_sources(
+        ImgurAPI(configuration),
+        parse_intervals([], default=900),
+        urls=['https://imgur.com/r/aww', 'https://imgur.com/t/funny', 'https://imgur.com/a/rYXPu9x', 'not a url'],
+        favorites='me'
+    )
+
+    assert [source.key for source in sources] == ['favorites:me', 'subreddit:aww', 'tag:funny']
+    assert urls == ['https://imgur.com/a/rYXPu9x']
+
+
+@pytest.mark.asyncio
+async def test_ticks_stop_at_the_first_item_already_synced(api_with_transport):
+
+    listing = [
+        {'id': 'b', 'title': 'b', 'link': 'https://i.imgur.com/b.jpg'},
+        {'id': 'a', 'title': 'a', 'link': 'https://i.imgur.com/a.jpg'},
+    ]
+    requested = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requested.append(request.url.path)
+
+        if request.url.host == 'api.imgur.com':
+            page = int(request.url.path.rsplit('/', 1)[-1])
+            return httpx.Response(200, json={'data': listing if page == 0 else []})
+        return httpx.Response(200, content=b'image')
+
+    api = api_with_transport(handler)
+    sources, _ = build_sources(api, parse_intervals([], default=900), urls=['https://imgur.com/r/aww'])
+    watcher = Watcher(api, sources)
+
+    assert await watcher.sync(sources[0]) == 2
+
+    listing.insert(0, {'id': 'c', 'title': 'c', 'link': 'https://i.imgur.com/c.jpg'})
+    requested.clear()
+
+    assert await watcher.sync(sources[0]) == 1
+
+    assert requested == ['/3/gallery/r/aww/time/day/0', '/c.jpg']
+
+
+def listing_handler(listing: list, requested: list, failing: set = frozenset(), page_size: int = 100):
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requested.append(request.url.path)
+
+        if request.url.host == 'api.imgur.com':
+            page = int(request.url.path.rsplit('/', 1)[-1])
+            return httpx.Response(200, json={'data': listing[page * page_size:(page + 1) * page_size]})
+
+        if request.url.path.strip('/').split('.')[0] in failing:
+            return httpx.Response(404)
+
+        return httpx.Response(200, content=b'image')
+
+    return handler
+
+
+def item(id: str) -> dict:
+    return {'id': id, 'title': id, 'link': f'https://i.imgur.com/{id}.jpg'}
+
+
+@pytest.mark.asyncio
+async def test_items_left_behind_by_an_interrupted_tick_are_synced_next(api_with_transport):
+
+    listing = [item('a')]
+    requested = []
+    api = api_with_transport(listing_handler(listing, requested))
+    sources, _ = build_sources(api, parse_intervals([], default=900), urls=['https://imgur.com/r/aww'])
+    watcher = Watcher(api, sources)
+
+    assert await watcher.sync(sources[0]) == 1
+
+    # A tick that synced d, then crashed before c and b
+    listing[:0] = [item('d'), item('c'), item('b')]
+    api.manifest.mark_seen(sources[0].key, 'd')
+    requested.clear()
+
+    assert await watcher.sync(sources[0]) == 2
+
+    assert sorted(path for path in requested if path.endswith('.jpg')) == ['/b.jpg', '/c.jpg']
+
+
+@pytest.mark.asyncio
+async def test_failed_items_are_retried_after_a_restart(api_with_transport):
+
+    listing = [item('b'), item('a')]
+    requested = []
+    failing = {'a'}
+    api = api_with_transport(listing_handler(listing, requested, failing))
+    sources, _ = build_sources(api, parse_intervals([], default=900), urls=['https://imgur.com/r/aww'])
+
+    assert await Watcher(api, sources).sync(sources[0]) == 1
+
+    failing.clear()
+    requested.clear()
+
+    assert await Watcher(api, sources).sync(sources[0]) == 1
+
+    assert [path for path in requested if path.endswith('.jpg')] == ['/a.jpg']
+
+
+@pytest.mark.asyncio
+async def test_ticks_cut_short_by_max_items_never_read_a_page_twice(api_with_transport):
+
+    listing = [item(f'old{number}') for number in range(60)]
+    requested = []
+    api = api_with_transport(listing_handler(listing, requested, page_size=10))
+    sources, _ = build_sources(api, parse_intervals([], default=900), urls=['https://imgur.com/r/aww'])
+    watcher = Watcher(api, sources, max_items=10)
+
+    async def tick() -> Tuple[int, List[int]]:
+        requested.clear()
+        synced = await watcher.sync(sources[0])
+        return synced, [int(path.rsplit('/', 1)[-1]) for path in requested if path.startswith('/3/')]
+
+    # The first tick only backfills max_items items
+    assert await tick() == (10, [0])
+
+    listing[:0] = [item(f'new{number}') for number in range(25)]
+
+    assert await tick() == (10, [0])
+    assert await tick() == (10, [1])
+    assert await tick() == (5, [2])
+    assert await tick() == (0, [0])
@@ -0,0 +1,77 @@
+import queue
+
+import httpx
+import pytest
+
+from imgurtofolder.api import ImgurAPI
+from imgurtofolder.workers import WorkerPool, _work, download_sharded, shard
+
+
+def test_shard_is_stable_and_in_range():
+
+    assert shard('abc123', 4) == shard('abc123', 4)
+    assert {shard(f'id{number}', 4) for number in range(100)} == {0, 1, 2, 3}
+
+
+@pytest.mark.asyncio
+async def test_worker_downloads_its_tasks_and_reports(api_with_transport, tmp_path):
+
+    api = api_with_transport(lambda request: httpx.Response(200, content=b'image'))
+    inbox, outbox = queue.Queue(), queue.Queue()
+
+    inbox.put(('item', {'id': '1', 'title': 'one', 'link': 'https://i.imgur.com/1.jpg'}, 10))
+    inbox.put(('url', 'https://i.imgur.com/2.png', None))
+    inbox.put(('url', 'not a url', 11))
+    inbox.put(None)
+
+    await _work(0, api, inbox, outbox)
+
+    kind, index, counters, failures, finished = outbox.get_nowait()
+
+    assert (kind, index) == ('done', 0)
+    assert sorted(finished) == [10, 11]
+    assert sum(counters['images'].values()) == 2
+    assert 'failed_items' not in counters
+    assert [failure.id for failure in failures] == ['not a url']
+    assert sorted(path.name for path in (tmp_path / 'downloads').iterdir()) == ['2.png', 'one.jpg']
+
+
+@pytest.mark.asyncio
+async def test_pool_streams_failures_back_from_worker_processes(configuration):
+
+    api = ImgurAPI(configuration)
+
+    async with WorkerPool(api, workers=2) as pool:
+        for number in range(4):
+            await pool.submit(str(number), ('url', f'not a url {number}', None))
+
+    assert sorted(failure.id for failure in api.scheduler.failures.failures) == [f'not a url {number}' for number in range(4)]
+
+
+@pytest.mark.asyncio
+async def test_sharded_input_file_is_deduplicated_and_checkpointed(configuration, tmp_path):
+
+    input_file = tmp_path / 'urls.txt'
+    input_file.write_text('not a url a\nnot a url b\n\nnot a url b\n# comment\nnot a url c\n')
+    (tmp_path / 'urls.txt.checkpoint').write_text('1')
+    api = ImgurAPI(configuration)
+
+    await download_sharded(api, 2, input_file=str(input_file))
+
+    assert sorted(failure.id for failure in api.scheduler.failures.failures) == ['not a url b', 'not a url c']
+    assert not (tmp_path / 'urls.txt.checkpoint').exists()
+
+
+@pytest.mark.asyncio
+async def test_a_failed_listing_line_does_not_stop_the_sharded_input_file(api_with_transport, tmp_path):
+
+    input_file = tmp_path / 'urls.txt'
+    input_file.write_text('https://imgur.com/t/missing\nnot a url a\nnot a url b\n')
+    api = api_with_transport(lambda request: httpx.Response(404))
+
+    await download_sharded(api, 2, input_file=str(input_file))
+
+    assert sorted(failure.id for failure in api.scheduler.failures.failures) == [
+        'https://imgur.com/t/missing', 'not a url a', 'not a url b'
+    ]
+    assert not (tmp_path / 'urls.txt.checkpoint').exists()
@@ -0,0 +1,31 @@
+import hashlib
+
+import pytest
+
+from imgurtofolder.writer import FileWriter
+
+
+@pytest.mark.asyncio
+async def test_chunks_are_written_and_hashed_off_loop(tmp_path):
+
+    writer = FileWriter(max_workers=1, queue_size=2)
+    digest = hashlib.sha256()
+
+    async with writer.open(tmp_path / 'file', digest=digest) as current_file:
+        for chunk in (b'a', b'b', b'c', b'd'):
+            await current_file.write(chunk)
+
+    assert current_file.size == 4
+    assert (tmp_path / 'file').read_bytes() == b'abcd'
+    assert digest.hexdigest() == hashlib.sha256(b'abcd').hexdigest()
+
+
+@pytest.mark.asyncio
+async def test_write_errors_are_raised(tmp_path):
+
+    writer = FileWriter(max_workers=1, queue_size=1)
+
+    with pytest.raises(TypeError):
+        async with writer.open(tmp_path / 'file') as current_file:
+            for _ in range(4):
+                await current_file.write('not bytes')